@@ -0,0 +1,164 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from utils.container import INDEPENDENT, BlockChecker, BlockFramer, parse_frame, parse_header, parse_trailer
+
+
+# the default max block size of an async stream. a stream holds about 2 blocks, so hundreds of streams
+# fit in a few tens of MB, and a block is a short task for the executor
+ASYNC_BLOCK_SIZE = 1 << 16
+
+
+async def read_exact(reader, n_bytes):
+    """
+    :param reader: asyncio.StreamReader
+    :param n_bytes: the number of bytes to read
+    :return: bytes. raising ValueError if the stream ends before n_bytes
+    """
+    try:
+        return await reader.readexactly(n_bytes)
+    except asyncio.IncompleteReadError:
+        raise ValueError('unexpected end of compressed stream') from None
+
+
+async def run_parser(parser, reader):
+    """
+    running a stream parser of utils.container (parse_header, parse_frame ...) on an asyncio stream
+    :param parser: generator returned by a parse_ function
+    :param reader: asyncio.StreamReader
+    :return: the value returned by the parser
+    """
+    try:
+        n_bytes = next(parser)
+        while True:
+            n_bytes = parser.send(await read_exact(reader, n_bytes))
+    except StopIteration as stop:
+        return stop.value
+
+
+def check_executor(executor, header):
+    """
+    the codec state of a stream (the lempel-ziv dictionary, the adaptive model) is kept on the codec object, a
+    process would update a copy of it. only the blocks of a stream of independent blocks may run in other processes
+    :param executor: the executor given to compress_stream / decompress_stream. None: the default executor of the loop
+    :param header: the Header of the stream
+    :return: None. raising ValueError if the executor is not a thread pool and the blocks depend on each other
+    """
+    if executor is None or isinstance(executor, ThreadPoolExecutor) or header.flags & INDEPENDENT:
+        return
+    raise ValueError('the blocks of the stream depend on each other: use a thread pool, or independent blocks '
+                     'for a process pool')
+
+
+async def read_block(reader, block_size, live=False):
+    """
+    :param reader: asyncio.StreamReader
+    :param block_size: the max number of bytes in a block
+    :param live: the block is whatever the reader has available, not waiting for block_size bytes
+    :return: bytes - the next block, b'' at the end of the stream
+    """
+    block = await reader.read(block_size)
+    if live or not block:
+        return block
+    chunks = [block]
+    n_bytes = len(block)
+    while n_bytes < block_size:
+        chunk = await reader.read(block_size - n_bytes)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        n_bytes += len(chunk)
+    return b''.join(chunks)
+
+
+async def run_blocks(function, read_item, write_result, executor=None):
+    """
+    running function on every item in an executor, one item at a time and in order (the codec state carries from
+    a block to the next). the next item is read while function runs, and the next read waits for write_result,
+    which drains the writer: a slow peer slows the reads down instead of queueing data in memory.
+    :param function: function item -> result, run in the executor
+    :param read_item: coroutine function () -> the next item, None at the end
+    :param write_result: coroutine function (result) -> None
+    :param executor: concurrent.futures thread pool, a process pool only for independent blocks (see check_executor).
+    None: the default executor of the loop
+    :return: None
+    """
+    loop = asyncio.get_running_loop()
+    item = await read_item()
+    while item is not None:
+        reading = asyncio.ensure_future(read_item())
+        try:
+            await write_result(await loop.run_in_executor(executor, function, item))
+        except BaseException:
+            reading.cancel()
+            raise
+        item = await reading
+
+
+async def compress_stream(codec, reader, writer, block_size=ASYNC_BLOCK_SIZE, executor=None, live=False):
+    """
+    compress an asyncio stream block after block, in the layout of codec.compress_stream. the blocks are
+    compressed in an executor so the loop keeps serving other streams, and the writer is drained after every block.
+    :param codec: a codec object (Huffman_Coding(path=None), LZW_Coding ...), one per concurrent stream:
+    it holds the state of the stream
+    :param reader: asyncio.StreamReader to compress
+    :param writer: asyncio.StreamWriter for the compressed stream, left open
+    :param block_size: the max number of bytes in a block
+    :param executor: concurrent.futures thread pool, a process pool only for independent blocks (see check_executor).
+    None: the default executor of the loop
+    :param live: a block is whatever the reader has available, so the data is sent as it arrives
+    :return: the number of bytes compressed
+    """
+    framer = BlockFramer(codec.stream_header())
+    check_executor(executor, framer.header)
+    writer.write(framer.start())
+
+    async def read_item():
+        block = await read_block(reader, block_size, live)
+        if not block:
+            return None
+        framer.add_block(block)
+        return block
+
+    async def write_result(payload):
+        writer.write(framer.frame(payload))
+        writer.write(payload)
+        await writer.drain()
+
+    await run_blocks(codec.compress_block, read_item, write_result, executor)
+    writer.write(framer.end())
+    await writer.drain()
+    return framer.total
+
+
+async def decompress_stream(codec, reader, writer, executor=None):
+    """
+    decompress an asyncio stream written by compress_stream (or by codec.compress_stream / compress_parallel /
+    compress_adaptive) block after block, the blocks are decoded in an executor
+    :param codec: a codec object of the codec that wrote the stream, one per concurrent stream
+    :param reader: asyncio.StreamReader with the compressed stream
+    :param writer: asyncio.StreamWriter for the decompressed data, left open
+    :param executor: concurrent.futures thread pool, a process pool only for independent blocks (see check_executor).
+    None: the default executor of the loop
+    :return: the number of bytes decompressed
+    """
+    header = await run_parser(parse_header(), reader)
+    checker = BlockChecker(header)
+    check_executor(executor, header)
+    decompress_block = codec.stream_block_decoder(header)
+
+    async def read_item():
+        frame = await run_parser(parse_frame(), reader)
+        if frame is None:
+            return None
+        block_length, payload = frame
+        checker.add_frame(block_length)
+        return payload
+
+    async def write_result(block):
+        checker.check_block(block)
+        writer.write(block)
+        await writer.drain()
+
+    await run_blocks(decompress_block, read_item, write_result, executor)
+    checker.finish(await run_parser(parse_trailer(), reader))
+    return checker.total
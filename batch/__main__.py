@@ -0,0 +1,64 @@
+import argparse
+import logging
+import sys
+from batch.batch import CODECS, MB, compress_batch, decompress_batch
+
+
+def format_summary(action, result):
+    """
+    :param action: 'compressed' / 'decompressed'
+    :param result: dict returned by compress_batch / decompress_batch
+    :return: one line of the aggregate measures
+    """
+    return (f"{action} {result['files']} files: {result['original_bytes'] / MB:.2f} MB <-> "
+            f"{result['compressed_bytes'] / MB:.2f} MB, ratio {result['ratio']:.2f}, "
+            f"{result['seconds']:.2f} s, {result['mb_s']:.2f} MB/s")
+
+
+def main(argv=None):
+    """
+    python -m batch compress [-c codec] [-o archive] [-j workers] [--threads] [--cache-codes] paths / globs ...
+    python -m batch decompress [-d output dir] [-j workers] [--threads] [--cache-codes] files / archives / globs ...
+    :param argv: the command line arguments. None: sys.argv
+    :return: the exit code
+    """
+    parser = argparse.ArgumentParser(prog='python -m batch', description='compress / decompress many files at once')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    compress = commands.add_parser('compress', help='compress files to path.bin, or into one archive')
+    compress.add_argument('paths', nargs='+', help='files or glob patterns (quote them, ** is recursive)')
+    compress.add_argument('-c', '--codec', choices=list(CODECS), default='huffman')
+    compress.add_argument('-o', '--archive', help='write every file into this archive with an index')
+
+    decompress = commands.add_parser('decompress', help='decompress .bin files or archives')
+    decompress.add_argument('paths', nargs='+', help='compressed files, archives or glob patterns')
+    decompress.add_argument('-d', '--output-dir', help='the directory to decompress to, default: next to the input')
+
+    for command in (compress, decompress):
+        command.add_argument('-j', '--workers', type=int, default=None, help='the number of workers, default: cpus')
+        command.add_argument('--threads', action='store_true', help='a thread pool instead of a process pool')
+        command.add_argument('-v', '--verbose', action='store_true', help='log every file')
+        command.add_argument('--cache-codes', action='store_true',
+                             help='reuse the huffman codes / decode tables of similar files in each worker')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(message)s')
+    progress = (lambda name, size_in, size_out: print(f'{name}: {size_in} -> {size_out}')) if args.verbose else None
+
+    try:
+        if args.command == 'compress':
+            result = compress_batch(args.paths, codec=args.codec, archive=args.archive, workers=args.workers,
+                                    threads=args.threads, progress=progress, cache_codes=args.cache_codes)
+            print(format_summary('compressed', result))
+        else:
+            result = decompress_batch(args.paths, output_dir=args.output_dir, workers=args.workers,
+                                      threads=args.threads, progress=progress, cache_codes=args.cache_codes)
+            print(format_summary('decompressed', result))
+    except (OSError, ValueError) as error:
+        print(f'error: {error}', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import struct
+from utils.bytes_utils import write_varint, read_varint
+from utils.container import FOOTER_FORMAT, FOOTER_SIZE, read_exact
+
+
+ARCHIVE_MAGIC = b'DARC'
+ARCHIVE_VERSION = 1
+ARCHIVE_INDEX_MAGIC = b'DAIX'
+
+
+class ArchiveWriter:
+    def __init__(self, file):
+        """
+        packing many compressed files into one: magic, version, the members one after the other (each a complete
+        compressed file with its own header and checksum), the member index, the footer (index offset, magic)
+        :param file: binary file object opened for writing
+        """
+        self.file = file
+        self.index = []
+        self.position = len(ARCHIVE_MAGIC) + 1
+        file.write(ARCHIVE_MAGIC + bytes([ARCHIVE_VERSION]))
+
+    def add(self, name, original_length, compressed):
+        """
+        :param name: the member name (a relative path, buffer0 ...)
+        :param original_length: the length of the member before compress
+        :param compressed: bytes written by a codec compress_bytes
+        :return: None
+        """
+        self.file.write(compressed)
+        self.index.append((name, self.position, len(compressed), original_length))
+        self.position += len(compressed)
+
+    def close(self):
+        """
+        writing the index and the footer, the file is left open
+        :return: list of (name, offset in the archive, compressed length, original length)
+        """
+        b = bytearray(write_varint(len(self.index)))
+        for name, offset, length, original_length in self.index:
+            raw_name = name.encode('utf-8')
+            b += write_varint(len(raw_name)) + raw_name
+            b += write_varint(offset) + write_varint(length) + write_varint(original_length)
+        self.file.write(b)
+        self.file.write(struct.pack(FOOTER_FORMAT, self.position, ARCHIVE_INDEX_MAGIC))
+        return self.index
+
+
+def is_archive(path):
+    """
+    :param path: a file path
+    :return: True if the file starts with the archive magic bytes
+    """
+    with open(path, 'rb') as file:
+        return file.read(len(ARCHIVE_MAGIC)) == ARCHIVE_MAGIC
+
+
+def read_archive_index(file):
+    """
+    :param file: seekable binary file object of an archive
+    :return: list of (name, offset in the archive, compressed length, original length)
+    """
+    file.seek(0)
+    start = file.read(len(ARCHIVE_MAGIC) + 1)
+    if start[:len(ARCHIVE_MAGIC)] != ARCHIVE_MAGIC:
+        raise ValueError('not an archive: bad magic bytes')
+    if start[len(ARCHIVE_MAGIC)] != ARCHIVE_VERSION:
+        raise ValueError(f'unsupported archive version {start[len(ARCHIVE_MAGIC)]}')
+    file.seek(-FOOTER_SIZE, 2)
+    index_offset, magic = struct.unpack(FOOTER_FORMAT, read_exact(file, FOOTER_SIZE))
+    if magic != ARCHIVE_INDEX_MAGIC:
+        raise ValueError('archive index not found: the archive is truncated')
+    end = file.tell() - FOOTER_SIZE
+    file.seek(index_offset)
+    data = read_exact(file, end - index_offset)
+
+    index = []
+    n_members, offset = read_varint(data, 0)
+    for _ in range(n_members):
+        name_length, offset = read_varint(data, offset)
+        name = data[offset:offset + name_length].decode('utf-8')
+        offset += name_length
+        member_offset, offset = read_varint(data, offset)
+        length, offset = read_varint(data, offset)
+        original_length, offset = read_varint(data, offset)
+        index.append((name, member_offset, length, original_length))
+    return index
+
+
+def read_member(file, offset, length):
+    """
+    :param file: seekable binary file object of an archive
+    :param offset: the offset of the member (see read_archive_index)
+    :param length: the compressed length of the member
+    :return: bytes - the compressed member
+    """
+    file.seek(offset)
+    return read_exact(file, length)
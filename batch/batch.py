@@ -0,0 +1,307 @@
+import glob
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from batch.archive import ArchiveWriter, is_archive, read_archive_index, read_member
+from utils.code_cache import CodeCache
+from utils.codec_names import CODECS, CODEC_NAMES, EXTENSION, MB, codec_class
+from utils.container import Header
+from utils.parallel import BLOCKS_PER_WORKER, ordered_map
+
+
+# the codecs taking a code_cache (utils.code_cache)
+HUFFMAN_CODECS = ('huffman', 'lzw_huffman')
+
+# the number of files sent to a worker in one task, so a small file does not cost a round trip to the pool each
+FILES_PER_TASK = 32
+
+# .codecs: dict (codec name, options, cache_codes) -> codec object of this worker (process or thread), reused for
+# every file. .code_cache: the CodeCache shared by the codecs of this worker
+WORKER_STATE = threading.local()
+
+
+def get_codec(codec_name, options, cache_codes=False):
+    """
+    :param codec_name: a key of CODECS
+    :param options: tuple of (keyword, value) for the codec constructor
+    :param cache_codes: the huffman codes and decode tables of similar files are reused, from a cache of the worker
+    :return: the codec object of this worker for codec_name and options, created on first use
+    """
+    codecs = getattr(WORKER_STATE, 'codecs', None)
+    if codecs is None:
+        codecs = WORKER_STATE.codecs = {}
+    key = (codec_name, options, cache_codes)
+    codec = codecs.get(key)
+    if codec is None:
+        options = dict(options)
+        if cache_codes and codec_name in HUFFMAN_CODECS:
+            if getattr(WORKER_STATE, 'code_cache', None) is None:
+                WORKER_STATE.code_cache = CodeCache()
+            options['code_cache'] = WORKER_STATE.code_cache
+        codec = codecs[key] = codec_class(codec_name)(path=None, **options)
+    return codec
+
+
+def read_source(source):
+    """
+    :param source: a file path, a bytes like object, or (archive path, member offset, member length)
+    :return: bytes like object - the content of source
+    """
+    if isinstance(source, tuple):
+        path, offset, length = source
+        with open(path, 'rb') as file:
+            return read_member(file, offset, length)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as file:
+            return file.read()
+    return source
+
+
+def write_output(output_path, data):
+    """
+    :param output_path: the file to write. None: data is returned
+    :param data: bytes
+    :return: data if output_path is None, else None
+    """
+    if output_path is None:
+        return data
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(output_path, 'wb') as file:
+        file.write(data)
+    return None
+
+
+def compress_task(codec_name, options, cache_codes, items):
+    """
+    compress a few files in a worker
+    :param codec_name: a key of CODECS
+    :param options: tuple of (keyword, value) for the codec constructor
+    :param cache_codes: reusing the huffman codes of similar files (see get_codec)
+    :param items: list of (name, source, output path or None)
+    :return: list of (name, original length, compressed length, compressed bytes or None if it was written)
+    """
+    codec = get_codec(codec_name, options, cache_codes)
+    results = []
+    for name, source, output_path in items:
+        data = read_source(source)
+        compressed = codec.compress_bytes(data)
+        results.append((name, len(data), len(compressed), write_output(output_path, compressed)))
+    return results
+
+
+def decompress_task(cache_codes, items):
+    """
+    decompress a few files in a worker, each with the codec its header names
+    :param cache_codes: reusing the decode tables of files with the same huffman code (see get_codec)
+    :param items: list of (name, source, output path or None)
+    :return: list of (name, compressed length, decompressed length, decompressed bytes or None if it was written)
+    """
+    results = []
+    for name, source, output_path in items:
+        data = read_source(source)
+        header, _ = Header.from_bytes(data)
+        if header.codec_id not in CODEC_NAMES:
+            raise ValueError(f'{name}: unknown codec id {header.codec_id}')
+        decoded = get_codec(CODEC_NAMES[header.codec_id], (), cache_codes).decompress_bytes(data)
+        results.append((name, len(data), len(decoded), write_output(output_path, decoded)))
+    return results
+
+
+def expand_sources(sources):
+    """
+    :param sources: iterable of file paths, glob patterns (recursive **) and bytes like objects
+    :return: generator of (name, source): the path of a file, 'buffer<i>' for the i-th bytes like object
+    """
+    n_buffers = 0
+    for source in sources:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            yield f'buffer{n_buffers}', source
+            n_buffers += 1
+        elif glob.has_magic(os.fspath(source)):
+            for path in sorted(glob.glob(os.fspath(source), recursive=True)):
+                if os.path.isfile(path):
+                    yield path, path
+        else:
+            yield os.fspath(source), source
+
+
+def member_name(path):
+    """
+    :param path: the path of a file added to an archive
+    :return: the path relative and with / separators, the name the file is extracted to
+    """
+    path = os.path.splitdrive(os.path.normpath(path))[1].replace(os.sep, '/')
+    return '/'.join(part for part in path.split('/') if part not in ('', '.', '..'))
+
+
+def extract_path(output_dir, name):
+    """
+    :param output_dir: the directory members are extracted to
+    :param name: the member name
+    :return: the path of the member in output_dir. raising ValueError if the name leaves output_dir
+    """
+    if name.startswith('/') or '..' in name.split('/'):
+        raise ValueError(f'unsafe member name {name!r}')
+    return os.path.join(output_dir, *name.split('/'))
+
+
+def chunked(items, size):
+    """
+    :param items: iterable
+    :param size: the max number of items in a chunk
+    :return: generator of lists of items
+    """
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_tasks(task, items, workers=None, threads=False):
+    """
+    running task over chunks of items in a pool. at most workers * BLOCKS_PER_WORKER chunks are queued,
+    so the items are produced (globbed, read) only as fast as the workers take them.
+    :param task: picklable function list of items -> list of results
+    :param items: iterable of task items
+    :param workers: the number of workers. None: os.cpu_count(), 1: no pool
+    :param threads: a thread pool instead of a process pool (for i/o bound batches)
+    :return: generator of the results, in the order of items
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = chunked(items, FILES_PER_TASK)
+    if workers == 1:
+        for chunk in chunks:
+            yield from task(chunk)
+        return
+    pool_class = ThreadPoolExecutor if threads else ProcessPoolExecutor
+    with pool_class(max_workers=workers) as executor:
+        for results in ordered_map(executor, task, chunks, window=workers * BLOCKS_PER_WORKER):
+            yield from results
+
+
+def summarize(n_files, original_bytes, compressed_bytes, seconds, outputs):
+    """
+    :param n_files: the number of files / buffers of the batch
+    :param original_bytes: their total length before compress
+    :param compressed_bytes: their total length after compress
+    :param seconds: the wall time of the batch
+    :param outputs: list of the outputs
+    :return: dict of the aggregate measures of a batch, mb_s is of the original bytes
+    """
+    return {
+        'files': n_files,
+        'original_bytes': original_bytes,
+        'compressed_bytes': compressed_bytes,
+        'seconds': seconds,
+        'mb_s': original_bytes / MB / seconds if seconds else 0.0,
+        'ratio': original_bytes / compressed_bytes if compressed_bytes else 0.0,
+        'outputs': outputs,
+    }
+
+
+def compress_batch(sources, codec='huffman', archive=None, workers=None, threads=False, options=None,
+                   progress=None, cache_codes=False):
+    """
+    compress many files / buffers on a shared pool. every worker keeps one codec object for the whole batch.
+    :param sources: iterable of file paths, glob patterns and bytes like objects
+    :param codec: a key of CODECS
+    :param archive: the path of one archive holding every output with an index (see batch.archive).
+    None: each file is compressed to path + EXTENSION, each buffer is returned in outputs
+    :param workers: the number of workers. None: os.cpu_count(), 1: no pool
+    :param threads: a thread pool instead of a process pool
+    :param options: dict of keyword arguments for the codec constructor
+    :param progress: function called with (name, original length, compressed length) of each file as it is done
+    :param cache_codes: every worker keeps a CodeCache (utils.code_cache): similar files reuse a huffman code
+    instead of building one (huffman / lzw_huffman)
+    :return: dict of the aggregate measures (see summarize). outputs: list of the output paths / compressed buffers,
+    or the archive index
+    """
+    if codec not in CODECS:
+        raise ValueError(f'unknown codec {codec!r}, expected one of {", ".join(CODECS)}')
+
+    def items():
+        for name, source in expand_sources(sources):
+            if archive is not None:
+                yield member_name(name), source, None
+            elif isinstance(source, (bytes, bytearray, memoryview)):
+                yield name, source, None
+            else:
+                yield name, source, name + EXTENSION
+
+    task = partial(compress_task, codec, tuple(sorted((options or {}).items())), cache_codes)
+    start = time.perf_counter()
+    n_files = original_bytes = compressed_bytes = 0
+    outputs = []
+    writer = None
+    archive_file = open(archive, 'wb') if archive is not None else None
+    try:
+        if archive_file is not None:
+            writer = ArchiveWriter(archive_file)
+        for name, original_length, compressed_length, compressed in run_tasks(task, items(), workers, threads):
+            n_files += 1
+            original_bytes += original_length
+            compressed_bytes += compressed_length
+            if writer is not None:
+                writer.add(name, original_length, compressed)
+            else:
+                outputs.append(name + EXTENSION if compressed is None else compressed)
+            if progress is not None:
+                progress(name, original_length, compressed_length)
+        if writer is not None:
+            outputs = writer.close()
+    finally:
+        if archive_file is not None:
+            archive_file.close()
+    return summarize(n_files, original_bytes, compressed_bytes, time.perf_counter() - start, outputs)
+
+
+def decompress_batch(sources, output_dir=None, workers=None, threads=False, progress=None, cache_codes=False):
+    """
+    decompress many compressed files / buffers / archives on a shared pool
+    :param sources: iterable of file paths, glob patterns and bytes like objects. an archive is expanded
+    to its members
+    :param output_dir: the directory the files are decompressed to: archive members under their name, compressed
+    files without EXTENSION. None: next to the archive / compressed file. buffers are returned in outputs
+    :param workers: the number of workers. None: os.cpu_count(), 1: no pool
+    :param threads: a thread pool instead of a process pool
+    :param progress: function called with (name, compressed length, decompressed length) of each file as it is done
+    :param cache_codes: every worker keeps a CodeCache: files with the same huffman code reuse its decode table
+    :return: dict of the aggregate measures (see summarize). outputs: list of the output paths / decompressed buffers
+    """
+    def items():
+        for name, source in expand_sources(sources):
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                yield name, source, None
+            elif is_archive(source):
+                with open(source, 'rb') as file:
+                    index = read_archive_index(file)
+                directory = os.path.dirname(os.fspath(source)) if output_dir is None else output_dir
+                for member, offset, length, _ in index:
+                    output_path = extract_path(directory, member)
+                    yield output_path, (os.fspath(source), offset, length), output_path
+            else:
+                output_path = name[:-len(EXTENSION)] if name.endswith(EXTENSION) else name + '.out'
+                if output_dir is not None:
+                    output_path = os.path.join(output_dir, os.path.basename(output_path))
+                yield output_path, source, output_path
+
+    start = time.perf_counter()
+    n_files = original_bytes = compressed_bytes = 0
+    outputs = []
+    task = partial(decompress_task, cache_codes)
+    for name, compressed_length, decoded_length, decoded in run_tasks(task, items(), workers, threads):
+        n_files += 1
+        original_bytes += decoded_length
+        compressed_bytes += compressed_length
+        outputs.append(name if decoded is None else decoded)
+        if progress is not None:
+            progress(name, compressed_length, decoded_length)
+    return summarize(n_files, original_bytes, compressed_bytes, time.perf_counter() - start, outputs)
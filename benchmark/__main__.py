@@ -0,0 +1,59 @@
+import argparse
+import json
+import sys
+from benchmark.corpora import CORPORA
+from benchmark.runner import CODECS, DEFAULT_SIZES, REPORT_HEADER, MAPPED_REPORT_HEADER, parse_size, run, compare, \
+    format_result, save, load
+
+
+def main(argv=None):
+    """
+    python -m benchmark [--codecs ...] [--corpora ...] [--sizes 1K,1M,100M] [--json out.json]
+                        [--baseline baseline.json] [--save-baseline baseline.json] [--mapped]
+    :param argv: the command line arguments. None: sys.argv
+    :return: the exit code: 1 if a round trip failed or a result regressed from the baseline
+    """
+    parser = argparse.ArgumentParser(prog='python -m benchmark',
+                                     description='compress / decompress speed, ratio and memory of every codec')
+    parser.add_argument('--codecs', nargs='+', choices=list(CODECS), default=list(CODECS))
+    parser.add_argument('--corpora', nargs='+', choices=list(CORPORA), default=list(CORPORA))
+    parser.add_argument('--sizes', default=','.join(f'{size >> 20}M' if size >= 1 << 20 else f'{size >> 10}K'
+                                                   for size in DEFAULT_SIZES),
+                        help='comma separated sizes of the synthetic corpora, e.g. 1K,1M,100M (default %(default)s: '
+                             '100M takes minutes per codec, so it is only run when given here)')
+    parser.add_argument('--repeat', type=int, default=1, help='runs of each case, the fastest is reported')
+    parser.add_argument('--json', help='write the results to this json file, - for stdout')
+    parser.add_argument('--baseline', help='compare the results to this json file and fail on regressions')
+    parser.add_argument('--save-baseline', help='write the results to this json file as the new baseline')
+    parser.add_argument('--mapped', action='store_true',
+                        help='run each case in memory and between memory mapped files, report the peak rss difference')
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(size) for size in args.sizes.split(',')]
+    report = sys.stderr if args.json == '-' else sys.stdout
+
+    print(REPORT_HEADER + (MAPPED_REPORT_HEADER if args.mapped else ''), file=report)
+    results = run(args.codecs, args.corpora, sizes, args.repeat,
+                  progress=lambda result: print(format_result(result), file=report, flush=True),
+                  compare_mapped=args.mapped)
+
+    if args.json == '-':
+        json.dump(results, sys.stdout, indent=2)
+    elif args.json:
+        save(results, args.json)
+    if args.save_baseline:
+        save(results, args.save_baseline)
+
+    failed = not all(result['round_trip'] for result in results)
+    if args.baseline:
+        print(file=report)
+        print(f'compared to {args.baseline}:', file=report)
+        for result, before, regressions in compare(results, load(args.baseline)):
+            status = '; '.join(regressions) if regressions else 'ok'
+            print(f"{result['codec']:<12} {result['corpus']:<11} {result['size']:>11}  {status}", file=report)
+            failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
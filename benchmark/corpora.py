@@ -0,0 +1,100 @@
+import os
+import random
+import struct
+
+
+# chunk size of the synthetic corpora generators, so a 100 MB corpus is never held in memory
+CHUNK_SIZE = 1 << 20
+
+# the generators are seeded, so every run compresses the same bytes
+SEED = 1234
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sample.txt')
+
+
+def random_chunks(size):
+    """
+    uniformly random bytes, incompressible
+    :param size: the number of bytes
+    :return: generator of bytes chunks
+    """
+    rng = random.Random(SEED)
+    while size > 0:
+        n = min(size, CHUNK_SIZE)
+        yield rng.getrandbits(8 * n).to_bytes(n, 'little')
+        size -= n
+
+
+def repetitive_chunks(size):
+    """
+    a 64 byte random phrase repeated, with a byte changed every 4 KB
+    :param size: the number of bytes
+    :return: generator of bytes chunks
+    """
+    rng = random.Random(SEED)
+    phrase = rng.getrandbits(8 * 64).to_bytes(64, 'little')
+    chunk = bytearray(phrase * (CHUNK_SIZE // len(phrase)))
+    while size > 0:
+        for i in range(0, len(chunk), 4096):
+            chunk[i + rng.randrange(4096)] = rng.randrange(256)
+        n = min(size, len(chunk))
+        yield bytes(chunk[:n])
+        size -= n
+
+
+def binary_chunks(size):
+    """
+    fixed size records like a binary table dump: a counter, a small int, a float and a flags byte
+    :param size: the number of bytes
+    :return: generator of bytes chunks
+    """
+    rng = random.Random(SEED)
+    record = struct.Struct('<IhdB')
+    counter = 0
+    while size > 0:
+        b = bytearray()
+        while len(b) < min(size, CHUNK_SIZE):
+            b += record.pack(counter, rng.randrange(-500, 500), rng.gauss(100.0, 15.0), rng.choice((0, 1, 3, 128)))
+            counter += 1
+        n = min(size, len(b))
+        yield bytes(b[:n])
+        size -= n
+
+
+def sample_chunks(size=None):
+    """
+    sample.txt, at its own size
+    :param size: ignored
+    :return: generator of bytes chunks
+    """
+    with open(SAMPLE_PATH, 'rb') as file:
+        while True:
+            chunk = file.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+
+# corpus name -> (generator of chunks for a size, True if the corpus has a fixed size)
+CORPORA = {
+    'sample': (sample_chunks, True),
+    'random': (random_chunks, False),
+    'repetitive': (repetitive_chunks, False),
+    'binary': (binary_chunks, False),
+}
+
+
+def write_corpus(name, size, path):
+    """
+    :param name: a key of CORPORA
+    :param size: the number of bytes (ignored by fixed size corpora)
+    :param path: the file to write the corpus to
+    :return: the number of bytes written
+    """
+    chunks, _ = CORPORA[name]
+    n_bytes = 0
+    with open(path, 'wb') as file:
+        for chunk in chunks(size):
+            file.write(chunk)
+            n_bytes += len(chunk)
+    return n_bytes
@@ -0,0 +1,202 @@
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from benchmark.corpora import CORPORA, write_corpus
+from utils.codec_names import MB, codec_class, parse_size
+
+try:
+    import resource
+except ImportError:  # windows, peak rss is not reported
+    resource = None
+
+
+# codec name (a key of utils.codec_names.CODECS) -> (compress method, decompress method) of its file methods
+FILE_METHODS = {
+    'huffman': ('compress', 'decompress'),
+    'lzw': ('lzw_compress', 'lzw_decompress'),
+    'lzw_huffman': ('compress', 'decompress'),
+    'auto': ('compress', 'decompress'),
+}
+
+# the codecs benchmarked
+CODECS = tuple(FILE_METHODS)
+
+# the default sizes of the synthetic corpora. 100 MB takes minutes per codec, it is run only if asked (--sizes)
+DEFAULT_SIZES = (1 << 10, 1 << 20, 10 << 20)
+
+# a result is a regression when its speed drops below this fraction of the baseline
+SPEED_TOLERANCE = 0.9
+
+# ... or when its compressed size grows above this fraction of the baseline
+SIZE_TOLERANCE = 1.01
+
+
+def peak_rss_mb():
+    """
+    :return: the peak resident set size of this process in MB. None: not available on this platform
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on mac os
+    return peak / MB if sys.platform == 'darwin' else peak / 1024
+
+
+def run_case(codec_name, path, repeat, mapped=None):
+    """
+    compressing and decompressing a file with one codec. run in a new process, so the peak rss is of this case only.
+    :param codec_name: a key of FILE_METHODS
+    :param path: the corpus file
+    :param repeat: the number of runs, the fastest is reported
+    :param mapped: True: every file is coded piece by piece between memory mapped files, False: every file is coded
+    in memory. None: by size (see utils.container.use_mapped)
+    :return: dict of the measures
+    """
+    if mapped is not None:
+        from utils import container
+        container.MAPPED_FILE_BYTES = 0 if mapped else float('inf')
+    compress_name, decompress_name = FILE_METHODS[codec_name]
+    codec = codec_class(codec_name)
+
+    compress_time = decompress_time = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        compressed_path = getattr(codec(path=path), compress_name)()
+        compress_time = min(compress_time, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        decompressed_path = getattr(codec(path=path), decompress_name)(compressed_path)
+        decompress_time = min(decompress_time, time.perf_counter() - start)
+
+    with open(path, 'rb') as original, open(decompressed_path, 'rb') as decompressed:
+        round_trip = original.read() == decompressed.read()
+    original_size = os.path.getsize(path)
+    compressed_size = os.path.getsize(compressed_path)
+    os.remove(compressed_path)
+    os.remove(decompressed_path)
+
+    return {
+        'original_size': original_size,
+        'compressed_size': compressed_size,
+        'ratio': original_size / compressed_size,
+        'compress_mb_s': original_size / MB / compress_time,
+        'decompress_mb_s': original_size / MB / decompress_time,
+        'peak_rss_mb': peak_rss_mb(),
+        'round_trip': round_trip,
+    }
+
+
+def run(codecs=tuple(CODECS), corpora=tuple(CORPORA), sizes=DEFAULT_SIZES, repeat=1, progress=None,
+        compare_mapped=False):
+    """
+    running every codec over every corpus and size, each case in a new process
+    :param codecs: names of CODECS to run
+    :param corpora: names of CORPORA to run
+    :param sizes: the sizes in bytes of the synthetic corpora
+    :param repeat: the number of runs of each case, the fastest is reported
+    :param progress: function called with each result as it is done. None: no progress
+    :param compare_mapped: running each case in memory, then again between memory mapped files:
+    the result gets mapped_peak_rss_mb, mapped_compress_mb_s and mapped_decompress_mb_s
+    :return: list of result dicts (codec, corpus, size + the measures of run_case)
+    """
+    results = []
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as directory:
+        for corpus in corpora:
+            _, fixed_size = CORPORA[corpus]
+            for size in (None,) if fixed_size else sizes:
+                path = os.path.join(directory, f'{corpus}_{size}.dat')
+                size = write_corpus(corpus, size, path)
+                for codec in codecs:
+                    with context.Pool(1) as pool:
+                        result = {'codec': codec, 'corpus': corpus, 'size': size}
+                        result.update(pool.apply(run_case, (codec, path, repeat, False if compare_mapped else None)))
+                    if compare_mapped:
+                        with context.Pool(1) as pool:
+                            mapped = pool.apply(run_case, (codec, path, repeat, True))
+                        for measure in ('peak_rss_mb', 'compress_mb_s', 'decompress_mb_s'):
+                            result['mapped_' + measure] = mapped[measure]
+                        result['round_trip'] = result['round_trip'] and mapped['round_trip']
+                    results.append(result)
+                    if progress is not None:
+                        progress(result)
+                os.remove(path)
+    return results
+
+
+def result_key(result):
+    """
+    :param result: a result dict
+    :return: the key matching a result to its baseline
+    """
+    return result['codec'], result['corpus'], result['size']
+
+
+def compare(results, baseline):
+    """
+    :param results: list of result dicts
+    :param baseline: list of result dicts of a saved run
+    :return: list of (result, baseline result, list of regression messages) for the results found in baseline
+    """
+    baseline = {result_key(result): result for result in baseline}
+    comparisons = []
+    for result in results:
+        before = baseline.get(result_key(result))
+        if before is None:
+            continue
+        regressions = []
+        if not result['round_trip']:
+            regressions.append('round trip failed')
+        for measure in ('compress_mb_s', 'decompress_mb_s'):
+            if result[measure] < before[measure] * SPEED_TOLERANCE:
+                regressions.append(f'{measure} {before[measure]:.2f} -> {result[measure]:.2f}')
+        if result['compressed_size'] > before['compressed_size'] * SIZE_TOLERANCE:
+            regressions.append(f"compressed_size {before['compressed_size']} -> {result['compressed_size']}")
+        comparisons.append((result, before, regressions))
+    return comparisons
+
+
+def format_result(result):
+    """
+    :param result: a result dict
+    :return: one line of the report table
+    """
+    rss = result['peak_rss_mb']
+    line = (f"{result['codec']:<12} {result['corpus']:<11} {result['size']:>11} {result['ratio']:>7.2f} "
+            f"{result['compress_mb_s']:>9.2f} {result['decompress_mb_s']:>9.2f} "
+            f"{'-' if rss is None else f'{rss:.1f}':>8} {'ok' if result['round_trip'] else 'FAILED':>6}")
+    if 'mapped_peak_rss_mb' in result:
+        mapped_rss = result['mapped_peak_rss_mb']
+        difference = '-' if rss is None else f'{mapped_rss - rss:+.1f}'
+        line += (f" {result['mapped_compress_mb_s']:>9.2f} {result['mapped_decompress_mb_s']:>9.2f} "
+                 f"{'-' if mapped_rss is None else f'{mapped_rss:.1f}':>8} {difference:>9}")
+    return line
+
+
+REPORT_HEADER = (f"{'codec':<12} {'corpus':<11} {'size':>11} {'ratio':>7} {'comp MB/s':>9} {'dec MB/s':>9} "
+                 f"{'rss MB':>8} {'check':>6}")
+
+# the columns added by run(compare_mapped=True): the speeds and peak rss between memory mapped files
+MAPPED_REPORT_HEADER = f" {'mmap comp':>9} {'mmap dec':>9} {'mmap rss':>8} {'rss diff':>9}"
+
+
+def save(results, path):
+    """
+    :param results: list of result dicts
+    :param path: json file to write
+    :return: None
+    """
+    with open(path, 'w') as file:
+        json.dump(results, file, indent=2)
+
+
+def load(path):
+    """
+    :param path: json file written by save
+    :return: list of result dicts
+    """
+    with open(path) as file:
+        return json.load(file)
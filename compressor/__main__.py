@@ -0,0 +1,376 @@
+import argparse
+import io
+import os
+import sys
+import time
+from functools import partial
+from utils.codec_names import CODECS, CODEC_NAMES, EXTENSION, MB, codec_class, parse_size
+from utils.container import BLOCK_SIZE, INDEPENDENT, STREAM, WRITE_BUFFER_SIZE, Header, decompress_blocks
+
+
+# the codec modules are imported when a command needs one (see get_codec), so a run on a tiny file is not
+# dominated by the imports of the codecs it does not use
+
+# the levels of the auto codec, compressor.compressor.LEVELS (not imported: it imports every codec)
+LEVELS = ('fast', 'balanced', 'max')
+
+# the extension of a file decompressed from a name without EXTENSION
+DECOMPRESSED_EXTENSION = '.out'
+
+# the min seconds between two progress lines
+PROGRESS_SECONDS = 0.5
+
+# a file given as - is stdin / stdout
+STDIO = '-'
+
+
+def get_codec(codec_name, level=None, block_size=BLOCK_SIZE):
+    """
+    :param codec_name: a key of utils.codec_names.CODECS
+    :param level: the level of the auto codec (LEVELS). None: its default
+    :param block_size: the max number of bytes in a block of the auto codec
+    :return: a new codec object, its module imported on first use
+    """
+    if codec_name == 'auto':
+        options = {'block_size': block_size}
+        if level is not None:
+            options['level'] = level
+        return codec_class(codec_name)(path=None, **options)
+    return codec_class(codec_name)(path=None)
+
+
+class Progress:
+    def __init__(self, file, name, total=None, output=None):
+        """
+        a file object counting the bytes read from / written to file, and printing the MB/s to output
+        :param file: binary file object
+        :param name: the name printed in front of the progress
+        :param total: the number of bytes expected, to print the percent done. None: unknown (a pipe)
+        :param output: text file for the progress lines (sys.stderr). None: nothing is printed
+        """
+        self.file = file
+        self.name = name
+        self.total = total
+        self.output = output
+        self.count = 0
+        self.start = time.perf_counter()
+        self.last = self.start
+
+    def read(self, size=-1):
+        data = self.file.read(size)
+        self.update(len(data))
+        return data
+
+    def read1(self, size=-1):
+        data = self.file.read1(size)
+        self.update(len(data))
+        return data
+
+    def write(self, data):
+        self.update(len(data))
+        return self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+    def update(self, n_bytes):
+        """
+        :param n_bytes: the number of bytes just read / written
+        :return: None. printing a progress line at most every PROGRESS_SECONDS
+        """
+        self.count += n_bytes
+        if self.output is None:
+            return
+        now = time.perf_counter()
+        if now - self.last >= PROGRESS_SECONDS:
+            self.last = now
+            self.output.write('\r' + self.format(now))
+            self.output.flush()
+
+    def seconds(self):
+        """
+        :return: the seconds since the file was opened
+        """
+        return time.perf_counter() - self.start
+
+    def format(self, now):
+        """
+        :param now: time.perf_counter()
+        :return: the progress line: MB done, percent of total, MB/s
+        """
+        seconds = now - self.start
+        line = f'{self.name}: {self.count / MB:.1f} MB'
+        if self.total:
+            line += f' ({100 * self.count / self.total:.0f}%)'
+        return line + f', {self.count / MB / seconds if seconds else 0.0:.1f} MB/s'
+
+    def close(self):
+        """
+        :return: None. ending the progress line (the file is closed by its owner)
+        """
+        if self.output is not None and self.last != self.start:
+            self.output.write('\r' + self.format(time.perf_counter()) + '\n')
+            self.output.flush()
+
+
+def compress_file(codec, reader, writer, workers=1, block_size=BLOCK_SIZE):
+    """
+    :param codec: codec object (see get_codec)
+    :param reader: binary file like object to compress
+    :param writer: binary file like object for the compressed stream
+    :param workers: the number of processes. 1: no pool, a codec keeping state between blocks (lzw) uses it
+    :param block_size: the max number of bytes in a block
+    :return: the number of bytes compressed
+    """
+    if workers == 1:
+        return codec.compress_stream(reader, writer, block_size=block_size)
+    # the blocks are coded independently: lzw starts a new dictionary every block
+    return codec.compress_parallel(reader, writer, workers=workers, block_size=block_size)
+
+
+def decompress_file(reader, writer, workers=1):
+    """
+    decompressing a stream or a file written by compress / compress_bytes, with the codec its header names
+    :param reader: binary file like object with the compressed data
+    :param writer: binary file like object for the decompressed data
+    :param workers: the number of processes decoding independent blocks. 1: no pool
+    :return: the number of bytes decompressed
+    """
+    header = Header.read(reader)
+    if header.codec_id not in CODEC_NAMES:
+        raise ValueError(f'unknown codec id {header.codec_id}')
+    codec = get_codec(CODEC_NAMES[header.codec_id])
+
+    if not header.flags & STREAM:
+        # a file compressed at once holds its length and checksum in the header
+        decoded = codec.decompress_bytes(header.to_bytes() + reader.read())
+        writer.write(decoded)
+        return len(decoded)
+
+    decompress_block = codec.stream_block_decoder(header)
+    if workers == 1 or not header.flags & INDEPENDENT:
+        return decompress_blocks(reader, writer, header, decompress_block)
+
+    from concurrent.futures import ProcessPoolExecutor
+    from utils.parallel import BLOCKS_PER_WORKER, ordered_map
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        map_blocks = partial(ordered_map, executor, window=workers * BLOCKS_PER_WORKER)
+        return decompress_blocks(reader, writer, header, decompress_block, map_blocks=map_blocks)
+
+
+class NullWriter:
+    """
+    a binary writer dropping the data, for testing a compressed file
+    """
+    def write(self, data):
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def open_input(path):
+    """
+    :param path: a file path, or STDIO
+    :return: (binary file object with a WRITE_BUFFER_SIZE buffer, its size or None for stdin)
+    """
+    if path == STDIO:
+        return open(sys.stdin.fileno(), 'rb', buffering=WRITE_BUFFER_SIZE, closefd=False), None
+    return open(path, 'rb', buffering=WRITE_BUFFER_SIZE), os.path.getsize(path)
+
+
+def open_output(path, force=False):
+    """
+    :param path: a file path, or STDIO
+    :param force: overwriting an existing file
+    :return: binary file object with a WRITE_BUFFER_SIZE buffer
+    """
+    if path == STDIO:
+        return open(sys.stdout.fileno(), 'wb', buffering=WRITE_BUFFER_SIZE, closefd=False)
+    if not force and os.path.exists(path):
+        raise FileExistsError(f'{path} already exists, use -f to overwrite it')
+    return open(path, 'wb', buffering=WRITE_BUFFER_SIZE)
+
+
+def output_path(command, path, args):
+    """
+    :param command: 'compress' / 'decompress'
+    :param path: the input path, or STDIO
+    :param args: the parsed arguments (stdout, output)
+    :return: the output path, or STDIO
+    """
+    if args.stdout:
+        return STDIO
+    if args.output:
+        return args.output
+    if path == STDIO:
+        return STDIO
+    if command == 'compress':
+        return path + EXTENSION
+    return path[:-len(EXTENSION)] if path.endswith(EXTENSION) else path + DECOMPRESSED_EXTENSION
+
+
+def run_file(command, path, args, progress_output):
+    """
+    compress / decompress / test one file
+    :param command: 'compress' / 'decompress' / 'test'
+    :param path: the input path, or STDIO
+    :param args: the parsed arguments
+    :param progress_output: text file for the progress lines. None: no progress
+    :return: (bytes read, bytes written, seconds)
+    """
+    name = 'stdin' if path == STDIO else path
+    reader, size = open_input(path)
+    try:
+        if command == 'compress':
+            codec = get_codec(args.codec, args.level, args.block_size)
+            with open_output(output_path(command, path, args), args.force) as writer:
+                progress = Progress(reader, name, size, progress_output)
+                compress_file(codec, progress, writer, args.workers, args.block_size)
+                writer.flush()
+                progress.close()
+                return progress.count, writer.tell() if writer.seekable() else None, progress.seconds()
+
+        # decompress / test: the progress is of the output, whose size is known only at the end
+        writer = NullWriter() if command == 'test' else open_output(output_path(command, path, args), args.force)
+        try:
+            progress = Progress(writer, name, output=progress_output)
+            decompress_file(reader, progress, args.workers)
+            writer.flush()
+            progress.close()
+            return size, progress.count, progress.seconds()
+        finally:
+            if command != 'test':
+                writer.close()
+    finally:
+        reader.close()
+
+
+def format_result(command, name, size_in, size_out, seconds):
+    """
+    :param command: 'compress' / 'decompress' / 'test'
+    :param name: the input path
+    :param size_in: the bytes read. None: unknown
+    :param size_out: the bytes written. None: unknown (a pipe)
+    :param seconds: the wall time
+    :return: one line of the sizes, ratio and MB/s
+    """
+    original = size_in if command == 'compress' else size_out
+    compressed = size_out if command == 'compress' else size_in
+    line = f'{name}: {command} ok' if command == 'test' else f'{name}:'
+    if original is not None and compressed is not None:
+        line += f' {original} <-> {compressed} bytes, ratio {original / compressed if compressed else 0.0:.2f},'
+    return line + f' {seconds:.2f} s, {original / MB / seconds if seconds else 0.0:.2f} MB/s'
+
+
+def benchmark(paths, codec_names, args):
+    """
+    compressing and decompressing every file in memory with every codec, through the same code as the commands
+    :param paths: file paths, or STDIO
+    :param codec_names: keys of utils.codec_names.CODECS
+    :param args: the parsed arguments (workers, block_size, level, repeat)
+    :return: True if every round trip gave the data back
+    """
+    print(f"{'file':<24} {'codec':<12} {'size':>11} {'ratio':>7} {'comp MB/s':>10} {'decomp MB/s':>12}  check")
+    ok = True
+    for path in paths:
+        reader, _ = open_input(path)
+        with reader:
+            data = reader.read()
+        for codec_name in codec_names:
+            compress_seconds = decompress_seconds = float('inf')
+            for _ in range(args.repeat):
+                compressed = io.BytesIO()
+                start = time.perf_counter()
+                compress_file(get_codec(codec_name, args.level, args.block_size), io.BytesIO(data), compressed,
+                              args.workers, args.block_size)
+                compress_seconds = min(compress_seconds, time.perf_counter() - start)
+
+                decompressed = io.BytesIO()
+                start = time.perf_counter()
+                decompress_file(io.BytesIO(compressed.getvalue()), decompressed, args.workers)
+                decompress_seconds = min(decompress_seconds, time.perf_counter() - start)
+
+            round_trip = decompressed.getvalue() == data
+            ok = ok and round_trip
+            size = len(compressed.getvalue())
+            print(f"{os.path.basename(path) if path != STDIO else 'stdin':<24} {codec_name:<12} {size:>11} "
+                  f"{len(data) / size if size else 0.0:>7.2f} {len(data) / MB / compress_seconds:>10.2f} "
+                  f"{len(data) / MB / decompress_seconds:>12.2f}  {'ok' if round_trip else 'FAILED'}", flush=True)
+    return ok
+
+
+def main(argv=None):
+    """
+    python -m compressor compress [-c codec] [-l level] [-j workers] [-b block size] [-o output | --stdout] files
+    python -m compressor decompress [-j workers] [-o output | --stdout] files
+    python -m compressor test files
+    python -m compressor benchmark [-c codec ...] [-j workers] [-b block size] [--repeat n] files
+    a missing file or - reads stdin and writes stdout
+    :param argv: the command line arguments. None: sys.argv
+    :return: the exit code
+    """
+    parser = argparse.ArgumentParser(prog='python -m compressor',
+                                     description='compress / decompress files or stdin to stdout')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    compress = commands.add_parser('compress', help=f'compress files to path{EXTENSION}')
+    compress.add_argument('-c', '--codec', choices=list(CODECS), default='auto')
+    decompress = commands.add_parser('decompress', help=f'decompress files, removing {EXTENSION}')
+    test = commands.add_parser('test', help='decompress files and check them, writing nothing')
+    bench = commands.add_parser('benchmark', help='compress and decompress files in memory, print MB/s and ratio')
+    bench.add_argument('-c', '--codecs', nargs='+', choices=list(CODECS), default=list(CODECS))
+    bench.add_argument('--repeat', type=int, default=1, help='runs of each case, the fastest is reported')
+
+    for command in (compress, decompress, test, bench):
+        command.add_argument('paths', nargs='*', default=[STDIO], help='the files, - or none: stdin')
+        command.add_argument('-j', '--workers', type=int, default=1,
+                             help='the number of processes coding independent blocks, 0: cpus, default: 1')
+    for command in (compress, bench):
+        command.add_argument('-l', '--level', choices=LEVELS, help='the level of the auto codec, default: balanced')
+        command.add_argument('-b', '--block-size', type=parse_size, default=BLOCK_SIZE,
+                             help='the max bytes in a block, e.g. 64K, 4M, default: 1M')
+    for command in (compress, decompress):
+        command.add_argument('-o', '--output', help='the output file, for one input')
+        command.add_argument('--stdout', action='store_true', help='write to stdout')
+        command.add_argument('-f', '--force', action='store_true', help='overwrite existing output files')
+    for command in (compress, decompress, test):
+        command.add_argument('-v', '--verbose', action='store_true', help='print the ratio and MB/s of every file')
+        command.add_argument('--progress', action='store_true',
+                             help='print the MB/s while coding, default: when stderr is a terminal')
+    args = parser.parse_args(argv)
+    args.workers = args.workers or os.cpu_count() or 1
+    if args.command == 'compress' and args.level and args.codec != 'auto':
+        parser.error('-l is the level of the auto codec, it can not be used with -c ' + args.codec)
+    if args.command == 'benchmark' and args.level and 'auto' not in args.codecs:
+        parser.error('-l is the level of the auto codec, add auto to -c')
+
+    try:
+        if args.command == 'benchmark':
+            return 0 if benchmark(args.paths, args.codecs, args) else 1
+
+        if args.command != 'test' and args.output and len(args.paths) > 1:
+            parser.error('-o takes one input file')
+        show_progress = args.progress or sys.stderr.isatty()
+        failed = False
+        for path in args.paths:
+            try:
+                size_in, size_out, seconds = run_file(args.command, path, args, sys.stderr if show_progress else None)
+            except ValueError as error:
+                if args.command != 'test':
+                    raise
+                print(f'{path}: {error}', file=sys.stderr)
+                failed = True
+                continue
+            if args.verbose:
+                print(format_result(args.command, path, size_in, size_out, seconds), file=sys.stderr)
+        return 1 if failed else 0
+    except (OSError, ValueError) as error:
+        print(f'error: {error}', file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == '__main__':
+    sys.exit(main())
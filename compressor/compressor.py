@@ -0,0 +1,282 @@
+import io
+import logging
+import os
+from collections import Counter
+from huffman.huffman import Huffman_Coding
+from lzw.lzw_coding import LZW_Coding
+from lzw_huffman.lzw_huffman import Lempel_Ziv_Huffman_Coding
+from utils.code_cache import entropy_bits
+from utils.container import Header, AUTO, HUFFMAN, LZW, LZW_HUFFMAN, STREAM, INDEPENDENT, BLOCK_SIZE, \
+    WRITE_BUFFER_SIZE, compress_blocks, decompress_blocks
+from utils.instrumentation import stage
+from utils.lzw_dictionary import FIRST_CODE, MAX_BITS, MIN_BITS, LZWEncoder
+from utils.codec_mixins import ParallelMixin
+
+
+logger = logging.getLogger(__name__)
+
+# levels: fast picks stored / huffman from the byte histogram, balanced estimates every method on a sample of the
+# block, max compresses the block with every method and keeps the smallest (unless the block looks incompressible)
+FAST = 'fast'
+BALANCED = 'balanced'
+MAX = 'max'
+LEVELS = (FAST, BALANCED, MAX)
+
+# the method of a block, its first payload byte: stored raw, or the codec id of the codec that coded it
+STORED = 0
+METHOD_NAMES = {STORED: 'stored', HUFFMAN: 'huffman', LZW: 'lzw', LZW_HUFFMAN: 'lzw_huffman'}
+
+# the codec class of each method, a new object codes every block so the blocks are independent
+METHOD_CODECS = {HUFFMAN: Huffman_Coding, LZW: LZW_Coding, LZW_HUFFMAN: Lempel_Ziv_Huffman_Coding}
+
+# the methods are estimated on SAMPLE_SLICES slices spread over the block, SAMPLE_BYTES in total
+SAMPLE_BYTES = 1 << 14
+SAMPLE_SLICES = 4
+
+# a block estimated (or coded) to more than STORED_RATIO of its size is stored
+STORED_RATIO = 0.98
+
+# balanced picks lzw+huffman, the slowest method both ways, only if it is estimated that much smaller than the others
+BALANCED_GAIN = 0.9
+
+
+def sample(block, sample_bytes=SAMPLE_BYTES, n_slices=SAMPLE_SLICES):
+    """
+    :param block: bytes like object
+    :param sample_bytes: the max length of the sample
+    :param n_slices: the number of slices, spread evenly over block
+    :return: bytes - block if it is short, else n_slices slices of it joined
+    """
+    if len(block) <= sample_bytes:
+        return bytes(block)
+    slice_bytes = sample_bytes // n_slices
+    step = (len(block) - slice_bytes) // (n_slices - 1)
+    return b''.join(block[i * step:i * step + slice_bytes] for i in range(n_slices))
+
+
+def lzw_bits(n_codes, max_bits):
+    """
+    :param n_codes: the number of codes of a block
+    :param max_bits: the max code width
+    :return: the number of bits of the codes: the width grows with the dictionary, one key per code
+    """
+    bits = 0
+    first = 0
+    width = MIN_BITS
+    while first < n_codes:
+        # the dictionary has FIRST_CODE + i keys when code i is written
+        last = n_codes if width >= max_bits else min(n_codes, (1 << width) - FIRST_CODE)
+        bits += (last - first) * width
+        first = last
+        width += 1
+    return bits
+
+
+def estimate_ratios(data, max_bits, lzw=True):
+    """
+    estimating the compressed size of data with each method, from the entropy of its histograms
+    :param data: bytes, a sample of a block
+    :param max_bits: the max lempel-ziv code width
+    :param lzw: estimating the lempel-ziv methods too, by coding data
+    :return: dict method -> the estimated compressed size / len(data)
+    """
+    n_bits = len(data) * 8
+    ratios = {HUFFMAN: entropy_bits(Counter(data)) / n_bits}
+    if lzw:
+        codes = LZWEncoder(max_bits=max_bits).encode(data)
+        ratios[LZW] = lzw_bits(len(codes), max_bits) / n_bits
+        ratios[LZW_HUFFMAN] = entropy_bits(Counter(codes)) / n_bits
+    return ratios
+
+
+def choose_method(ratios):
+    """
+    :param ratios: dict method -> estimated compressed size / original size (see estimate_ratios)
+    :return: the method of the balanced level
+    """
+    method = min((HUFFMAN, LZW), key=lambda key: ratios.get(key, 1.0))
+    if LZW_HUFFMAN in ratios and ratios[LZW_HUFFMAN] < ratios[method] * BALANCED_GAIN:
+        method = LZW_HUFFMAN
+    return method if ratios[method] <= STORED_RATIO else STORED
+
+
+class Compressor(ParallelMixin):
+    CODEC_ID = AUTO
+
+    def __init__(self, path=None, level=BALANCED, stats=None, max_bits=MAX_BITS, block_size=BLOCK_SIZE):
+        """
+        one front-end for the three codecs: every block is stored or coded with the method the level picks for it,
+        the method is the first byte of the block payload. the blocks are independent, so a compressed file can
+        also be decompressed in parallel and read at random (open_seekable).
+        :param path: file path to compress
+        :param level: FAST / BALANCED / MAX
+        :param stats: utils.instrumentation.Stats recording every stage of the pipeline. None: no instrumentation
+        :param max_bits: the max code width of the lempel-ziv methods
+        :param block_size: the max number of bytes in a block
+        """
+        if level not in LEVELS:
+            raise ValueError(f'unknown level {level!r}, expected one of {", ".join(LEVELS)}')
+        self.path = path
+        self.level = level
+        self.stats = stats
+        self.max_bits = max_bits
+        self.block_size = block_size
+
+    def compress(self):
+        """
+        compress the file located in self.path, block after block
+        :return: the output path: filename + ".auto.bin"
+        """
+        filename, file_extension = os.path.splitext(self.path)
+        output_path = filename + ".auto.bin"
+        with open(self.path, 'rb') as file, open(output_path, 'wb', buffering=WRITE_BUFFER_SIZE) as output:
+            self.compress_stream(file, output)
+        logger.info("Compressed")
+        return output_path
+
+    def decompress(self, input_path):
+        """
+        decompress input_file, block after block
+        :param input_path: the file to decompress
+        :return: the output path: filename + "_decompressed_auto.txt"
+        """
+        filename, file_extension = os.path.splitext(self.path)
+        output_path = filename + "_decompressed_auto" + ".txt"
+        with open(input_path, 'rb') as file, open(output_path, 'wb', buffering=WRITE_BUFFER_SIZE) as output:
+            self.decompress_stream(file, output)
+        logger.info("Decompressed")
+        return output_path
+
+    def compress_bytes(self, data):
+        """
+        compress in memory
+        :param data: bytes like object (bytes, bytearray, memoryview ...)
+        :return: bytes - the header followed by the blocks and their index
+        """
+        output = io.BytesIO()
+        self.compress_stream(io.BytesIO(data), output)
+        return output.getvalue()
+
+    def decompress_bytes(self, data):
+        """
+        decompress in memory
+        :param data: bytes like object written by compress_bytes / compress / compress_stream / compress_parallel
+        :return: bytes decoded
+        """
+        output = io.BytesIO()
+        self.decompress_stream(io.BytesIO(data), output)
+        return output.getvalue()
+
+    def block_methods(self, block):
+        """
+        :param block: bytes like object
+        :return: list of the methods worth coding block with, best first. an empty list: the block is stored
+        """
+        if not block:
+            return []
+        ratios = estimate_ratios(sample(block), self.max_bits, lzw=self.level != FAST)
+        if self.level == MAX:
+            # every method is tried unless even the best estimate is not worth it
+            return sorted(ratios, key=ratios.get) if min(ratios.values()) <= STORED_RATIO else []
+        method = choose_method(ratios)
+        return [] if method == STORED else [method]
+
+    def block_codec(self, method):
+        """
+        :param method: HUFFMAN / LZW / LZW_HUFFMAN
+        :return: a new codec object, coding one block
+        """
+        if method == HUFFMAN:
+            return Huffman_Coding(path=None, stats=self.stats)
+        return METHOD_CODECS[method](path=None, max_bits=self.max_bits, stats=self.stats)
+
+    def compress_block(self, block):
+        """
+        compress one block with the method the level picks for it, stored if no method makes it smaller
+        :param block: bytes to compress
+        :return: bytes - the method byte followed by the payload of the method
+        """
+        with stage(self.stats, 'choose_method', len(block)):
+            methods = self.block_methods(block)
+
+        best_method, best = STORED, block
+        for method in methods:
+            payload = self.block_codec(method).compress_block(block)
+            if len(payload) < len(best):
+                best_method, best = method, payload
+        logger.debug('block of %d bytes: %s, %d bytes', len(block), METHOD_NAMES[best_method], len(best))
+        return bytes([best_method]) + best
+
+    def decompress_block(self, payload):
+        """
+        :param payload: one block written by compress_block
+        :return: bytes decoded
+        """
+        method = payload[0]
+        body = memoryview(payload)[1:]
+        if method == STORED:
+            return bytes(body)
+        if method not in METHOD_CODECS:
+            raise ValueError(f'unknown block method {method}')
+        return self.block_codec(method).decompress_block(body)
+
+    def compress_stream(self, reader, writer, block_size=None):
+        """
+        compress a binary stream block after block, each block on its own, followed by a block index
+        :param reader: binary file like object to compress (open(path, 'rb'), sys.stdin.buffer ...)
+        :param writer: binary file like object for the compressed stream
+        :param block_size: the max number of bytes read at once. None: self.block_size
+        :return: the number of bytes compressed
+        """
+        return compress_blocks(reader, writer, self.stream_header(), self.compress_block,
+                               block_size or self.block_size)
+
+    def decompress_stream(self, reader, writer):
+        """
+        decompress a stream written by compress_stream, block after block
+        :param reader: binary file like object with the compressed stream
+        :param writer: binary file like object for the decompressed data
+        :return: the number of bytes decompressed
+        """
+        header = Header.read(reader, codec_id=AUTO)
+        return decompress_blocks(reader, writer, header, self.stream_block_decoder(header))
+
+    def stream_header(self):
+        """
+        starting a stream of compress_block calls
+        :return: the Header of the stream
+        """
+        return Header(AUTO, flags=INDEPENDENT, params=bytes([self.max_bits, LEVELS.index(self.level)]))
+
+    def stream_block_decoder(self, header):
+        """
+        starting the decompress of a stream
+        :param header: the Header read from the stream
+        :return: function payload -> bytes decoding the blocks of the stream in order
+        """
+        if header.codec_id != AUTO:
+            raise ValueError(f'file was compressed with codec {header.codec_id}, expected {AUTO}')
+        if not header.flags & STREAM:
+            raise ValueError('not a compressed stream')
+        self.max_bits = header.params[0]
+        return self.decompress_block
+
+    def compress_parallel(self, reader, writer, workers=None, block_size=None):
+        """
+        compress a binary stream in independent blocks on a process pool, the same layout as compress_stream
+        :param reader: binary file like object to compress
+        :param writer: binary file like object for the compressed stream
+        :param workers: the number of processes. None: os.cpu_count()
+        :param block_size: the max number of bytes in a block. None: self.block_size
+        :return: the number of bytes compressed
+        """
+        return super().compress_parallel(reader, writer, workers, block_size or self.block_size)
+
+    def options(self, header=None):
+        """
+        :param header: the Header of a compressed stream. None: the settings of this codec
+        :return: dict of keyword arguments for the constructor of a worker (the method is in every block)
+        """
+        if header is None:
+            return {'level': self.level, 'max_bits': self.max_bits}
+        return {'max_bits': header.params[0]}
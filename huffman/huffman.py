@@ -1,26 +1,61 @@
-import heapq
+import io
+import logging
 import os
-from utils.heap_node import HeapNode
-from utils.bytes_utils import pad_encoded_text, remove_padding, get_byte_array
+from functools import partial
+from utils.huffman_tree import HuffmanTree
+from utils import numpy_huffman
+from utils.bit_io import BitWriter, BitReader
+from utils.canonical_huffman import MAX_CODE_LENGTH, canonical_codes, limit_code_lengths, DecodeTable
+from utils.adaptive_huffman import AdaptiveHuffmanModel
+from utils.container import Header, ADAPTIVE, INDEPENDENT, HUFFMAN, STREAM, BLOCK_SIZE, WRITE_BUFFER_SIZE, \
+    MAPPED_CHUNK_BYTES, MappedWriter, checksum, pack_code_lengths, unpack_code_lengths, compress_blocks, \
+    decompress_blocks, map_file, use_mapped, write_padded_chunks, iter_chunks
+from utils.instrumentation import stage
+from utils.parallel import decompress_block_task
+from utils.codec_mixins import ParallelMixin, MessageMixin
 
 
-class Huffman_Coding:
-    def __init__(self, path):
+logger = logging.getLogger(__name__)
+
+# the default max block size of compress_adaptive, small so a live stream is sent with little delay
+ADAPTIVE_BLOCK_SIZE = 1 << 14
+
+
+class Huffman_Coding(ParallelMixin, MessageMixin):
+    CODEC_ID = HUFFMAN
+
+    def __init__(self, path, stats=None, max_code_length=MAX_CODE_LENGTH, code_cache=None):
         """
         :param path: file path to compress
+        :param stats: utils.instrumentation.Stats recording every stage of the pipeline. None: no instrumentation
+        :param max_code_length: the max huffman code length, longer codes are shortened
+        :param code_cache: utils.code_cache.CodeCache reusing the codes of similar data, may be shared by many codecs.
+        None: a code is built for every file / block
         """
 
         self.path = path
-        self.heap = []
+        self.stats = stats
+        self.max_code_length = max_code_length
+        self.code_cache = code_cache
+        self.tree = None
         self.frequency = {}
+        self.code_lengths = {}
         self.codes = {}
-        self.reverse_mapping = {}
+        self.decode_table = None
+        self.model = None
 
     def make_frequency_dict(self, text):
         """
         :param text: text to count the frequency of each character
         :return: None saved to self.frequency
         """
+        if numpy_huffman.enabled(text):
+            frequency = numpy_huffman.count_frequency(text)
+            if frequency is not None:
+                for character, count in frequency.items():
+                    self.frequency[character] = self.frequency.get(character, 0) + count
+                return
+
         for character in text:
             try:
                 self.frequency[character] += 1
@@ -29,137 +64,355 @@ class Huffman_Coding:
 
     def make_heap(self):
         """
-        creating heap: node for each character value is the frequency.
-        :return: None saved to self.heap
+        creating the leaves of the tree: node for each character value is the frequency.
+        :return: None saved to self.tree
         """
-        for key, frq in self.frequency.items():
-            node = HeapNode(key, frq)
-            heapq.heappush(self.heap, node)
+        self.tree = HuffmanTree(self.frequency)
 
     def merge_nodes(self):
         """
-        mearging each 2 nodes(node characters) in heap with the lowest frequencies until no 2 nodes for characters
-        :return: None. saved to self.heap
+        merging each 2 nodes(node characters) in the tree with the lowest frequencies until one root is left
+        :return: None. saved to self.tree
         """
-        while len(self.heap) > 1:
-            node1 = heapq.heappop(self.heap)
-            node2 = heapq.heappop(self.heap)
+        self.tree.merge()
 
-            merged = HeapNode(None, node1.freq + node2.freq)
-            merged.left = node1
-            merged.right = node2
-
-            heapq.heappush(self.heap, merged)
+    def make_codes(self):
+        """
+        creating canonical code for each character
+        :return: None saved to self.codes
+        """
+        if self.tree is not None:
+            self.code_lengths = self.tree.code_lengths()
+        # an alphabet larger than 2 ** max_code_length can not be limited, its codes get the smallest possible limit
+        max_length = max(self.max_code_length, (len(self.code_lengths) - 1).bit_length())
+        self.code_lengths = limit_code_lengths(self.code_lengths, max_length)
+        self.codes = canonical_codes(self.code_lengths)
 
-    def make_codes_helper(self, root, current_code):
+    def get_encoded_text(self, text):
         """
-        recursive method to calculate the code for root
-        :param root: the root of the heap/the sub tree during the recursive
-        :param current_code: the current mode in the path to the character
-        :return: None saved to self.codes and self.reverse_mapping
+        encoding the text to packed bits
+        :param text: the text to encode
+        :return: BitWriter holding the encoded text
         """
-        if root is None:
-            return
+        writer = BitWriter()
+        writer.write_codes(text, self.codes)
+        return writer
 
-        if root.char is not None:
-            self.codes[root.char] = current_code
-            self.reverse_mapping[current_code] = root.char
+    def load_cached_codes(self):
+        """
+        looking a code for self.frequency up in self.code_cache
+        :return: True if a cached code was saved to self.codes, False: the code has to be built
+        """
+        if self.code_cache is None:
+            return False
+        with stage(self.stats, 'code_cache') as record:
+            codes = self.code_cache.lookup(self.frequency, self.max_code_length)
+            record.n_symbols = len(self.frequency)
+        if codes is None:
+            return False
+        self.codes = codes
+        self.code_lengths = {symbol: length for symbol, (_, length) in codes.items()}
+        return True
+
+    def load_code_lengths(self, code_lengths):
+        """
+        rebuilding the codes and decoding tables from the code lengths table
+        :param code_lengths: dict symbol -> code length
+        :return: None saved to self.codes and self.decode_table
+        """
+        self.code_lengths = code_lengths
+        if self.code_cache is not None:
+            self.codes, self.decode_table = self.code_cache.decoder(code_lengths)
             return
+        self.codes = canonical_codes(self.code_lengths)
+        self.decode_table = DecodeTable(self.codes)
 
-        self.make_codes_helper(root.left, current_code + "0")
-        self.make_codes_helper(root.right, current_code + "1")
-
-    def make_codes(self):
+    def build_codes(self, data):
+        """
+        counting the bytes of data and creating a new canonical code for them
+        :param data: bytes like object
+        :return: dict byte -> code length
+        """
+        self.tree = None
+        self.frequency = {}
+        self.code_lengths = {}
+
+        with stage(self.stats, 'make_frequency_dict', len(data)) as record:
+            self.make_frequency_dict(data)
+            record.n_symbols = len(self.frequency)
+        if not self.load_cached_codes():
+            with stage(self.stats, 'make_heap'):
+                self.make_heap()
+            with stage(self.stats, 'merge_nodes'):
+                self.merge_nodes()
+            with stage(self.stats, 'make_codes') as record:
+                self.make_codes()
+                record.n_symbols = len(self.codes)
+            if self.code_cache is not None:
+                self.code_cache.store(self.frequency, self.max_code_length, self.codes)
+        return {symbol: length for symbol, (_, length) in self.codes.items()}
+
+    def encode_bytes(self, data):
         """
-        creating code and the reserve info for each character
-        :return: None saved to self.codes and self.reverse_mapping
+        :param data: bytes like object, counted by build_codes
+        :return: bytes - the encoded data prefixed with the padding info byte
         """
-        root = heapq.heappop(self.heap)
-        current_code = ""
-        self.make_codes_helper(root, current_code)
+        with stage(self.stats, 'get_encoded_text', len(data)) as record:
+            encoded = self.get_encoded_text(data).get_padded_bytes()
+            record.n_symbols = len(data)
+            record.bytes_out = len(encoded)
+        return encoded
 
-    def get_encoded_text(self, text):
+    def compress_bytes(self, data):
         """
-        encoding the text to string of bits
-        :param text: the text to encode
-        :return: the encoded text - bits string
+        compress in memory
+        :param data: bytes like object (bytes, bytearray, memoryview ...)
+        :return: bytes - the header followed by the encoded data
         """
-        encoded_text_list = []
-        for character in text:
-            encoded_text_list.append(self.codes[character])
-        return ''.join(encoded_text_list)
+        data = memoryview(data).cast('B')
+        code_lengths = self.build_codes(data)
+        encoded = self.encode_bytes(data)
+        with stage(self.stats, 'pack_header', len(data)) as record:
+            header = Header(HUFFMAN, len(data), checksum(data), params=pack_code_lengths(code_lengths)).to_bytes()
+            record.bytes_out = len(header)
+        return header + encoded
+
+    def decompress_bytes(self, data):
+        """
+        decompress in memory
+        :param data: bytes like object written by compress_bytes / compress / compress_stream
+        :return: bytes decoded
+        """
+        header, offset = Header.from_bytes(data, codec_id=HUFFMAN)
+        if header.flags & STREAM:
+            output = io.BytesIO()
+            self.decompress_stream(io.BytesIO(data), output)
+            return output.getvalue()
+
+        with stage(self.stats, 'load_code_lengths', len(header.params)) as record:
+            code_lengths, _ = unpack_code_lengths(header.params)
+            self.load_code_lengths(code_lengths)
+            record.n_symbols = len(code_lengths)
+        with stage(self.stats, 'decode_text', len(data) - offset) as record:
+            decoded = self.decode_text(BitReader.from_padded(memoryview(data)[offset:]))
+            record.bytes_out = len(decoded)
+        with stage(self.stats, 'verify', len(decoded)):
+            header.verify(decoded)
+        return decoded
 
     def compress(self):
         """
-        compress the file located in self.path
+        compress the file located in self.path. the file is read as bytes, so any file can be compressed
         :return: None. saving the compressed data into filename + ".bin"
         """
         filename, file_extension = os.path.splitext(self.path)
         output_path = filename + ".bin"
 
-        with open(self.path, 'r+') as file, open(output_path, 'wb') as output:
-            text = file.read()
-
-            # text = text.rstrip()
-
-            self.make_frequency_dict(text)
-            self.make_heap()
-            self.merge_nodes()
-            self.make_codes()
-
-            encoded_text = self.get_encoded_text(text)
+        with open(self.path, 'rb') as file, map_file(file) as data:
+            if use_mapped(len(data)):
+                with open(output_path, 'w+b') as output:
+                    self.compress_mapped(data, output)
+            else:
+                compressed = self.compress_bytes(data)
+                with stage(self.stats, 'write', len(compressed)), open(output_path, 'wb') as output:
+                    output.write(compressed)
 
-            padded_encoded_text = pad_encoded_text(encoded_text)
-
-            b = get_byte_array(padded_encoded_text)
-
-            output.write(bytes(b))
-
-        print("Compressed")
+        logger.info("Compressed")
         return output_path
 
-    def decode_text(self, encoded_text):
+    def compress_mapped(self, data, output):
         """
-        transforming bit string to text
-        :param encoded_text: bits string encoded text
-        :return: text decoded.
+        compress a memory mapped file piece by piece into a memory mapped output, so files larger than the memory
+        can be compressed. the output is the same as compress_bytes
+        :param data: bytes like object (mmap)
+        :param output: binary file object opened for reading and writing ('w+b')
+        :return: the number of bytes written
         """
-        current_code = ""
-        decoded_text_list = []
+        data = memoryview(data).cast('B')
+        code_lengths = self.build_codes(data)
+        with stage(self.stats, 'pack_header', len(data)) as record:
+            header = Header(HUFFMAN, len(data), checksum(data), params=pack_code_lengths(code_lengths)).to_bytes()
+            record.bytes_out = len(header)
+
+        n_bits = sum(self.frequency[symbol] * length for symbol, length in code_lengths.items())
+        writer = MappedWriter(output, len(header) + (n_bits >> 3) + 2)
+        try:
+            writer.write(header)
+            with stage(self.stats, 'get_encoded_text', len(data)) as record:
+                record.bytes_out = write_padded_chunks(writer, lambda bits, chunk: bits.write_codes(chunk, self.codes),
+                                                       iter_chunks(data))
+                record.n_symbols = len(data)
+        finally:
+            writer.close()
+        return writer.tell()
 
-        for bit in encoded_text:
-            current_code += bit
-            if current_code in self.reverse_mapping:
-                decoded_text_list.append(self.reverse_mapping[current_code])
-                current_code = ""
-
-        return ''.join(decoded_text_list)
+    def decode_text(self, encoded_text):
+        """
+        transforming packed bits to bytes using the decoding tables
+        :param encoded_text: BitReader over the encoded bytes
+        :return: bytes decoded.
+        """
+        return bytes(self.decode_table.decode(encoded_text.data, encoded_text.n_bits))
 
     def decompress(self, input_path):
         """
-        decompress input_file
+        decompress input_file. the codes are read from the file header, no state from compress is needed
         :param input_path: the file to decompress
         :return: None. file decompressed saved to filename + "_decompressed" + ".txt"
         """
         filename, file_extension = os.path.splitext(self.path)
         output_path = filename + "_decompressed" + ".txt"
 
-        with open(input_path, 'rb') as file, open(output_path, 'w', newline='') as output:
-            bit_string_list = []
+        with open(input_path, 'rb') as file:
+            header = Header.read(file, codec_id=HUFFMAN)
+            file.seek(0)
+            if header.flags & STREAM:
+                with open(output_path, 'wb', buffering=WRITE_BUFFER_SIZE) as output:
+                    self.decompress_stream(file, output)
+            elif use_mapped(header.original_length):
+                with map_file(file) as data, open(output_path, 'w+b') as output:
+                    self.decompress_mapped(data, output)
+            else:
+                with map_file(file) as data, open(output_path, 'wb') as output:
+                    output.write(self.decompress_bytes(data))
+
+        logger.info("Decompressed")
+        return output_path
 
-            byte = file.read(1)
-            while len(byte) > 0:
-                byte = ord(byte)
-                bits = bin(byte)[2:].rjust(8, '0')
-                bit_string_list.append(bits)
-                byte = file.read(1)
+    def decompress_mapped(self, data, output):
+        """
+        decompress a memory mapped file written by compress / compress_mapped piece by piece into a memory mapped
+        output preallocated to the original length
+        :param data: bytes like object (mmap)
+        :param output: binary file object opened for reading and writing ('w+b')
+        :return: the number of bytes decompressed
+        """
+        header, offset = Header.from_bytes(data, codec_id=HUFFMAN)
+        with stage(self.stats, 'load_code_lengths', len(header.params)) as record:
+            code_lengths, _ = unpack_code_lengths(header.params)
+            self.load_code_lengths(code_lengths)
+            record.n_symbols = len(code_lengths)
+
+        reader = BitReader.from_padded(memoryview(data)[offset:])
+        writer = MappedWriter(output, header.original_length)
+        try:
+            with stage(self.stats, 'decode_text', len(data) - offset) as record:
+                crc = 0
+                position = 0
+                while position < reader.n_bits:
+                    symbols, position = self.decode_table.decode_range(reader.data, reader.n_bits, position,
+                                                                       position + MAPPED_CHUNK_BYTES)
+                    block = bytes(symbols)
+                    crc = checksum(block, crc)
+                    writer.write(block)
+                record.bytes_out = writer.tell()
+            with stage(self.stats, 'verify', writer.tell()):
+                header.check(writer.tell(), crc)
+        finally:
+            writer.close()
+        return writer.tell()
+
+    def compress_block(self, block):
+        """
+        compress one block of a stream with its own huffman code
+        :param block: bytes to compress
+        :return: bytes - the code lengths table followed by the encoded block
+        """
+        return pack_code_lengths(self.build_codes(block)) + self.encode_bytes(block)
 
-            padded_encoded_text = ''.join(bit_string_list)
+    def decompress_block(self, payload):
+        """
+        :param payload: one block written by compress_block
+        :return: bytes decoded
+        """
+        code_lengths, offset = unpack_code_lengths(payload)
+        self.load_code_lengths(code_lengths)
+        return self.decode_text(BitReader.from_padded(memoryview(payload)[offset:]))
 
-            encoded_text = remove_padding(padded_encoded_text)
+    def compress_stream(self, reader, writer, block_size=BLOCK_SIZE):
+        """
+        compress a binary stream block after block, each block with its own huffman code.
+        memory use is bounded by block_size, so stdin / huge files can be compressed.
+        :param reader: binary file like object to compress (open(path, 'rb'), sys.stdin.buffer ...)
+        :param writer: binary file like object for the compressed stream
+        :param block_size: the max number of bytes read at once
+        :return: the number of bytes compressed
+        """
+        return compress_blocks(reader, writer, self.stream_header(), self.compress_block, block_size)
 
-            decompressed_text = self.decode_text(encoded_text)
-            output.write(decompressed_text)
+    def decompress_stream(self, reader, writer):
+        """
+        decompress a stream written by compress_stream, block after block
+        :param reader: binary file like object with the compressed stream
+        :param writer: binary file like object for the decompressed data
+        :return: the number of bytes decompressed
+        """
+        header = Header.read(reader, codec_id=HUFFMAN)
+        return decompress_blocks(reader, writer, header, self.stream_block_decoder(header),
+                                 live=bool(header.flags & ADAPTIVE))
 
-        print("Decompressed")
-        return output_path
+    def stream_header(self):
+        """
+        starting a stream of compress_block calls
+        :return: the Header of the stream
+        """
+        return Header(HUFFMAN)
+
+    def stream_block_decoder(self, header):
+        """
+        starting the decompress of a stream
+        :param header: the Header read from the stream
+        :return: function payload -> bytes decoding the blocks of the stream in order
+        """
+        if header.codec_id != HUFFMAN:
+            raise ValueError(f'file was compressed with codec {header.codec_id}, expected {HUFFMAN}')
+        if header.flags & INDEPENDENT:
+            return partial(decompress_block_task, type(self), self.options(header))
+        if header.flags & ADAPTIVE:
+            self.model = AdaptiveHuffmanModel(max_code_length=header.params[0])
+            return self.decompress_adaptive_block
+        return self.decompress_block
+
+    def options(self, header=None):
+        """
+        :param header: the Header of a compressed stream. None: the settings of this codec
+        :return: dict of keyword arguments for the codec constructor of a worker (the code lengths are in the blocks)
+        """
+        return {} if header is not None else {'max_code_length': self.max_code_length}
+
+    def compress_adaptive_block(self, block):
+        """
+        compress one block of an adaptive stream with the code of the model, then adding the block to the model
+        :param block: bytes to compress
+        :return: bytes - the encoded block, without a code table
+        """
+        writer = BitWriter()
+        writer.write_codes(block, self.model.codes)
+        self.model.update(block)
+        return writer.get_padded_bytes()
+
+    def decompress_adaptive_block(self, payload):
+        """
+        :param payload: one block written by compress_adaptive_block
+        :return: bytes decoded
+        """
+        reader = BitReader.from_padded(payload)
+        block = bytes(self.model.get_decode_table().decode(reader.data, reader.n_bits))
+        self.model.update(block)
+        return block
+
+    def compress_adaptive(self, reader, writer, block_size=ADAPTIVE_BLOCK_SIZE, live=True):
+        """
+        compress a stream in one pass without sending code tables: each block is coded with a code the
+        decompressor rebuilds from the blocks before it (see AdaptiveHuffmanModel), so a block is written as soon
+        as it is read - the first output comes after the first block, not at the end of the stream.
+        decompress_stream / decompress read the result.
+        :param reader: binary file like object to compress (sys.stdin.buffer, a socket file ...)
+        :param writer: binary file like object for the compressed stream
+        :param block_size: the max number of bytes in a block
+        :param live: a block is whatever the reader has available and the writer is flushed after every block
+        :return: the number of bytes compressed
+        """
+        self.model = AdaptiveHuffmanModel(max_code_length=self.max_code_length)
+        header = Header(HUFFMAN, flags=ADAPTIVE, params=bytes([self.max_code_length]))
+        return compress_blocks(reader, writer, header, self.compress_adaptive_block, block_size, live=live)
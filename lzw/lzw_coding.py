@@ -1,21 +1,35 @@
+import io
+import logging
 import os
-from utils.bytes_utils import pad_encoded_text, remove_padding, get_byte_array
+from functools import partial
+from itertools import chain
+from utils.bit_io import BitWriter, BitReader
+from utils.container import Header, INDEPENDENT, LZW, STREAM, BLOCK_SIZE, WRITE_BUFFER_SIZE, MAPPED_CHUNK_BYTES, \
+    MappedWriter, checksum, compress_blocks, decompress_blocks, map_file, use_mapped, write_padded_chunks, iter_chunks
+from utils.instrumentation import stage
+from utils.parallel import decompress_block_task
+from utils.codec_mixins import ParallelMixin, MessageMixin
+from utils.lzw_dictionary import MAX_BITS, LZWEncoder, LZWDecoder
 
 
-ASCII_TO_INT: dict = {i.to_bytes(1, 'big'): i for i in range(256)}
-INT_TO_ASCII: dict = {i: b for b, i in ASCII_TO_INT.items()}
+logger = logging.getLogger(__name__)
 
 
-class LZW_Coding:
-    def __init__(self, path):
+class LZW_Coding(ParallelMixin, MessageMixin):
+    CODEC_ID = LZW
+
+    def __init__(self, path, max_bits=MAX_BITS, stats=None):
         """
         :param path: file path to compress
+        :param max_bits: the max code width. codes start at 9 bits and grow with the dictionary up to max_bits,
+        then the dictionary is kept until the ratio drops and is cleared.
+        :param stats: utils.instrumentation.Stats recording every stage of the pipeline. None: no instrumentation
         """
         self.path = path
-        self.n_bits = None
-        self.keys = ASCII_TO_INT.copy()
-        self.reverse_lzw_mapping = INT_TO_ASCII.copy()
-        self.n_keys = len(ASCII_TO_INT)
+        self.stats = stats
+        self.max_bits = max_bits
+        self.encoder = LZWEncoder(max_bits=max_bits)
+        self.decoder = LZWDecoder(max_bits=max_bits)
 
     def lzw_compress(self):
         """
@@ -26,63 +40,202 @@ class LZW_Coding:
         filename, file_extension = os.path.splitext(self.path)
         output_path = filename + ".lzw.bin"
 
-        with open(self.path, 'rb') as file, open(output_path, 'wb') as output:
-            data = file.read()
-
-            compressed: list = []
-            string = b''
-
-            for symbol in data:
-                string_plus_symbol = string + symbol.to_bytes(1, 'big') # get input symbol.
-                if string_plus_symbol in self.keys:
-                    string = string_plus_symbol
-                else:
-                    compressed.append(self.keys[string])
-                    self.keys[string_plus_symbol] = self.n_keys
-                    self.reverse_lzw_mapping[self.n_keys] = string_plus_symbol
-                    self.n_keys += 1
-                    string = symbol.to_bytes(1, 'big')
-
-            if string in self.keys:
-                compressed.append(self.keys[string])
-            self.n_bits = len(bin(self.n_keys)[2:])
-            bits: str = ''.join([bin(i)[2:].zfill(self.n_bits) for i in compressed])
-            padded_text = pad_encoded_text(encoded_text=bits)
-            b = get_byte_array(padded_encoded_text=padded_text)
-            output.write(b)
-        print("LZW Compressed")
+        with open(self.path, 'rb') as file, map_file(file) as data:
+            if use_mapped(len(data)):
+                with open(output_path, 'w+b') as output:
+                    self.compress_mapped(data, output)
+            else:
+                compressed = self.compress_bytes(data)
+                with stage(self.stats, 'write', len(compressed)), open(output_path, 'wb') as output:
+                    output.write(compressed)
+        logger.info("LZW Compressed")
         return output_path
 
+    def compress_mapped(self, data, output):
+        """
+        compress a memory mapped file piece by piece into a memory mapped output, so files larger than the memory
+        can be compressed. the output is the same as compress_bytes
+        :param data: bytes like object (mmap)
+        :param output: binary file object opened for reading and writing ('w+b')
+        :return: the number of bytes written
+        """
+        data = memoryview(data).cast('B')
+        self.encoder = LZWEncoder(max_bits=self.max_bits)
+        with stage(self.stats, 'pack_header', len(data)) as record:
+            header = Header(LZW, len(data), checksum(data), params=bytes([self.max_bits])).to_bytes()
+            record.bytes_out = len(header)
+
+        writer = MappedWriter(output, len(header) + (len(data) >> 1))
+        try:
+            writer.write(header)
+            with stage(self.stats, 'lzw_compress', len(data)) as record:
+                # the match open at the end of a piece continues in the next one, the empty piece closes it
+                record.bytes_out = write_padded_chunks(
+                    writer, lambda bits, chunk: self.encoder.encode_bits(chunk, bits, final=not chunk),
+                    chain(iter_chunks(data), [b'']))
+                record.dictionary_size = self.encoder.n_keys
+        finally:
+            writer.close()
+        return writer.tell()
+
     def lzw_decompress(self, input_path):
         """
-        decompress input_file
+        decompress input_file. the dictionary is rebuilt from the codes, no state from compress is needed
         :param input_path: the file to decompress using lempel-ziv algo.
         :return: None. file decompressed saved to filename + "_decompressed" + ".txt"
         """
         filename, file_extension = os.path.splitext(self.path)
         output_path = filename + "_decompressed_lzw" + ".txt"
 
-        with open(input_path, 'rb') as file, open(output_path, 'wb') as output:
-            bit_string_list = []
-
-            byte = file.read(1)
-            while len(byte) > 0:
-                byte = ord(byte)
-                bits = bin(byte)[2:].rjust(8, '0')
-                bit_string_list.append(bits)
-                byte = file.read(1)
-
-            padded_encoded_text = ''.join(bit_string_list)
-
-            encoded_text = remove_padding(padded_encoded_text)
-
-            decoded_text = []
-            start = 0
-            while start < len(encoded_text):
-                code = encoded_text[start:start + self.n_bits]
-                key = int(code, 2)
-                decoded_text.append(self.reverse_lzw_mapping[key])
-                start += self.n_bits
-            output.write(b''.join(decoded_text))
-            print("LZW Decompressed")
-            return output_path
+        with open(input_path, 'rb') as file:
+            header = Header.read(file, codec_id=LZW)
+            file.seek(0)
+            if header.flags & STREAM:
+                with open(output_path, 'wb', buffering=WRITE_BUFFER_SIZE) as output:
+                    self.decompress_stream(file, output)
+            elif use_mapped(header.original_length):
+                with map_file(file) as data, open(output_path, 'w+b') as output:
+                    self.decompress_mapped(data, output)
+            else:
+                with map_file(file) as data:
+                    decoded_text = self.decompress_bytes(data)
+                with stage(self.stats, 'write', len(decoded_text)), open(output_path, 'wb') as output:
+                    output.write(decoded_text)
+        logger.info("LZW Decompressed")
+        return output_path
+
+    def decompress_mapped(self, data, output):
+        """
+        decompress a memory mapped file written by lzw_compress / compress_mapped piece by piece into a memory mapped
+        output preallocated to the original length
+        :param data: bytes like object (mmap)
+        :param output: binary file object opened for reading and writing ('w+b')
+        :return: the number of bytes decompressed
+        """
+        header, offset = Header.from_bytes(data, codec_id=LZW)
+        self.max_bits = header.params[0]
+        self.decoder = LZWDecoder(max_bits=self.max_bits)
+        reader = BitReader.from_padded(memoryview(data)[offset:])
+        writer = MappedWriter(output, header.original_length)
+        try:
+            with stage(self.stats, 'lzw_decompress', len(data) - offset) as record:
+                crc = 0
+                # a code stands for a few bytes, so a piece decodes to about MAPPED_CHUNK_BYTES
+                for block in self.decoder.iter_decode_bits(reader, MAPPED_CHUNK_BYTES >> 2):
+                    crc = checksum(block, crc)
+                    writer.write(block)
+                record.bytes_out = writer.tell()
+                record.dictionary_size = self.decoder.n_keys
+            with stage(self.stats, 'verify', writer.tell()):
+                header.check(writer.tell(), crc)
+        finally:
+            writer.close()
+        return writer.tell()
+
+    def compress_bytes(self, data):
+        """
+        compress in memory with a new dictionary
+        :param data: bytes like object (bytes, bytearray, memoryview ...)
+        :return: bytes - the header followed by the variable width codes
+        """
+        data = memoryview(data).cast('B')
+        self.encoder = LZWEncoder(max_bits=self.max_bits)
+        with stage(self.stats, 'lzw_compress', len(data)) as record:
+            encoded = self.compress_block(data)
+            record.bytes_out = len(encoded)
+            record.dictionary_size = self.encoder.n_keys
+
+        with stage(self.stats, 'pack_header', len(data)) as record:
+            header = Header(LZW, len(data), checksum(data), params=bytes([self.max_bits])).to_bytes()
+            record.bytes_out = len(header)
+        return header + encoded
+
+    def decompress_bytes(self, data):
+        """
+        decompress in memory
+        :param data: bytes like object written by compress_bytes / lzw_compress / compress_stream
+        :return: bytes decoded
+        """
+        header, offset = Header.from_bytes(data, codec_id=LZW)
+        if header.flags & STREAM:
+            output = io.BytesIO()
+            self.decompress_stream(io.BytesIO(data), output)
+            return output.getvalue()
+
+        self.max_bits = header.params[0]
+        self.decoder = LZWDecoder(max_bits=self.max_bits)
+        with stage(self.stats, 'lzw_decompress', len(data) - offset) as record:
+            decoded_text = self.decoder.decode_bits(BitReader.from_padded(memoryview(data)[offset:]),
+                                                    size=header.original_length)
+            record.bytes_out = len(decoded_text)
+            record.dictionary_size = self.decoder.n_keys
+        with stage(self.stats, 'verify', len(decoded_text)):
+            header.verify(decoded_text)
+        return decoded_text
+
+    def compress_block(self, block):
+        """
+        compress one block of a stream. the dictionary is kept from the blocks before.
+        :param block: bytes to compress
+        :return: bytes - the variable width codes
+        """
+        writer = BitWriter()
+        self.encoder.encode_bits(block, writer)
+        return writer.get_padded_bytes()
+
+    def decompress_block(self, payload):
+        """
+        :param payload: one block written by compress_block
+        :return: bytes decoded
+        """
+        return self.decoder.decode_bits(BitReader.from_padded(payload))
+
+    def compress_stream(self, reader, writer, block_size=BLOCK_SIZE):
+        """
+        compress a binary stream block after block. the dictionary persists between blocks,
+        its size is bounded by max_bits so memory use stays bounded.
+        :param reader: binary file like object to compress (open(path, 'rb'), sys.stdin.buffer ...)
+        :param writer: binary file like object for the compressed stream
+        :param block_size: the max number of bytes read at once
+        :return: the number of bytes compressed
+        """
+        return compress_blocks(reader, writer, self.stream_header(), self.compress_block, block_size)
+
+    def decompress_stream(self, reader, writer):
+        """
+        decompress a stream written by compress_stream, block after block
+        :param reader: binary file like object with the compressed stream
+        :param writer: binary file like object for the decompressed data
+        :return: the number of bytes decompressed
+        """
+        header = Header.read(reader, codec_id=LZW)
+        return decompress_blocks(reader, writer, header, self.stream_block_decoder(header))
+
+    def stream_header(self):
+        """
+        starting a stream of compress_block calls with a new dictionary
+        :return: the Header of the stream
+        """
+        self.encoder = LZWEncoder(max_bits=self.max_bits)
+        return Header(LZW, params=bytes([self.max_bits]))
+
+    def stream_block_decoder(self, header):
+        """
+        starting the decompress of a stream with a new dictionary
+        :param header: the Header read from the stream
+        :return: function payload -> bytes decoding the blocks of the stream in order
+        """
+        if header.codec_id != LZW:
+            raise ValueError(f'file was compressed with codec {header.codec_id}, expected {LZW}')
+        self.max_bits = header.params[0]
+        if header.flags & INDEPENDENT:
+            return partial(decompress_block_task, type(self), self.options(header))
+        self.decoder = LZWDecoder(max_bits=self.max_bits)
+        return self.decompress_block
+
+    def options(self, header=None):
+        """
+        :param header: the Header of a compressed stream. None: the settings of this codec
+        :return: dict of keyword arguments for the codec constructor of a worker
+        """
+        return {'max_bits': self.max_bits if header is None else header.params[0]}
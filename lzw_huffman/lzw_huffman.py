@@ -1,28 +1,55 @@
+import io
 import os
-import heapq
-from utils.heap_node import HeapNode
-from utils.bytes_utils import pad_encoded_text, remove_padding, get_byte_array
-
-
-ASCII_TO_INT: dict = {i.to_bytes(1, 'big'): i for i in range(256)}
-INT_TO_ASCII: dict = {i: b for b, i in ASCII_TO_INT.items()}
-
-
-class Lempel_Ziv_Huffman_Coding:
-    def __init__(self, path):
+import logging
+from functools import partial
+from itertools import chain
+from utils.huffman_tree import HuffmanTree
+from utils.bit_io import BitWriter, BitReader
+from utils.canonical_huffman import MAX_CODE_LENGTH, canonical_codes, limit_code_lengths, DecodeTable
+from utils.bucket_codes import BucketDecodeTable, bucket_frequency, expand_codes
+from utils.container import Header, BUCKETED, INDEPENDENT, LZW_HUFFMAN, STREAM, BLOCK_SIZE, WRITE_BUFFER_SIZE, \
+    MAPPED_CHUNK_BYTES, MappedWriter, checksum, pack_code_lengths, unpack_code_lengths, compress_blocks, \
+    decompress_blocks, map_file, use_mapped, write_padded_chunks, iter_chunks
+from utils.instrumentation import stage
+from utils.parallel import decompress_block_task
+from utils.codec_mixins import ParallelMixin, MessageMixin
+from utils.lzw_dictionary import STREAM_MAX_BITS, LZWEncoder, LZWDecoder
+
+
+logger = logging.getLogger(__name__)
+
+
+class Lempel_Ziv_Huffman_Coding(ParallelMixin, MessageMixin):
+    CODEC_ID = LZW_HUFFMAN
+
+    def __init__(self, path, max_bits=None, stats=None, max_code_length=MAX_CODE_LENGTH, code_cache=None,
+                 buckets=False):
         """
         :param path: the file path to compress
+        :param max_bits: the lempel-ziv dictionary holds at most 2 ** max_bits codes. None: STREAM_MAX_BITS for a file
+        or a stream (parallel or not), unbounded for a single compress_block call
+        :param stats: utils.instrumentation.Stats recording every stage of the pipeline. None: no instrumentation
+        :param max_code_length: the max huffman code length, longer codes are shortened
+        :param code_cache: utils.code_cache.CodeCache reusing the huffman codes of similar data, may be shared by many
+        codecs. None: a code is built for every file / block
+        :param buckets: huffman coding the bucket of every lempel-ziv code (its bit length and next bits, see
+        utils.bucket_codes) followed by its low bits raw: a few hundred symbols instead of one per code, so the
+        tree and the code lengths table stay small. False: every code is a huffman symbol
         """
         self.path = path
-        self.lzw_n_bits = None
-        self.lzw_keys = ASCII_TO_INT.copy()
-        self.reverse_lzw_keys = INT_TO_ASCII.copy()
-        self.n_keys = len(ASCII_TO_INT)
-
-        self.heap = []
+        self.stats = stats
+        self.max_code_length = max_code_length
+        self.code_cache = code_cache
+        self.max_bits = max_bits
+        self.buckets = buckets
+        self.lzw_encoder = LZWEncoder(max_bits=max_bits)
+        self.lzw_decoder = LZWDecoder(max_bits=max_bits)
+
+        self.tree = None
         self.frequency = {}
+        self.code_lengths = {}
         self.codes = {}
-        self.reverse_mapping = {}
+        self.decode_table = None
 
     def compress(self):
         """
@@ -32,43 +59,272 @@ class Lempel_Ziv_Huffman_Coding:
         filename, file_extension = os.path.splitext(self.path)
         output_path = filename + ".bin"
 
-        with open(self.path, 'rb') as file, open(output_path, 'wb') as output:
-            data = file.read()
-
-            lzw_compress = self.lzw_compress(data=data)
+        with open(self.path, 'rb') as file, map_file(file) as data:
+            if use_mapped(len(data)):
+                with open(output_path, 'w+b') as output:
+                    self.compress_mapped(data, output)
+            else:
+                compressed = self.compress_bytes(data)
+                with stage(self.stats, 'write', len(compressed)), open(output_path, 'wb') as output:
+                    output.write(compressed)
+        logger.info("Compressed")
+        return output_path
 
-            b = self.huffman_compress(lzw_compress=lzw_compress)
+    def compress_mapped(self, data, output):
+        """
+        compress a memory mapped file piece by piece into a memory mapped output, so files larger than the memory
+        can be compressed. the lempel-ziv codes are not kept: a first pass counts them for the huffman code,
+        a second pass encodes them again and writes their huffman codes. an unbounded dictionary is bounded
+        to STREAM_MAX_BITS, so its memory use stays bounded too.
+        :param data: bytes like object (mmap)
+        :param output: binary file object opened for reading and writing ('w+b')
+        :return: the number of bytes written
+        """
+        data = memoryview(data).cast('B')
+        max_bits = self.max_bits or STREAM_MAX_BITS
+        # the match open at the end of a piece continues in the next one, the empty piece closes it
+        chunks = chain(iter_chunks(data), [b''])
 
-            output.write(b)
-        return output_path
+        self.tree = None
+        self.frequency = {}
+        self.code_lengths = {}
+        self.lzw_encoder = LZWEncoder(max_bits=max_bits)
+        with stage(self.stats, 'lzw_compress', len(data)) as record:
+            for chunk in chunks:
+                self.make_frequency_dict(self.lzw_encoder.encode(chunk, final=not chunk))
+            record.n_symbols = sum(self.frequency.values())
+            record.dictionary_size = self.lzw_encoder.n_keys
+        code_frequency = self.make_symbol_frequency()
+        if not self.load_cached_codes():
+            with stage(self.stats, 'make_heap'):
+                self.make_heap()
+            with stage(self.stats, 'merge_nodes'):
+                self.merge_nodes()
+            with stage(self.stats, 'make_codes') as record:
+                self.make_codes()
+                record.n_symbols = len(self.codes)
+            if self.code_cache is not None:
+                self.code_cache.store(self.frequency, self.max_code_length, self.codes)
+
+        with stage(self.stats, 'pack_header', len(data)) as record:
+            code_lengths = {code: length for code, (_, length) in self.codes.items()}
+            params = bytes([max_bits]) + pack_code_lengths(code_lengths)
+            header = Header(LZW_HUFFMAN, len(data), checksum(data), flags=self.header_flags(),
+                            params=params).to_bytes()
+            record.bytes_out = len(header)
+
+        codes = self.symbol_codes(code_frequency)
+        n_bits = sum(count * codes[code][1] for code, count in code_frequency.items())
+        writer = MappedWriter(output, len(header) + (n_bits >> 3) + 2)
+        try:
+            writer.write(header)
+            self.lzw_encoder = LZWEncoder(max_bits=max_bits)
+            with stage(self.stats, 'get_encoded_text', len(data)) as record:
+                record.bytes_out = write_padded_chunks(
+                    writer, lambda bits, chunk: bits.write_codes(self.lzw_encoder.encode(chunk, final=not chunk),
+                                                                 codes),
+                    chain(iter_chunks(data), [b'']))
+        finally:
+            writer.close()
+        return writer.tell()
 
     def decompress(self, input_path):
         """
-        decompress input_file
+        decompress input_file. the codes are read from the file header, no state from compress is needed
         :param input_path: the file to decompress using huffman & lempel-ziv algo.
         :return: None. file decompressed saved to filename + "_decompressed" + ".txt"
         """
         filename, file_extension = os.path.splitext(self.path)
         output_path = filename + "_decompressed" + ".txt"
 
-        with open(input_path, 'rb') as file, open(output_path, 'wb') as output:
-            bit_string_list = []
+        with open(input_path, 'rb') as file:
+            header = Header.read(file, codec_id=LZW_HUFFMAN)
+            file.seek(0)
+            if header.flags & STREAM:
+                with open(output_path, 'wb', buffering=WRITE_BUFFER_SIZE) as output:
+                    self.decompress_stream(file, output)
+            elif use_mapped(header.original_length):
+                with map_file(file) as data, open(output_path, 'w+b') as output:
+                    self.decompress_mapped(data, output)
+            else:
+                with map_file(file) as data:
+                    b = self.decompress_bytes(data)
+                with stage(self.stats, 'write', len(b)), open(output_path, 'wb') as output:
+                    output.write(b)
 
-            byte = file.read(1)
-            while len(byte) > 0:
-                byte = ord(byte)
-                bits = bin(byte)[2:].rjust(8, '0')
-                bit_string_list.append(bits)
-                byte = file.read(1)
+        logger.info("Decompressed")
+        return output_path
 
-            padded_encoded_text = ''.join(bit_string_list)
+    def decompress_mapped(self, data, output):
+        """
+        decompress a memory mapped file written by compress / compress_mapped piece by piece into a memory mapped
+        output preallocated to the original length
+        :param data: bytes like object (mmap)
+        :param output: binary file object opened for reading and writing ('w+b')
+        :return: the number of bytes decompressed
+        """
+        header, offset = Header.from_bytes(data, codec_id=LZW_HUFFMAN)
+        self.max_bits = header.params[0] or None
+        self.buckets = bool(header.flags & BUCKETED)
+        self.lzw_decoder = LZWDecoder(max_bits=self.max_bits)
+        with stage(self.stats, 'load_code_lengths', len(header.params)) as record:
+            code_lengths, _ = unpack_code_lengths(header.params, 1)
+            self.load_code_lengths(code_lengths)
+            record.n_symbols = len(code_lengths)
+
+        reader = BitReader.from_padded(memoryview(data)[offset:])
+
+        def code_chunks():
+            position = 0
+            while position < reader.n_bits:
+                codes, position = self.decode_table.decode_range(reader.data, reader.n_bits, position,
+                                                                 position + MAPPED_CHUNK_BYTES)
+                yield codes
+
+        writer = MappedWriter(output, header.original_length)
+        try:
+            with stage(self.stats, 'decompress_mapped', len(data) - offset) as record:
+                crc = 0
+                for block in self.lzw_decoder.iter_decode(code_chunks()):
+                    crc = checksum(block, crc)
+                    writer.write(block)
+                record.bytes_out = writer.tell()
+                record.dictionary_size = self.lzw_decoder.n_keys
+            with stage(self.stats, 'verify', writer.tell()):
+                header.check(writer.tell(), crc)
+        finally:
+            writer.close()
+        return writer.tell()
+
+    def compress_bytes(self, data):
+        """
+        compress in memory with a new lempel-ziv dictionary, bounded to STREAM_MAX_BITS if unbounded: an unbounded
+        dictionary grows by one entry per code written, so without repeats it grows with the data
+        :param data: bytes like object (bytes, bytearray, memoryview ...)
+        :return: bytes - the header (with the code lengths table) followed by the encoded data
+        """
+        data = memoryview(data).cast('B')
+        max_bits = self.max_bits or STREAM_MAX_BITS
+        self.lzw_encoder = LZWEncoder(max_bits=max_bits)
+        lzw_compress = self.lzw_compress(data=data)
+
+        b = self.huffman_compress(lzw_compress=lzw_compress)
+
+        with stage(self.stats, 'pack_header', len(data)) as record:
+            code_lengths = {code: length for code, (_, length) in self.codes.items()}
+            params = bytes([max_bits]) + pack_code_lengths(code_lengths)
+            header = Header(LZW_HUFFMAN, len(data), checksum(data), flags=self.header_flags(),
+                            params=params).to_bytes()
+            record.bytes_out = len(header)
+        return header + b
+
+    def decompress_bytes(self, data):
+        """
+        decompress in memory
+        :param data: bytes like object written by compress_bytes / compress / compress_stream
+        :return: bytes decoded
+        """
+        header, offset = Header.from_bytes(data, codec_id=LZW_HUFFMAN)
+        if header.flags & STREAM:
+            output = io.BytesIO()
+            self.decompress_stream(io.BytesIO(data), output)
+            return output.getvalue()
+
+        self.max_bits = header.params[0] or None
+        self.buckets = bool(header.flags & BUCKETED)
+        self.lzw_decoder = LZWDecoder(max_bits=self.max_bits)
+        with stage(self.stats, 'load_code_lengths', len(header.params)) as record:
+            code_lengths, _ = unpack_code_lengths(header.params, 1)
+            self.load_code_lengths(code_lengths)
+            record.n_symbols = len(code_lengths)
+
+        huffman_decompress = self.huffman_decompress(reader=BitReader.from_padded(memoryview(data)[offset:]))
+        b = self.lzw_decompress(huffman_decompress=huffman_decompress, size=header.original_length)
+        with stage(self.stats, 'verify', len(b)):
+            header.verify(b)
+        return b
 
-            huffman_decompress = self.huffman_decompress(padded_encoded_text=padded_encoded_text)
+    def compress_block(self, block):
+        """
+        compress one block of a stream. the lempel-ziv dictionary is kept from the blocks before,
+        the huffman code is built for the block.
+        :param block: bytes to compress
+        :return: bytes - the code lengths table followed by the encoded block
+        """
+        lzw_compress = self.lzw_compress(block)
+        b = self.huffman_compress(lzw_compress)
 
-            b = self.lzw_decompress(huffman_decompress=huffman_decompress)
+        code_lengths = {code: length for code, (_, length) in self.codes.items()}
+        return pack_code_lengths(code_lengths) + b
 
-            output.write(b)
-        return output_path
+    def decompress_block(self, payload):
+        """
+        :param payload: one block written by compress_block
+        :return: bytes decoded
+        """
+        with stage(self.stats, 'load_code_lengths', len(payload)) as record:
+            code_lengths, offset = unpack_code_lengths(payload)
+            self.load_code_lengths(code_lengths)
+            record.n_symbols = len(code_lengths)
+        reader = BitReader.from_padded(memoryview(payload)[offset:])
+        return self.lzw_decompress(self.huffman_decompress(reader))
+
+    def compress_stream(self, reader, writer, block_size=BLOCK_SIZE):
+        """
+        compress a binary stream block after block. the lempel-ziv dictionary persists between blocks,
+        its size is bounded by max_bits (STREAM_MAX_BITS if unbounded). each block gets its own huffman code.
+        :param reader: binary file like object to compress (open(path, 'rb'), sys.stdin.buffer ...)
+        :param writer: binary file like object for the compressed stream
+        :param block_size: the max number of bytes read at once
+        :return: the number of bytes compressed
+        """
+        return compress_blocks(reader, writer, self.stream_header(), self.compress_block, block_size)
+
+    def decompress_stream(self, reader, writer):
+        """
+        decompress a stream written by compress_stream, block after block
+        :param reader: binary file like object with the compressed stream
+        :param writer: binary file like object for the decompressed data
+        :return: the number of bytes decompressed
+        """
+        header = Header.read(reader, codec_id=LZW_HUFFMAN)
+        return decompress_blocks(reader, writer, header, self.stream_block_decoder(header))
+
+    def stream_header(self):
+        """
+        starting a stream of compress_block calls with a new lempel-ziv dictionary,
+        bounded by max_bits (STREAM_MAX_BITS if unbounded)
+        :return: the Header of the stream
+        """
+        max_bits = self.max_bits or STREAM_MAX_BITS
+        self.lzw_encoder = LZWEncoder(max_bits=max_bits)
+        return Header(LZW_HUFFMAN, flags=self.header_flags(), params=bytes([max_bits]))
+
+    def stream_block_decoder(self, header):
+        """
+        starting the decompress of a stream with a new lempel-ziv dictionary
+        :param header: the Header read from the stream
+        :return: function payload -> bytes decoding the blocks of the stream in order
+        """
+        if header.codec_id != LZW_HUFFMAN:
+            raise ValueError(f'file was compressed with codec {header.codec_id}, expected {LZW_HUFFMAN}')
+        self.max_bits = header.params[0] or None
+        self.buckets = bool(header.flags & BUCKETED)
+        if header.flags & INDEPENDENT:
+            return partial(decompress_block_task, type(self), self.options(header))
+        self.lzw_decoder = LZWDecoder(max_bits=self.max_bits)
+        return self.decompress_block
+
+    def options(self, header=None):
+        """
+        :param header: the Header of a compressed stream. None: the settings of this codec, the dictionary of a block
+        bounded as in stream_header
+        :return: dict of keyword arguments for the codec constructor of a worker
+        """
+        if header is not None:
+            return {'max_bits': header.params[0] or None, 'buckets': bool(header.flags & BUCKETED)}
+        return {'max_bits': self.max_bits or STREAM_MAX_BITS, 'max_code_length': self.max_code_length,
+                'buckets': self.buckets}
 
     def lzw_compress(self, data):
         """
@@ -76,41 +332,27 @@ class Lempel_Ziv_Huffman_Coding:
         :param data: data text to compress using lempel-ziv algo
         :return: list of numbers - the data encoded.
         """
-        compressed: list = []
-        string = b''
-
-        for symbol in data:
-            string_plus_symbol = string + symbol.to_bytes(1, 'big') # get input symbol.
-            if string_plus_symbol in self.lzw_keys:
-                string = string_plus_symbol
-            else:
-                compressed.append(self.lzw_keys[string])
-                self.lzw_keys[string_plus_symbol] = self.n_keys
-                self.reverse_lzw_keys[self.n_keys] = string_plus_symbol
-                self.n_keys += 1
-                string = symbol.to_bytes(1, 'big')
-
-        if string in self.lzw_keys:
-            compressed.append(self.lzw_keys[string])
-        print("Compressed LZW")
+        with stage(self.stats, 'lzw_compress', len(data)) as record:
+            compressed = self.lzw_encoder.encode(data)
+            record.n_symbols = len(compressed)
+            record.dictionary_size = self.lzw_encoder.n_keys
+        logger.debug("Compressed LZW")
         return compressed
-        # self.lzw_n_bits = len(bin(self.n_keys)[2:])
-        # bits: str = ''.join([bin(i)[2:].zfill(self.lzw_n_bits) for i in compressed])
-        # padded_text = self.pad_encoded_text(encoded_text=bits)
-        # b = self.get_byte_array(padded_encoded_text=padded_text)
-        # return b
 
-    def lzw_decompress(self, huffman_decompress):
+    def lzw_decompress(self, huffman_decompress, size=None):
         """
         decompress using lempel-ziv algo. the data should be decompressed using huffman
         :param huffman_decompress: list of numbers to decompress
+        :param size: the length of the text if known, the output is preallocated to it
         :return: text decoded
         """
-        decoded_text = []
-        for code in huffman_decompress:
-            decoded_text.append(self.reverse_lzw_keys[code])
-        print('Decompressed LZW')
-        return b''.join(decoded_text)
+        with stage(self.stats, 'lzw_decompress') as record:
+            decoded_text = self.lzw_decoder.decode(huffman_decompress, size)
+            record.n_symbols = len(huffman_decompress)
+            record.bytes_out = len(decoded_text)
+            record.dictionary_size = self.lzw_decoder.n_keys
+        logger.debug('Decompressed LZW')
+        return decoded_text
 
     def make_frequency_dict(self, text):
         """
@@ -123,67 +365,99 @@ class Lempel_Ziv_Huffman_Coding:
             except KeyError:
                 self.frequency[character] = 1
 
-    def make_heap(self):
+    def make_symbol_frequency(self):
         """
-        creating heap: node for each character value is the frequency.
-        :return: None saved to self.heap
+        in buckets mode the huffman symbols are the buckets of the lempel-ziv codes counted in self.frequency
+        :return: dict lempel-ziv code -> count. self.frequency holds the counts of the huffman symbols
         """
-        for key, frq in self.frequency.items():
-            node = HeapNode(key, frq)
-            heapq.heappush(self.heap, node)
+        code_frequency = self.frequency
+        if self.buckets:
+            self.frequency = bucket_frequency(code_frequency)
+        return code_frequency
 
-    def merge_nodes(self):
+    def symbol_codes(self, code_frequency):
         """
-        merging each 2 nodes(node characters) in heap with the lowest frequencies until no 2 nodes for characters
-        :return: None. saved to self.heap
+        :param code_frequency: dict lempel-ziv code -> count (see make_symbol_frequency)
+        :return: dict lempel-ziv code -> (code value, code length) for writing the codes: self.codes, or in buckets
+        mode the code of the bucket followed by the low bits of each code
         """
-        while len(self.heap) > 1:
-            node1 = heapq.heappop(self.heap)
-            node2 = heapq.heappop(self.heap)
-
-            merged = HeapNode(None, node1.freq + node2.freq)
-            merged.left = node1
-            merged.right = node2
-
-            heapq.heappush(self.heap, merged)
+        if self.buckets:
+            return expand_codes(self.codes, code_frequency)
+        return self.codes
 
-    def make_codes_helper(self, root, current_code):
+    def header_flags(self):
         """
-        recursive method to calculate the code for root
-        :param root: the root of the heap/the sub tree during the recursive
-        :param current_code: the current mode in the path to the character
-        :return: None saved to self.codes and self.reverse_mapping
+        :return: the header flags of the mode of the codec
         """
-        if root is None:
-            return
+        return BUCKETED if self.buckets else 0
 
-        if root.char is not None:
-            self.codes[root.char] = current_code
-            self.reverse_mapping[current_code] = root.char
-            return
+    def make_heap(self):
+        """
+        creating the leaves of the tree: node for each character value is the frequency.
+        :return: None saved to self.tree
+        """
+        self.tree = HuffmanTree(self.frequency)
 
-        self.make_codes_helper(root.left, current_code + "0")
-        self.make_codes_helper(root.right, current_code + "1")
+    def merge_nodes(self):
+        """
+        merging each 2 nodes(node characters) in the tree with the lowest frequencies until one root is left
+        :return: None. saved to self.tree
+        """
+        self.tree.merge()
 
     def make_codes(self):
         """
-        creating code and the reserve info for each character
-        :return: None saved to self.codes and self.reverse_mapping
+        creating canonical code for each character
+        :return: None saved to self.codes
         """
-        root = heapq.heappop(self.heap)
-        current_code = ""
-        self.make_codes_helper(root, current_code)
-
-    def get_encoded_text(self, text):
+        if self.tree is not None:
+            self.code_lengths = self.tree.code_lengths()
+        # an alphabet larger than 2 ** max_code_length can not be limited, its codes get the smallest possible limit
+        max_length = max(self.max_code_length, (len(self.code_lengths) - 1).bit_length())
+        self.code_lengths = limit_code_lengths(self.code_lengths, max_length)
+        self.codes = canonical_codes(self.code_lengths)
+
+    def load_cached_codes(self):
+        """
+        looking a code for self.frequency up in self.code_cache
+        :return: True if a cached code was saved to self.codes, False: the code has to be built
         """
-        encoding the text to string of bits
+        if self.code_cache is None:
+            return False
+        with stage(self.stats, 'code_cache') as record:
+            codes = self.code_cache.lookup(self.frequency, self.max_code_length)
+            record.n_symbols = len(self.frequency)
+        if codes is None:
+            return False
+        self.codes = codes
+        self.code_lengths = {symbol: length for symbol, (_, length) in codes.items()}
+        return True
+
+    def load_code_lengths(self, code_lengths):
+        """
+        rebuilding the codes and decoding tables from the code lengths table
+        :param code_lengths: dict symbol -> code length
+        :return: None saved to self.codes and self.decode_table
+        """
+        self.code_lengths = code_lengths
+        if self.code_cache is not None:
+            self.codes, self.decode_table = self.code_cache.decoder(code_lengths)
+        else:
+            self.codes = canonical_codes(self.code_lengths)
+            self.decode_table = DecodeTable(self.codes)
+        if self.buckets:
+            self.decode_table = BucketDecodeTable(self.codes, self.decode_table)
+
+    def get_encoded_text(self, text, codes=None):
+        """
+        encoding the text to packed bits
         :param text: the text to encode
-        :return: the encoded text - bits string
+        :param codes: dict lempel-ziv code -> (code value, code length) (see symbol_codes). None: self.codes
+        :return: BitWriter holding the encoded text
         """
-        encoded_text_list = []
-        for character in text:
-            encoded_text_list.append(self.codes[character])
-        return ''.join(encoded_text_list)
+        writer = BitWriter()
+        writer.write_codes(text, self.codes if codes is None else codes)
+        return writer
 
     def huffman_compress(self, lzw_compress):
         """
@@ -193,45 +467,50 @@ class Lempel_Ziv_Huffman_Coding:
         """
         # text = text.rstrip()
 
-        self.make_frequency_dict(lzw_compress)
-        self.make_heap()
-        self.merge_nodes()
-        self.make_codes()
-
-        encoded_text = self.get_encoded_text(lzw_compress)
-
-        padded_encoded_text = pad_encoded_text(encoded_text)
-
-        b = get_byte_array(padded_encoded_text)
-
-        print("Compressed Huffman")
+        self.tree = None
+        self.frequency = {}
+        self.code_lengths = {}
+
+        with stage(self.stats, 'make_frequency_dict') as record:
+            self.make_frequency_dict(lzw_compress)
+            code_frequency = self.make_symbol_frequency()
+            record.n_symbols = len(self.frequency)
+        if not self.load_cached_codes():
+            with stage(self.stats, 'make_heap'):
+                self.make_heap()
+            with stage(self.stats, 'merge_nodes'):
+                self.merge_nodes()
+            with stage(self.stats, 'make_codes') as record:
+                self.make_codes()
+                record.n_symbols = len(self.codes)
+            if self.code_cache is not None:
+                self.code_cache.store(self.frequency, self.max_code_length, self.codes)
+
+        with stage(self.stats, 'get_encoded_text') as record:
+            encoded_text = self.get_encoded_text(lzw_compress, self.symbol_codes(code_frequency))
+            b = encoded_text.get_padded_bytes()
+            record.n_symbols = len(lzw_compress)
+            record.bytes_out = len(b)
+
+        logger.debug("Compressed Huffman")
         return b
 
     def decode_text(self, encoded_text):
         """
-        transforming bit string to text
-        :param encoded_text: bits string encoded text
+        transforming packed bits to text using the decoding tables
+        :param encoded_text: BitReader over the encoded text
         :return: text decoded.
         """
-        current_code = ""
-        decoded_list = []
-
-        for bit in encoded_text:
-            current_code += bit
-            if current_code in self.reverse_mapping:
-                decoded_list.append(self.reverse_mapping[current_code])
-                current_code = ""
-        return decoded_list
+        return self.decode_table.decode(encoded_text.data, encoded_text.n_bits)
 
-    def huffman_decompress(self, padded_encoded_text):
+    def huffman_decompress(self, reader):
         """
-        decompressing bits string using huffman
-        :param padded_encoded_text: the bits sting to decompressed
+        decompressing packed bits using huffman
+        :param reader: BitReader over the bits to decompressed
         :return: list of numbers (the data compressed using lempel ziv)
         """
-        encoded_text = remove_padding(padded_encoded_text)
-
-        decompressed_list = self.decode_text(encoded_text)
-        print("Decompressed Huffman")
+        with stage(self.stats, 'huffman_decompress', (reader.n_bits + 7) >> 3) as record:
+            decompressed_list = self.decode_text(reader)
+            record.n_symbols = len(decompressed_list)
+        logger.debug("Decompressed Huffman")
         return decompressed_list
-
@@ -1,7 +1,10 @@
+import logging
 import time
 from lzw.lzw_coding import LZW_Coding
 import os
 
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
 #input file path
 path = 'dickens.txt'
 
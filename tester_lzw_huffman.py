@@ -1,7 +1,10 @@
+import logging
 import time
 from lzw_huffman.lzw_huffman import Lempel_Ziv_Huffman_Coding
 import os
 
+logging.basicConfig(level=logging.INFO, format='%(message)s')
+
 #input file path
 path = 'dickens.txt'
 
@@ -0,0 +1,61 @@
+import os
+import random
+import pytest
+from compressor.compressor import Compressor, FAST, MAX
+from huffman.huffman import Huffman_Coding
+from lzw.lzw_coding import LZW_Coding
+from lzw_huffman.lzw_huffman import Lempel_Ziv_Huffman_Coding
+
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sample.txt')
+
+
+def make_corpora():
+    rng = random.Random(0)
+    with open(SAMPLE_PATH, 'rb') as file:
+        text = file.read(200000)
+    return {
+        'empty': b'',
+        'one': b'x',
+        'text': text,
+        'random': rng.getrandbits(8 * 50000).to_bytes(50000, 'little'),
+        'runs': b''.join(bytes([rng.randrange(4)]) * rng.randrange(1, 300) for _ in range(1000)),
+        'all_bytes': bytes(range(256)) * 40,
+    }
+
+
+# corpus name -> bytes: the edge cases and the kinds of data of the benchmark
+CORPORA = make_corpora()
+
+# codec id of the tests -> (codec class, constructor options, compress file method, decompress file method)
+CODECS = {
+    'huffman': (Huffman_Coding, {}, 'compress', 'decompress'),
+    'huffman-8bits': (Huffman_Coding, {'max_code_length': 8}, 'compress', 'decompress'),
+    'lzw': (LZW_Coding, {}, 'lzw_compress', 'lzw_decompress'),
+    'lzw-9bits': (LZW_Coding, {'max_bits': 9}, 'lzw_compress', 'lzw_decompress'),
+    'lzw_huffman': (Lempel_Ziv_Huffman_Coding, {}, 'compress', 'decompress'),
+    'lzw_huffman-12bits': (Lempel_Ziv_Huffman_Coding, {'max_bits': 12, 'max_code_length': 12}, 'compress',
+                           'decompress'),
+    'lzw_huffman-buckets': (Lempel_Ziv_Huffman_Coding, {'buckets': True}, 'compress', 'decompress'),
+    'auto-fast': (Compressor, {'level': FAST, 'block_size': 1 << 14}, 'compress', 'decompress'),
+    'auto-max': (Compressor, {'level': MAX, 'block_size': 1 << 14}, 'compress', 'decompress'),
+}
+
+
+@pytest.fixture(params=sorted(CORPORA))
+def corpus(request):
+    return CORPORA[request.param]
+
+
+@pytest.fixture(params=sorted(CODECS))
+def codec_spec(request):
+    return CODECS[request.param]
+
+
+@pytest.fixture
+def make_codec(codec_spec):
+    """
+    :return: function path -> a new codec object of the tested codec and options
+    """
+    codec_class, options, _, _ = codec_spec
+    return lambda path=None: codec_class(path, **options)
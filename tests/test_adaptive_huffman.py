@@ -0,0 +1,76 @@
+import io
+import pytest
+from conftest import CORPORA
+from huffman.huffman import Huffman_Coding
+from utils.adaptive_huffman import AdaptiveHuffmanModel
+from utils.container import Header, ADAPTIVE, STREAM
+
+
+class PieceReader(io.RawIOBase):
+    """
+    a live source: read1 returns the data a small piece at a time, as a pipe would
+    """
+    def __init__(self, data, piece_size):
+        self.data = data
+        self.position = 0
+        self.piece_size = piece_size
+        self.reads = 0
+
+    def readable(self):
+        return True
+
+    def read1(self, size=-1):
+        self.reads += 1
+        piece = self.data[self.position:self.position + min(size, self.piece_size)]
+        self.position += len(piece)
+        return piece
+
+    read = read1
+
+
+def decompress(compressed):
+    output = io.BytesIO()
+    Huffman_Coding(None).decompress_stream(io.BytesIO(compressed), output)
+    return output.getvalue()
+
+
+@pytest.mark.parametrize('max_code_length', [4, 8, 24])
+def test_round_trip(corpus, max_code_length):
+    output = io.BytesIO()
+    Huffman_Coding(None, max_code_length=max_code_length).compress_adaptive(io.BytesIO(corpus), output,
+                                                                           block_size=4096, live=False)
+    compressed = output.getvalue()
+    header, _ = Header.from_bytes(compressed)
+    assert header.flags & ADAPTIVE and header.flags & STREAM
+    assert decompress(compressed) == corpus
+    assert Huffman_Coding(None).decompress_bytes(compressed) == corpus
+
+
+def test_live():
+    data = CORPORA['text'][:20000]
+    reader = PieceReader(data, 300)
+    output = io.BytesIO()
+    assert Huffman_Coding(None).compress_adaptive(reader, output) == len(data)
+    # a block per piece read
+    assert reader.reads > len(data) // 300
+    assert decompress(output.getvalue()) == data
+
+
+def test_code_adapts():
+    data = CORPORA['text']
+    output = io.BytesIO()
+    Huffman_Coding(None).compress_adaptive(io.BytesIO(data), output, live=False)
+    # the first block is coded with 8 bit codes, the code then follows the text
+    assert len(output.getvalue()) < len(data) * 0.7
+
+
+def test_model_code_lengths():
+    # 256 byte values do not fit codes shorter than 8 bits: the limit is widened
+    model = AdaptiveHuffmanModel(max_code_length=4)
+    model.update(b'a' * 100000)
+    assert {length for _, length in model.codes.values()} == {8}
+
+    model = AdaptiveHuffmanModel()
+    assert {length for _, length in model.codes.values()} == {8}
+    model.update(b'a' * 100000)
+    assert model.codes[ord('a')][1] == 1
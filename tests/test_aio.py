@@ -0,0 +1,92 @@
+import asyncio
+import io
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import pytest
+from conftest import CORPORA
+from aio.streams import compress_stream, decompress_stream, check_executor, read_block
+from compressor.compressor import Compressor
+from huffman.huffman import Huffman_Coding
+from lzw.lzw_coding import LZW_Coding
+
+
+class BytesWriter:
+    """
+    the part of asyncio.StreamWriter the streams use, writing to memory
+    """
+    def __init__(self):
+        self.output = io.BytesIO()
+
+    def write(self, data):
+        self.output.write(data)
+
+    async def drain(self):
+        pass
+
+
+def stream_reader(data):
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+def compress(codec, data, **options):
+    async def run():
+        writer = BytesWriter()
+        assert await compress_stream(codec, stream_reader(data), writer, **options) == len(data)
+        return writer.output.getvalue()
+    return asyncio.run(run())
+
+
+def decompress(codec, compressed, **options):
+    async def run():
+        writer = BytesWriter()
+        assert await decompress_stream(codec, stream_reader(compressed), writer, **options) == \
+            len(writer.output.getvalue())
+        return writer.output.getvalue()
+    return asyncio.run(run())
+
+
+def test_round_trip(codec_spec, make_codec, corpus):
+    compressed = compress(make_codec(), corpus, block_size=4096)
+    assert decompress(codec_spec[0](None), compressed) == corpus
+    # the layout of codec.compress_stream
+    assert codec_spec[0](None).decompress_bytes(compressed) == corpus
+
+
+def test_sync_stream(codec_spec, make_codec):
+    data = CORPORA['text']
+    output = io.BytesIO()
+    make_codec().compress_stream(io.BytesIO(data), output, block_size=10000)
+    with ThreadPoolExecutor(2) as executor:
+        assert decompress(codec_spec[0](None), output.getvalue(), executor=executor) == data
+
+
+def test_read_block():
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b'abc')
+        live_block = await read_block(reader, 10, live=True)
+        reader.feed_data(b'defgh')
+        reader.feed_eof()
+        return live_block, await read_block(reader, 4), await read_block(reader, 4), await read_block(reader, 4)
+    assert asyncio.run(run()) == (b'abc', b'defg', b'h', b'')
+
+
+def test_check_executor():
+    dependent = LZW_Coding(None).stream_header()
+    independent = Compressor(None).stream_header()
+    with ProcessPoolExecutor(1) as executor:
+        with pytest.raises(ValueError, match='depend on each other'):
+            check_executor(executor, dependent)
+        check_executor(executor, independent)
+    with ThreadPoolExecutor(1) as executor:
+        check_executor(executor, dependent)
+    check_executor(None, dependent)
+
+
+def test_truncated_stream():
+    compressed = compress(Huffman_Coding(None), CORPORA['text'], block_size=4096)
+    for end in [5, len(compressed) // 2, len(compressed) - 1]:
+        with pytest.raises(ValueError):
+            decompress(Huffman_Coding(None), compressed[:end])
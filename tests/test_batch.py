@@ -0,0 +1,107 @@
+import os
+import pytest
+from conftest import CORPORA
+from batch.__main__ import main
+from batch.archive import ArchiveWriter, is_archive, read_archive_index
+from batch.batch import compress_batch, decompress_batch, member_name, extract_path, chunked
+from utils.codec_names import CODECS
+
+
+@pytest.fixture
+def files(tmp_path):
+    """
+    :return: dict path -> content of a few small files in a tree
+    """
+    contents = {}
+    for i, (name, data) in enumerate(sorted(CORPORA.items())):
+        directory = tmp_path / 'data' / f'dir{i % 2}'
+        directory.mkdir(parents=True, exist_ok=True)
+        path = str(directory / f'{name}.txt')
+        with open(path, 'wb') as file:
+            file.write(data[:20000])
+        contents[path] = data[:20000]
+    return contents
+
+
+def read(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+@pytest.mark.parametrize('codec', list(CODECS))
+def test_buffers(codec):
+    buffers = [CORPORA[name] for name in sorted(CORPORA)]
+    result = compress_batch(buffers, codec=codec, workers=1)
+    assert result['files'] == len(buffers)
+    assert result['original_bytes'] == sum(len(buffer) for buffer in buffers)
+    assert result['compressed_bytes'] == sum(len(output) for output in result['outputs'])
+    assert decompress_batch(result['outputs'], workers=1)['outputs'] == buffers
+
+
+@pytest.mark.parametrize('workers, threads', [(1, False), (2, True), (2, False)])
+def test_files(files, tmp_path, workers, threads):
+    pattern = str(tmp_path / 'data' / '**' / '*.txt')
+    result = compress_batch([pattern], codec='lzw_huffman', workers=workers, threads=threads, cache_codes=True)
+    assert sorted(result['outputs']) == sorted(path + '.bin' for path in files)
+    for path in files:
+        os.remove(path)
+    decompress_batch([str(tmp_path / 'data' / '**' / '*.bin')], workers=workers, threads=threads, cache_codes=True)
+    for path, data in files.items():
+        assert read(path) == data
+
+
+def test_archive(files, tmp_path):
+    archive = str(tmp_path / 'all.darc')
+    names = []
+    result = compress_batch(sorted(files), codec='auto', archive=archive, workers=1,
+                            progress=lambda name, size_in, size_out: names.append(name))
+    assert is_archive(archive)
+    with open(archive, 'rb') as file:
+        index = read_archive_index(file)
+    assert [member for member, _, _, _ in index] == names == [member_name(path) for path in sorted(files)]
+    assert index == result['outputs']
+
+    output_dir = str(tmp_path / 'out')
+    decompress_batch([archive], output_dir=output_dir, workers=1)
+    for path, data in files.items():
+        assert read(extract_path(output_dir, member_name(path))) == data
+
+
+def test_archive_errors(tmp_path):
+    archive = str(tmp_path / 'bad.darc')
+    with open(archive, 'wb') as file:
+        ArchiveWriter(file).add('a', 100, bytes(100))
+    with open(archive, 'rb') as file:
+        with pytest.raises(ValueError, match='truncated'):
+            read_archive_index(file)
+    with open(archive, 'wb') as file:
+        file.write(b'DARC\x09')
+    with open(archive, 'rb') as file:
+        with pytest.raises(ValueError, match='unsupported archive version'):
+            read_archive_index(file)
+
+
+def test_names():
+    assert member_name('./a/../b/c.txt') == 'b/c.txt'
+    assert member_name('/abs/path.txt') == 'abs/path.txt'
+    assert extract_path('out', 'b/c.txt') == os.path.join('out', 'b', 'c.txt')
+    for name in ['../evil', '/etc/passwd', 'a/../../b']:
+        with pytest.raises(ValueError, match='unsafe member name'):
+            extract_path('out', name)
+    assert list(chunked(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+
+def test_errors():
+    with pytest.raises(ValueError, match='unknown codec'):
+        compress_batch([b'abc'], codec='zip')
+    with pytest.raises(ValueError, match='not a compressed file'):
+        decompress_batch([CORPORA['text'][:100]], workers=1)
+
+
+def test_command_line(files, tmp_path, capsys):
+    archive = str(tmp_path / 'all.darc')
+    assert main(['compress', '-c', 'auto', '-o', archive, '-j', '1', *sorted(files)]) == 0
+    assert capsys.readouterr().out.startswith(f'compressed {len(files)} files')
+    assert main(['decompress', '-d', str(tmp_path / 'out'), '-j', '1', archive]) == 0
+    assert main(['decompress', '-j', '1', str(tmp_path / 'missing.bin')]) == 1
+    assert capsys.readouterr().err.startswith('error:')
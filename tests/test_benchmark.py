@@ -0,0 +1,53 @@
+import pytest
+from benchmark.corpora import CORPORA, write_corpus
+from benchmark.runner import CODECS, compare, format_result, load, run, run_case, save
+from utils import container
+
+
+@pytest.mark.parametrize('name', sorted(CORPORA))
+def test_corpora(name, tmp_path):
+    path = str(tmp_path / 'corpus.dat')
+    size = write_corpus(name, 3000, path)
+    with open(path, 'rb') as file:
+        data = file.read()
+    assert len(data) == size
+    _, fixed_size = CORPORA[name]
+    if not fixed_size:
+        assert size == 3000
+        # the corpora are the same on every run, so the runs compare
+        write_corpus(name, 3000, path)
+        with open(path, 'rb') as file:
+            assert file.read() == data
+
+
+@pytest.mark.parametrize('codec_name', CODECS)
+@pytest.mark.parametrize('mapped', [False, True])
+def test_run_case(codec_name, mapped, tmp_path, monkeypatch):
+    # run_case sets the mapped file size of its process: it is restored after the test
+    monkeypatch.setattr(container, 'MAPPED_FILE_BYTES', container.MAPPED_FILE_BYTES)
+    path = str(tmp_path / 'corpus.dat')
+    write_corpus('repetitive', 20000, path)
+    result = run_case(codec_name, path, 1, mapped)
+    assert result['round_trip']
+    assert result['original_size'] == 20000
+    assert result['ratio'] > 1
+    # the outputs are removed
+    assert [file.name for file in tmp_path.iterdir()] == ['corpus.dat']
+
+
+def test_run_and_compare(tmp_path):
+    results = run(codecs=('lzw',), corpora=('random',), sizes=(1000,))
+    assert [(result['codec'], result['corpus'], result['size']) for result in results] == [('lzw', 'random', 1000)]
+    path = str(tmp_path / 'baseline.json')
+    save(results, path)
+    baseline = load(path)
+    assert baseline == results
+    assert compare(results, baseline) == [(results[0], baseline[0], [])]
+
+    slower = dict(results[0], compress_mb_s=results[0]['compress_mb_s'] / 2,
+                  compressed_size=results[0]['compressed_size'] * 2, round_trip=False)
+    regressions = compare([slower], baseline)[0][2]
+    assert regressions[0] == 'round trip failed'
+    assert [message.split()[0] for message in regressions[1:]] == ['compress_mb_s', 'compressed_size']
+    assert compare([dict(results[0], size=2000)], baseline) == []
+    assert format_result(results[0]).split()[:3] == ['lzw', 'random', '1000']
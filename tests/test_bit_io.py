@@ -0,0 +1,92 @@
+import random
+import pytest
+from utils.bit_io import BitWriter, BitReader
+from utils.bytes_utils import pad_bytes, remove_padding, write_varint, read_varint
+
+
+def test_write_layout():
+    writer = BitWriter()
+    writer.write(0b101, 3)
+    writer.write(0b1, 1)
+    writer.write(0b0000001, 7)
+    assert writer.bit_length() == 11
+    assert writer.getvalue() == bytes([0b10110000, 0b00100000])
+    # the padding info byte: 5 zero bits pad the last byte
+    assert writer.get_padded_bytes() == bytes([5, 0b10110000, 0b00100000])
+
+
+def test_padding():
+    assert pad_bytes(b'\xff', 8) == b'\x08\xff\x00'
+    data, n_bits = remove_padding(pad_bytes(b'\xff', 8))
+    assert n_bits == 8 and bytes(data)[:1] == b'\xff'
+    data, n_bits = remove_padding(pad_bytes(b'', 0))
+    assert n_bits == 0
+
+
+@pytest.mark.parametrize('n_values', [0, 1, 100, 5000])
+def test_round_trip(n_values):
+    rng = random.Random(n_values)
+    widths = [rng.randrange(1, 40) for _ in range(n_values)]
+    values = [rng.getrandbits(width) for width in widths]
+    writer = BitWriter()
+    for value, width in zip(values, widths):
+        writer.write(value, width)
+    reader = BitReader.from_padded(writer.get_padded_bytes())
+    assert reader.n_bits == sum(widths)
+    assert [reader.read(width) for width in widths] == values
+    assert reader.bits_left() == 0
+
+
+@pytest.mark.parametrize('n_bits', [1, 7, 9, 16, 23])
+def test_fixed_round_trip(n_bits):
+    rng = random.Random(n_bits)
+    values = [rng.getrandbits(n_bits) for _ in range(3000)]
+    writer = BitWriter()
+    writer.write(1, 3)
+    writer.write_fixed(values, n_bits)
+    reader = BitReader.from_padded(writer.get_padded_bytes())
+    assert reader.read(3) == 1
+    assert reader.read_fixed(n_bits) == values
+
+
+def test_write_codes():
+    codes = {'a': (0b0, 1), 'b': (0b10, 2), 'c': (0b11, 2)}
+    symbols = list('abcabcaab') * 100
+    writer = BitWriter()
+    writer.write_codes(symbols, codes)
+    reference = BitWriter()
+    for symbol in symbols:
+        reference.write(*codes[symbol])
+    assert writer.getvalue() == reference.getvalue()
+    assert writer.bit_length() == reference.bit_length()
+
+
+def test_take_bytes():
+    writer = BitWriter()
+    pieces = []
+    for value in range(1000):
+        writer.write(value, 13)
+        if value % 100 == 0:
+            pieces.append(writer.take_bytes())
+    reference = BitWriter()
+    reference.write_fixed(range(1000), 13)
+    assert b''.join(pieces) + writer.getvalue() == reference.getvalue()
+
+
+def test_peek_past_the_end():
+    reader = BitReader(b'\xff')
+    assert reader.peek(12) == 0xff0
+    reader.skip(4)
+    assert reader.read(4) == 0xf
+    assert reader.bits_left() == 0
+
+
+@pytest.mark.parametrize('value', [0, 1, 127, 128, 300, 1 << 35, (1 << 64) - 1])
+def test_varint(value):
+    data = b'-' + write_varint(value) + b'+'
+    assert read_varint(data, 1) == (value, len(data) - 1)
+
+
+def test_truncated_varint():
+    with pytest.raises(ValueError, match='truncated varint'):
+        read_varint(write_varint(1 << 20)[:-1], 0)
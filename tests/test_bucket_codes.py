@@ -0,0 +1,72 @@
+import random
+import pytest
+from conftest import CORPORA
+from lzw_huffman.lzw_huffman import Lempel_Ziv_Huffman_Coding
+from utils.bit_io import BitWriter
+from utils.bucket_codes import DIRECT_CODES, BUCKET_BITS, BucketDecodeTable, code_bucket, bucket_base, \
+    bucket_frequency, expand_codes
+from utils.canonical_huffman import huffman_code_lengths, canonical_codes
+from utils.container import Header, BUCKETED
+
+
+def test_code_bucket():
+    previous = -1
+    for code in range(1 << 16):
+        bucket, n_extra_bits = code_bucket(code)
+        base, base_extra_bits = bucket_base(bucket)
+        assert n_extra_bits == base_extra_bits
+        assert base <= code < base + (1 << n_extra_bits)
+        # the buckets follow the codes
+        assert bucket in (previous, previous + 1)
+        previous = bucket
+    assert code_bucket(DIRECT_CODES - 1) == (DIRECT_CODES - 1, 0)
+    # 2 ** BUCKET_BITS buckets per bit length
+    assert code_bucket((1 << 16) - 1)[0] - code_bucket(1 << 15)[0] == (1 << BUCKET_BITS) - 1
+    assert code_bucket(1 << 16)[0] == code_bucket((1 << 16) - 1)[0] + 1
+
+
+def test_expand_codes_round_trip():
+    rng = random.Random(0)
+    codes = [min(int(rng.expovariate(1 / 2000)), (1 << 18) - 1) for _ in range(20000)]
+    frequency = {}
+    for code in codes:
+        frequency[code] = frequency.get(code, 0) + 1
+    buckets = bucket_frequency(frequency)
+    assert sum(buckets.values()) == len(codes)
+    assert len(buckets) < len(frequency) / 10
+
+    bucket_codes = canonical_codes(huffman_code_lengths(buckets))
+    writer = BitWriter()
+    writer.write_codes(codes, expand_codes(bucket_codes, frequency))
+    data, n_bits = writer.getvalue(), writer.bit_length()
+    table = BucketDecodeTable(bucket_codes)
+    assert table.decode(data, n_bits) == codes
+
+    # decoding from a code in the middle of the bits, up to another one
+    lengths = [bucket_codes[code_bucket(code)[0]][1] + code_bucket(code)[1] for code in codes]
+    start = sum(lengths[:1000])
+    stop = start + sum(lengths[1000:3000])
+    assert table.decode_range(data, n_bits, start, stop) == (codes[1000:3000], stop)
+
+
+def test_invalid_code():
+    # bucket 0 is coded 0, bucket 1 is coded 10: the bits 11 are no code
+    table = BucketDecodeTable({0: (0, 1), 1: (2, 2)})
+    with pytest.raises(ValueError, match='invalid huffman code'):
+        table.decode(b'\xff', 8)
+
+
+@pytest.mark.parametrize('max_bits', [12, 18])
+def test_codec(corpus, max_bits):
+    codec = Lempel_Ziv_Huffman_Coding(None, max_bits=max_bits, buckets=True)
+    compressed = codec.compress_bytes(corpus)
+    assert Header.from_bytes(compressed)[0].flags & BUCKETED
+    # the flag is read from the header
+    assert Lempel_Ziv_Huffman_Coding(None).decompress_bytes(compressed) == corpus
+
+
+def test_smaller_code_table():
+    data = CORPORA['text']
+    bucketed = Lempel_Ziv_Huffman_Coding(None, max_bits=18, buckets=True).compress_bytes(data)
+    assert not Header.from_bytes(Lempel_Ziv_Huffman_Coding(None).compress_bytes(data))[0].flags & BUCKETED
+    assert len(bucketed) < len(Lempel_Ziv_Huffman_Coding(None, max_bits=18).compress_bytes(data))
@@ -0,0 +1,103 @@
+import random
+import pytest
+from utils.bit_io import BitWriter
+from utils.canonical_huffman import MAX_CODE_LENGTH, huffman_code_lengths, limit_code_lengths, canonical_codes, \
+    DecodeTable
+
+
+def kraft_sum(code_lengths):
+    return sum(2.0 ** -length for length in code_lengths.values())
+
+
+def fibonacci_frequency(n_symbols):
+    # the most skewed frequencies: the huffman tree is a chain, code lengths up to n_symbols - 1
+    frequency = {}
+    a, b = 1, 1
+    for symbol in range(n_symbols):
+        frequency[symbol] = a
+        a, b = b, a + b
+    return frequency
+
+
+def encode(symbols, codes):
+    writer = BitWriter()
+    writer.write_codes(symbols, codes)
+    return writer.getvalue(), writer.bit_length()
+
+
+def test_canonical_codes_layout():
+    # the codes are fully described by the lengths: existing files depend on this assignment
+    assert canonical_codes({ord('a'): 1, ord('b'): 2, ord('c'): 3, ord('d'): 3}) == \
+        {ord('a'): (0b0, 1), ord('b'): (0b10, 2), ord('c'): (0b110, 3), ord('d'): (0b111, 3)}
+    assert canonical_codes({7: 2, 3: 2, 5: 2, 1: 2}) == {1: (0, 2), 3: (1, 2), 5: (2, 2), 7: (3, 2)}
+
+
+def test_single_symbol():
+    assert huffman_code_lengths({42: 1000}) == {42: 1}
+    assert canonical_codes({42: 0}) == {42: (0, 1)}
+    assert huffman_code_lengths({}) == {}
+
+
+def test_code_lengths_are_optimal():
+    frequency = {0: 45, 1: 13, 2: 12, 3: 16, 4: 9, 5: 5}
+    code_lengths = huffman_code_lengths(frequency)
+    assert sum(frequency[symbol] * length for symbol, length in code_lengths.items()) == 224
+    assert kraft_sum(code_lengths) == 1
+
+
+def test_code_lengths_are_reproducible():
+    frequency = {symbol: 1 + symbol % 5 for symbol in range(300)}
+    shuffled = dict(random.Random(1).sample(sorted(frequency.items()), len(frequency)))
+    assert huffman_code_lengths(frequency) == huffman_code_lengths(shuffled)
+
+
+@pytest.mark.parametrize('n_symbols, max_length', [(40, MAX_CODE_LENGTH), (40, 15), (30, 8), (256, 8), (300, 9)])
+def test_limit_code_lengths(n_symbols, max_length):
+    frequency = fibonacci_frequency(n_symbols)
+    code_lengths = huffman_code_lengths(frequency, max_length)
+    assert set(code_lengths) == set(frequency)
+    assert max(code_lengths.values()) <= max_length
+    # still a complete prefix code
+    assert kraft_sum(code_lengths) == 1
+    # a more frequent symbol never gets a longer code
+    by_frequency = sorted(frequency, key=lambda symbol: (-frequency[symbol], symbol))
+    lengths = [code_lengths[symbol] for symbol in by_frequency]
+    assert lengths == sorted(lengths)
+
+
+def test_limit_code_lengths_unchanged():
+    code_lengths = {0: 1, 1: 2, 2: 3, 3: 3}
+    assert limit_code_lengths(code_lengths, 3) is code_lengths
+
+
+def test_limit_code_lengths_too_many_symbols():
+    with pytest.raises(ValueError, match='do not fit'):
+        limit_code_lengths({symbol: 9 for symbol in range(512)}, 8)
+
+
+@pytest.mark.parametrize('primary_bits', [1, 4, 11])
+@pytest.mark.parametrize('max_length', [9, 15, MAX_CODE_LENGTH])
+def test_decode_table(primary_bits, max_length):
+    rng = random.Random(max_length)
+    frequency = fibonacci_frequency(25)
+    frequency.update({symbol: rng.randrange(1, 1000) for symbol in range(100, 400)})
+    codes = canonical_codes(huffman_code_lengths(frequency, max_length))
+    symbols = rng.choices(list(frequency), k=5000)
+    data, n_bits = encode(symbols, codes)
+    table = DecodeTable(codes, primary_bits=primary_bits)
+    assert table.decode(data, n_bits) == symbols
+
+    # piece by piece, from code boundaries
+    decoded = []
+    position = 0
+    while position < n_bits:
+        piece, position = table.decode_range(data, n_bits, position, position + 997)
+        decoded.extend(piece)
+    assert decoded == symbols
+
+
+def test_decode_invalid_code():
+    # an incomplete code: 11 is not a code
+    codes = canonical_codes({0: 1, 1: 2})
+    with pytest.raises(ValueError, match='invalid huffman code'):
+        DecodeTable(codes).decode(bytes([0b11000000]), 2)
@@ -0,0 +1,91 @@
+import os
+import subprocess
+import sys
+import pytest
+from conftest import CORPORA
+from compressor.__main__ import main, output_path, format_result
+from utils.codec_names import CODECS, parse_size
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DATA = CORPORA['text'][:50000]
+
+
+@pytest.fixture
+def data_path(tmp_path):
+    path = str(tmp_path / 'data.txt')
+    with open(path, 'wb') as file:
+        file.write(DATA)
+    return path
+
+
+def read(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+@pytest.mark.parametrize('codec_name', list(CODECS))
+@pytest.mark.parametrize('workers', [1, 2])
+def test_compress_decompress(codec_name, workers, data_path, tmp_path):
+    assert main(['compress', '-c', codec_name, '-j', str(workers), '-b', '16K', data_path]) == 0
+    os.remove(data_path)
+    assert main(['test', data_path + '.bin']) == 0
+    assert main(['decompress', '-j', str(workers), data_path + '.bin']) == 0
+    assert read(data_path) == DATA
+
+
+def test_output_options(data_path, tmp_path, capsys):
+    compressed_path = str(tmp_path / 'out.z')
+    assert main(['compress', '-l', 'max', '-o', compressed_path, data_path]) == 0
+    # an existing output is not overwritten without -f
+    assert main(['compress', '-o', compressed_path, data_path]) == 1
+    assert 'already exists' in capsys.readouterr().err
+    assert main(['compress', '-f', '-v', '-o', compressed_path, data_path]) == 0
+    assert 'ratio' in capsys.readouterr().err
+    assert main(['decompress', compressed_path]) == 0
+    assert read(compressed_path + '.out') == DATA
+
+
+def test_errors(data_path, tmp_path, capsys):
+    with pytest.raises(SystemExit):
+        main(['compress', '-c', 'lzw', '-l', 'max', data_path])
+    with pytest.raises(SystemExit):
+        main(['compress', '-o', str(tmp_path / 'out.bin'), data_path, data_path])
+    assert main(['decompress', data_path]) == 1
+    assert 'error:' in capsys.readouterr().err
+    # test goes on with the next file
+    assert main(['compress', data_path]) == 0
+    assert main(['test', data_path, data_path + '.bin']) == 1
+    assert capsys.readouterr().err.startswith(data_path + ':')
+
+
+def test_stdin_stdout():
+    command = [sys.executable, '-m', 'compressor']
+    compressed = subprocess.run(command + ['compress', '-c', 'lzw_huffman'], input=DATA, stdout=subprocess.PIPE,
+                                cwd=ROOT, check=True).stdout
+    assert subprocess.run(command + ['decompress', '-'], input=compressed, stdout=subprocess.PIPE, cwd=ROOT,
+                          check=True).stdout == DATA
+    assert subprocess.run(command + ['test'], input=compressed[:-5], stderr=subprocess.PIPE, cwd=ROOT).returncode == 1
+
+
+def test_output_path():
+    class Args:
+        stdout = False
+        output = None
+    assert output_path('compress', 'a.txt', Args) == 'a.txt.bin'
+    assert output_path('decompress', 'a.txt.bin', Args) == 'a.txt'
+    assert output_path('decompress', 'a.z', Args) == 'a.z.out'
+    assert output_path('compress', '-', Args) == '-'
+    Args.stdout = True
+    assert output_path('compress', 'a.txt', Args) == '-'
+
+
+def test_format_result():
+    assert format_result('compress', 'a', 2000, 1000, 1.0) == 'a: 2000 <-> 1000 bytes, ratio 2.00, 1.00 s, 0.00 MB/s'
+    assert format_result('test', 'a', 1000, 2000, 0.0).startswith('a: test ok 2000 <-> 1000 bytes')
+
+
+def test_parse_size():
+    assert [parse_size(text) for text in ['1024', '1K', '1.5k', '4M', '1G', '64KB']] == \
+        [1024, 1024, 1536, 4 << 20, 1 << 30, 64 << 10]
@@ -0,0 +1,77 @@
+import math
+import pytest
+from conftest import CORPORA
+from huffman.huffman import Huffman_Coding
+from lzw_huffman.lzw_huffman import Lempel_Ziv_Huffman_Coding
+from utils.canonical_huffman import canonical_codes, huffman_code_lengths
+from utils.code_cache import CodeCache, signature, entropy_bits, code_bits
+
+
+def records(n_records, size=2000):
+    """
+    :return: list of slices of the sample text: about the same histogram
+    """
+    text = CORPORA['text']
+    return [text[i * size:(i + 1) * size] for i in range(n_records)]
+
+
+@pytest.mark.parametrize('codec_class', [Huffman_Coding, Lempel_Ziv_Huffman_Coding])
+def test_round_trip(codec_class, corpus):
+    cache = CodeCache()
+    for data in records(5) + [corpus]:
+        compressed = codec_class(None, code_cache=cache).compress_bytes(data)
+        assert codec_class(None, code_cache=cache).decompress_bytes(compressed) == data
+        assert codec_class(None).decompress_bytes(compressed) == data
+
+
+def test_similar_data_hits():
+    cache = CodeCache()
+    for data in records(20):
+        compressed = Huffman_Coding(None, code_cache=cache).compress_bytes(data)
+        Huffman_Coding(None, code_cache=cache).decompress_bytes(compressed)
+    summary = cache.summary()
+    assert summary['hits'] > 10
+    assert summary['hits'] + summary['misses'] == 20
+    # a hit reuses the code, so its decode table too
+    assert summary['decoder_hits'] >= summary['hits']
+    assert summary['entries'] <= summary['misses']
+
+
+def test_loss_is_bounded():
+    cache = CodeCache()
+    for data in records(20):
+        cached = Huffman_Coding(None, code_cache=cache).compress_bytes(data)
+        built = Huffman_Coding(None).compress_bytes(data)
+        assert len(cached) <= len(built) * 1.02 + 8
+
+
+def test_rejected():
+    cache = CodeCache(max_ratio_loss=0.0)
+    frequency = {0: 100, 1: 50, 2: 50}
+    codes = canonical_codes(huffman_code_lengths(frequency))
+    cache.store(frequency, 24, codes)
+    assert cache.lookup(frequency, 24) == codes
+    # the same signature, but a symbol without a code
+    assert cache.lookup({0: 100, 1: 50, 2: 50, 3: 1}, 24) is None
+    assert (cache.hits, cache.rejected) == (1, 1)
+    assert cache.lookup(frequency, 12) is None
+
+
+def test_eviction():
+    cache = CodeCache(max_entries=2)
+    for symbol in range(3):
+        frequency = {symbol: 100, 255: 1000}
+        cache.store(frequency, 24, canonical_codes(huffman_code_lengths(frequency)))
+    assert cache.summary()['entries'] == 2
+    assert cache.evictions == 1
+    assert cache.lookup({0: 100, 255: 1000}, 24) is None
+
+
+def test_measures():
+    frequency = {0: 2, 1: 1, 2: 1}
+    assert entropy_bits(frequency) == pytest.approx(6.0)
+    assert code_bits(frequency, {0: (0, 1), 1: (2, 2), 2: (3, 2)}) == 6
+    assert code_bits(frequency, {0: (0, 1)}) is None
+    total = sum(frequency.values())
+    assert signature(frequency, 12) == (12,) + tuple((symbol, round(math.log2(total / count)))
+                                                     for symbol, count in sorted(frequency.items()))
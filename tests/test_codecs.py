@@ -0,0 +1,58 @@
+import shutil
+import pytest
+from conftest import CODECS, CORPORA, SAMPLE_PATH
+from huffman.huffman import Huffman_Coding
+from lzw.lzw_coding import LZW_Coding
+from lzw_huffman.lzw_huffman import Lempel_Ziv_Huffman_Coding
+from utils.container import HEADER_SIZE
+
+
+# the offset of the crc32 in the header (see utils.container.HEADER_FORMAT)
+CHECKSUM_OFFSET = HEADER_SIZE - 4
+
+
+def test_bytes_round_trip(codec_spec, make_codec, corpus):
+    codec_class = codec_spec[0]
+    compressed = make_codec().compress_bytes(corpus)
+    assert make_codec().decompress_bytes(compressed) == corpus
+    # the header holds everything decompress needs
+    assert codec_class(None).decompress_bytes(compressed) == corpus
+
+
+def test_bytes_like_input(make_codec):
+    data = CORPORA['text'][:5000]
+    compressed = make_codec().compress_bytes(data)
+    assert make_codec().compress_bytes(bytearray(data)) == compressed
+    assert make_codec().compress_bytes(memoryview(data)) == compressed
+    assert make_codec().decompress_bytes(bytearray(compressed)) == data
+
+
+def test_file_round_trip(codec_spec, make_codec, tmp_path):
+    _, _, compress_name, decompress_name = codec_spec
+    path = str(tmp_path / 'sample.txt')
+    shutil.copy(SAMPLE_PATH, path)
+    compressed_path = getattr(make_codec(path), compress_name)()
+    decompressed_path = getattr(make_codec(path), decompress_name)(compressed_path)
+    assert decompressed_path != path
+    with open(SAMPLE_PATH, 'rb') as original, open(decompressed_path, 'rb') as decompressed:
+        assert decompressed.read() == original.read()
+
+
+def test_compresses_text(make_codec):
+    data = CORPORA['text']
+    assert len(make_codec().compress_bytes(data)) < len(data) * 0.7
+
+
+@pytest.mark.parametrize('codec_class', [Huffman_Coding, LZW_Coding, Lempel_Ziv_Huffman_Coding])
+def test_corrupted_checksum(codec_class):
+    compressed = bytearray(codec_class(None).compress_bytes(CORPORA['text']))
+    compressed[CHECKSUM_OFFSET] ^= 1
+    with pytest.raises(ValueError, match='checksum mismatch'):
+        codec_class(None).decompress_bytes(compressed)
+
+
+@pytest.mark.parametrize('codec_id', sorted(CODECS))
+def test_not_compressed(codec_id):
+    codec_class, options, _, _ = CODECS[codec_id]
+    with pytest.raises(ValueError, match='not a compressed'):
+        codec_class(None, **options).decompress_bytes(CORPORA['text'][:1000])
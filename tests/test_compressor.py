@@ -0,0 +1,64 @@
+import pytest
+from conftest import CORPORA
+from compressor.compressor import Compressor, FAST, BALANCED, MAX, LEVELS, STORED, sample, lzw_bits, \
+    estimate_ratios, choose_method
+from lzw.lzw_coding import LZW_Coding
+from utils.container import HUFFMAN, LZW, LZW_HUFFMAN
+from utils.lzw_dictionary import FIRST_CODE, MIN_BITS
+
+
+@pytest.mark.parametrize('level', LEVELS)
+def test_levels(level, corpus):
+    codec = Compressor(None, level=level, block_size=1 << 14)
+    assert Compressor(None).decompress_bytes(codec.compress_bytes(corpus)) == corpus
+
+
+def test_stored_random_data():
+    data = CORPORA['random']
+    for level in LEVELS:
+        block = Compressor(None, level=level).compress_block(data)
+        assert block == bytes([STORED]) + data
+
+
+def test_block_methods():
+    text = CORPORA['text'][:50000]
+    assert Compressor(None, level=FAST).block_methods(text) == [HUFFMAN]
+    assert Compressor(None, level=BALANCED).block_methods(text) in ([LZW], [LZW_HUFFMAN])
+    assert sorted(Compressor(None, level=MAX).block_methods(text)) == [HUFFMAN, LZW, LZW_HUFFMAN]
+    assert Compressor(None).block_methods(b'') == []
+
+
+def test_max_is_smallest():
+    data = CORPORA['text']
+    sizes = {level: len(Compressor(None, level=level).compress_bytes(data)) for level in LEVELS}
+    assert sizes[MAX] <= sizes[BALANCED] <= sizes[FAST] < len(data)
+
+
+def test_sample():
+    block = bytes(range(256)) * 1000
+    assert sample(b'abc') == b'abc'
+    assert len(sample(block, sample_bytes=1000, n_slices=4)) == 1000
+    assert sample(block, sample_bytes=8, n_slices=2) == block[:4] + block[-4:]
+
+
+def test_lzw_bits():
+    assert lzw_bits(0, 12) == 0
+    assert lzw_bits(10, MIN_BITS) == 10 * MIN_BITS
+    n_codes = (1 << MIN_BITS) - FIRST_CODE
+    assert lzw_bits(n_codes + 1, 16) == n_codes * MIN_BITS + MIN_BITS + 1
+
+
+def test_choose_method():
+    assert choose_method(estimate_ratios(CORPORA['random'], 12)) == STORED
+    assert choose_method({HUFFMAN: 0.6, LZW: 0.5, LZW_HUFFMAN: 0.48}) == LZW
+    assert choose_method({HUFFMAN: 0.6, LZW: 0.5, LZW_HUFFMAN: 0.4}) == LZW_HUFFMAN
+    assert choose_method({HUFFMAN: 0.6}) == HUFFMAN
+
+
+def test_errors():
+    with pytest.raises(ValueError, match='unknown level'):
+        Compressor(None, level='fastest')
+    with pytest.raises(ValueError, match='unknown block method'):
+        Compressor(None).decompress_block(b'\x09abc')
+    with pytest.raises(ValueError, match='expected 4'):
+        Compressor(None).decompress_bytes(LZW_Coding(None).compress_bytes(b'abc'))
@@ -0,0 +1,162 @@
+import io
+import pytest
+from huffman.huffman import Huffman_Coding
+from lzw.lzw_coding import LZW_Coding
+from lzw_huffman.lzw_huffman import Lempel_Ziv_Huffman_Coding
+from utils.bytes_utils import write_varint
+from utils.container import Header, HEADER_SIZE, HUFFMAN, LZW, LZW_HUFFMAN, STREAM, INDEPENDENT, checksum, \
+    compress_blocks, decompress_blocks, pack_index, unpack_index, read_index, pack_code_lengths, unpack_code_lengths, \
+    read_stream_varint
+
+
+TEXT = b'abracadabra abracadabra'
+
+# files written by the current format version: they must stay readable
+GOLDEN_FILES = {
+    Huffman_Coding: '44434d50010100000000000000001705100e4e117304010203020402400212ec674020400d044cf54ce4cf54c0',
+    LZW_Coding: '44434d50010200000000000000001705100e4e01100230988e46131984c9018188211048342c',
+    Lempel_Ziv_Huffman_Coding: '44434d50010300000000000000001705100e4e19128c02050002020403040401400328cdc33224af20400d'
+                               '8e01071e8826f1bf7900',
+}
+
+
+def test_header_layout():
+    header = Header(LZW, 11, checksum(b'hello world'), flags=STREAM, params=bytes([16]))
+    assert header.to_bytes().hex() == '44434d50010201000000000000000b0d4a11850110'
+
+
+def test_header_round_trip():
+    header = Header(LZW_HUFFMAN, 123456789, 0xdeadbeef, flags=STREAM | INDEPENDENT, params=bytes(range(200)))
+    data = header.to_bytes() + b'body'
+    parsed, offset = Header.from_bytes(data, codec_id=LZW_HUFFMAN)
+    assert (parsed.codec_id, parsed.original_length, parsed.checksum, parsed.flags, parsed.params) == \
+        (LZW_HUFFMAN, 123456789, 0xdeadbeef, STREAM | INDEPENDENT, bytes(range(200)))
+    assert data[offset:] == b'body'
+
+    reader = io.BytesIO(data)
+    parsed = Header.read(reader)
+    assert parsed.params == bytes(range(200))
+    assert reader.read() == b'body'
+
+
+@pytest.mark.parametrize('data, message', [
+    (b'DCMP', 'too short'),
+    (b'XXXX' + bytes(HEADER_SIZE), 'bad magic'),
+    (Header(HUFFMAN).to_bytes().replace(b'DCMP\x01', b'DCMP\x02'), 'version 2'),
+    (Header(LZW).to_bytes(), 'codec 2, expected 1'),
+])
+def test_header_errors(data, message):
+    with pytest.raises(ValueError, match=message):
+        Header.from_bytes(data, codec_id=HUFFMAN)
+
+
+def test_header_read_truncated():
+    with pytest.raises(ValueError, match='unexpected end'):
+        Header.read(io.BytesIO(Header(HUFFMAN, params=b'abc').to_bytes()[:-1]))
+
+
+def test_header_verify():
+    header = Header(HUFFMAN, len(TEXT), checksum(TEXT))
+    header.verify(TEXT)
+    with pytest.raises(ValueError, match='original length'):
+        header.verify(TEXT[:-1])
+    with pytest.raises(ValueError, match='checksum mismatch'):
+        header.verify(TEXT.upper())
+
+
+@pytest.mark.parametrize('codec_class', list(GOLDEN_FILES))
+def test_golden_files(codec_class):
+    assert codec_class(None).decompress_bytes(bytes.fromhex(GOLDEN_FILES[codec_class])) == TEXT
+
+
+@pytest.mark.parametrize('codec_class', list(GOLDEN_FILES))
+def test_wrong_codec(codec_class):
+    other = LZW_Coding if codec_class is not LZW_Coding else Huffman_Coding
+    with pytest.raises(ValueError, match='was compressed with codec'):
+        codec_class(None).decompress_bytes(other(None).compress_bytes(TEXT))
+
+
+@pytest.mark.parametrize('code_lengths', [
+    {},
+    {65: 1},
+    {0: 1, 5: 2, 300: 3, 301: 3},
+    {symbol: 8 for symbol in range(256)},
+    {symbol: 1 + symbol % 20 for symbol in range(0, 5000, 7)},
+])
+def test_code_lengths_round_trip(code_lengths):
+    packed = b'xy' + pack_code_lengths(code_lengths) + b'z'
+    assert unpack_code_lengths(packed, 2) == (code_lengths, len(packed) - 1)
+
+
+def test_code_lengths_layout():
+    assert pack_code_lengths({0: 1, 5: 2, 300: 3, 301: 3}).hex() == 'ae020401020202030240020c37a004a602'
+
+
+def test_code_lengths_corrupted():
+    packed = bytearray(pack_code_lengths({0: 1, 5: 2, 300: 3, 301: 3}))
+    packed[0] += 1
+    with pytest.raises(ValueError, match='corrupted code lengths table'):
+        unpack_code_lengths(bytes(packed))
+
+
+def test_stream_varint():
+    reader = io.BytesIO(write_varint(0) + write_varint(300) + write_varint(1 << 40))
+    assert [read_stream_varint(reader) for _ in range(3)] == [(value, write_varint(value))
+                                                              for value in (0, 300, 1 << 40)]
+    with pytest.raises(ValueError, match='unexpected end'):
+        read_stream_varint(io.BytesIO(write_varint(300)[:1]))
+
+
+def test_blocks_round_trip():
+    data = bytes(range(256)) * 100
+    stream = io.BytesIO()
+    assert compress_blocks(io.BytesIO(data), stream, Header(HUFFMAN), bytes, block_size=1000) == len(data)
+    stream.seek(0)
+    header = Header.read(stream, codec_id=HUFFMAN)
+    assert header.flags & STREAM
+    output = io.BytesIO()
+    assert decompress_blocks(stream, output, header, bytes) == len(data)
+    assert output.getvalue() == data
+    assert header.original_length == len(data) and header.checksum == checksum(data)
+
+
+def test_blocks_errors():
+    stream = io.BytesIO()
+    compress_blocks(io.BytesIO(TEXT), stream, Header(HUFFMAN), bytes, block_size=5)
+    compressed = stream.getvalue()
+
+    def decompress(data, decompress_block=bytes):
+        reader = io.BytesIO(data)
+        return decompress_blocks(reader, io.BytesIO(), Header.read(reader), decompress_block)
+
+    with pytest.raises(ValueError, match='not a compressed stream'):
+        decompress(Header(HUFFMAN).to_bytes())
+    with pytest.raises(ValueError, match='unexpected end'):
+        decompress(compressed[:-3])
+    with pytest.raises(ValueError, match='block length'):
+        decompress(compressed, lambda payload: bytes(payload)[1:])
+    with pytest.raises(ValueError, match='checksum mismatch'):
+        decompress(compressed, lambda payload: bytes(payload).upper())
+
+
+def test_index():
+    index = [(1 << 20, 30, 1000), (1 << 20, 1040, 70000), (5, 71050, 3)]
+    packed = pack_index(index)
+    assert unpack_index(b'--' + packed, 2) == index
+
+    stream = io.BytesIO()
+    compress_blocks(io.BytesIO(TEXT), stream, Header(HUFFMAN, flags=INDEPENDENT), bytes, block_size=10)
+    offsets = [(block_length, payload_length) for block_length, _, payload_length in read_index(stream)]
+    assert offsets == [(10, 10), (10, 10), (3, 3)]
+    start = 0
+    for block_length, offset, payload_length in read_index(stream):
+        stream.seek(offset)
+        assert stream.read(payload_length) == TEXT[start:start + block_length]
+        start += block_length
+
+
+def test_no_index():
+    stream = io.BytesIO()
+    compress_blocks(io.BytesIO(TEXT), stream, Header(HUFFMAN), bytes)
+    with pytest.raises(ValueError, match='no block index'):
+        read_index(stream)
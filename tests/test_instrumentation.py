@@ -0,0 +1,65 @@
+import pytest
+from conftest import CORPORA
+from huffman.huffman import Huffman_Coding
+from lzw.lzw_coding import LZW_Coding
+from lzw_huffman.lzw_huffman import Lempel_Ziv_Huffman_Coding
+from utils.instrumentation import NULL_STAGE, Stats, stage
+
+
+DATA = CORPORA['text'][:50000]
+
+
+@pytest.mark.parametrize('codec_class, stages', [
+    (Huffman_Coding, {'make_frequency_dict', 'make_heap', 'make_codes', 'get_encoded_text', 'pack_header',
+                      'load_code_lengths', 'decode_text'}),
+    (LZW_Coding, {'lzw_compress', 'pack_header', 'lzw_decompress'}),
+    (Lempel_Ziv_Huffman_Coding, {'lzw_compress', 'make_codes', 'get_encoded_text', 'load_code_lengths',
+                                 'lzw_decompress'}),
+])
+def test_codec_stages(codec_class, stages):
+    records = []
+    stats = Stats(callback=records.append)
+    compressed = codec_class(None, stats=stats).compress_bytes(DATA)
+    assert codec_class(None, stats=stats).decompress_bytes(compressed) == DATA
+    summary = stats.summary()
+    assert stages <= set(summary)
+    assert records == stats.records
+    assert all(record.seconds >= 0 for record in records)
+    assert summary['lzw_compress' if codec_class is not Huffman_Coding else 'make_frequency_dict']['bytes_in'] == \
+        len(DATA)
+
+
+def test_summary():
+    stats = Stats()
+    for size in (10, 20):
+        with stats.stage('read', size) as record:
+            record.bytes_out = size * 2
+            record.dictionary_size = size
+    with stats.stage('write'):
+        pass
+    summary = stats.summary()
+    assert summary['read']['runs'] == 2
+    assert summary['read']['bytes_in'] == 30
+    assert summary['read']['bytes_out'] == 60
+    # the max, not the sum
+    assert summary['read']['dictionary_size'] == 20
+    assert 'bytes_in' not in summary['write']
+    lines = stats.report().splitlines()
+    assert lines[0].split()[:3] == ['stage', 'runs', 'seconds']
+    assert sorted(line.split()[0] for line in lines[1:]) == ['read', 'write']
+
+
+def test_trace_memory():
+    stats = Stats(trace_memory=True)
+    try:
+        with stats.stage('allocate') as record:
+            block = bytearray(1 << 20)
+        assert record.peak_bytes >= len(block)
+    finally:
+        stats.stop()
+    assert not stats.started_tracing
+
+
+def test_disabled():
+    assert stage(None, 'anything', 10) is NULL_STAGE
+    assert Huffman_Coding(None).decompress_bytes(Huffman_Coding(None).compress_bytes(DATA)) == DATA
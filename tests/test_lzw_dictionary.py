@@ -0,0 +1,103 @@
+import random
+import pytest
+from conftest import CORPORA
+from utils.bit_io import BitWriter, BitReader
+from utils.lzw_dictionary import CLEAR_CODE, FIRST_CODE, MIN_BITS, LZWEncoder, LZWDecoder, lzw_decode
+
+
+def test_codes():
+    # the classic example: repeated pairs are coded with the entries added before
+    codes = LZWEncoder().encode(b'TOBEORNOTTOBEORTOBEORNOT')
+    assert codes[:8] == list(b'TOBEORNO')
+    assert all(code < FIRST_CODE + len(codes) for code in codes)
+    assert len(codes) < 24
+    assert lzw_decode(codes) == b'TOBEORNOTTOBEORTOBEORNOT'
+
+
+def test_code_added_while_used():
+    # cScSc: the code is used in the step that adds it
+    codes = LZWEncoder().encode(b'aaaaaaa')
+    assert codes == [97, FIRST_CODE, FIRST_CODE + 1, 97]
+    assert lzw_decode(codes) == b'aaaaaaa'
+
+
+@pytest.mark.parametrize('max_bits', [None, 9, 12, 16])
+def test_round_trip(corpus, max_bits):
+    codes = LZWEncoder(max_bits).encode(corpus)
+    if max_bits is not None:
+        assert all(code < 1 << max_bits for code in codes)
+    assert LZWDecoder(max_bits).decode(codes, len(corpus)) == corpus
+    assert LZWDecoder(max_bits).decode(codes) == corpus
+
+
+def test_clear_code():
+    data = CORPORA['text'][:30000] + CORPORA['random']
+    codes = LZWEncoder(max_bits=9).encode(data)
+    assert CLEAR_CODE in codes
+    assert LZWDecoder(max_bits=9).decode(codes) == data
+
+
+@pytest.mark.parametrize('max_bits', [None, 10])
+def test_pieces(max_bits):
+    data = CORPORA['text'][:50000]
+    encoder = LZWEncoder(max_bits)
+    pieces = [data[start:start + 777] for start in range(0, len(data), 777)] + [b'']
+    codes = []
+    for piece in pieces:
+        codes.extend(encoder.encode(piece, final=not piece))
+    assert codes == LZWEncoder(max_bits).encode(data)
+
+    chunks = [codes[start:start + 500] for start in range(0, len(codes), 500)]
+    assert b''.join(LZWDecoder(max_bits).iter_decode(chunks)) == data
+
+
+@pytest.mark.parametrize('max_bits', [None, 9, 16])
+@pytest.mark.parametrize('chunk_codes', [1, 37, 100000])
+def test_variable_width_codes(corpus, max_bits, chunk_codes):
+    writer = BitWriter()
+    writer.write(0b101, 3)
+    LZWEncoder(max_bits).encode_bits(corpus, writer)
+    data = writer.get_padded_bytes()
+
+    reader = BitReader.from_padded(data)
+    assert reader.read(3) == 0b101
+    if corpus:
+        # the first code is MIN_BITS wide
+        assert reader.peek(MIN_BITS) == corpus[0]
+    assert LZWDecoder(max_bits).decode_bits(reader) == corpus
+    reader = BitReader.from_padded(data)
+    reader.skip(3)
+    assert b''.join(LZWDecoder(max_bits).iter_decode_bits(reader, chunk_codes)) == corpus
+
+
+def test_stream_blocks():
+    # the dictionary is kept from block to block
+    encoder = LZWEncoder(max_bits=12)
+    decoder = LZWDecoder(max_bits=12)
+    data = CORPORA['text'][:60000]
+    blocks = [data[start:start + 4096] for start in range(0, len(data), 4096)]
+    sizes = []
+    for block in blocks:
+        codes = encoder.encode(block)
+        sizes.append(len(codes))
+        assert decoder.decode(codes) == block
+    assert sizes[-2] < sizes[0]
+
+
+def test_invalid_code():
+    with pytest.raises(ValueError, match='invalid lempel-ziv code'):
+        LZWDecoder().decode([97, FIRST_CODE + 5])
+    with pytest.raises(ValueError, match='invalid lempel-ziv code'):
+        LZWDecoder().decode([FIRST_CODE])
+
+
+def test_random_round_trips():
+    rng = random.Random(3)
+    for _ in range(50):
+        max_bits = rng.choice([None, 9, 10])
+        data = bytes(rng.choice(b'ab\x00') if rng.random() < 0.8 else rng.randrange(256)
+                     for _ in range(rng.randrange(3000)))
+        writer = BitWriter()
+        LZWEncoder(max_bits).encode_bits(data, writer)
+        reader = BitReader.from_padded(writer.get_padded_bytes())
+        assert b''.join(LZWDecoder(max_bits).iter_decode_bits(reader, rng.randrange(1, 50))) == data
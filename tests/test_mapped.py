@@ -0,0 +1,46 @@
+import pytest
+import huffman.huffman
+import lzw.lzw_coding
+import lzw_huffman.lzw_huffman
+from conftest import CORPORA, CODECS
+from utils import container
+
+
+# a piece of a few KB, so the files of the tests are coded in many pieces
+CHUNK_BYTES = 5000
+
+
+@pytest.fixture
+def mapped(monkeypatch):
+    """
+    code every file piece by piece between memory mapped files
+    """
+    monkeypatch.setattr(container, 'MAPPED_FILE_BYTES', 0)
+    monkeypatch.setattr(container.iter_chunks, '__defaults__', (CHUNK_BYTES,))
+    for module in (huffman.huffman, lzw.lzw_coding, lzw_huffman.lzw_huffman):
+        monkeypatch.setattr(module, 'MAPPED_CHUNK_BYTES', CHUNK_BYTES)
+
+
+@pytest.mark.parametrize('codec_id', [codec_id for codec_id in sorted(CODECS) if not codec_id.startswith('auto')])
+@pytest.mark.parametrize('corpus_name', ['empty', 'one', 'text', 'random', 'runs'])
+def test_same_as_in_memory(codec_id, corpus_name, mapped, tmp_path):
+    codec_class, options, compress_name, decompress_name = CODECS[codec_id]
+    data = CORPORA[corpus_name]
+    path = str(tmp_path / 'data.txt')
+    with open(path, 'wb') as file:
+        file.write(data)
+    with open(getattr(codec_class(path, **options), compress_name)(), 'rb') as compressed:
+        compressed = compressed.read()
+    assert compressed == codec_class(None, **options).compress_bytes(data)
+
+    compressed_path = str(tmp_path / 'data.bin')
+    with open(compressed_path, 'wb') as file:
+        file.write(compressed)
+    with open(getattr(codec_class(path, **options), decompress_name)(compressed_path), 'rb') as decompressed:
+        assert decompressed.read() == data
+
+
+def test_use_mapped(monkeypatch):
+    monkeypatch.setattr(container, 'MAPPED_FILE_BYTES', 1000)
+    assert not container.use_mapped(1000)
+    assert container.use_mapped(1001)
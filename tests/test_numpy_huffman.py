@@ -0,0 +1,81 @@
+from collections import Counter
+import pytest
+from conftest import CORPORA
+from utils import numpy_huffman
+from utils.bit_io import BitWriter
+from utils.canonical_huffman import canonical_codes, huffman_code_lengths
+
+
+pytest.importorskip('numpy')
+
+
+@pytest.fixture(autouse=True)
+def imported():
+    # the tests use inputs below IMPORT_SYMBOLS
+    numpy_huffman.import_numpy()
+
+
+def python_codes(symbols, codes, prefix_bits=0):
+    writer = BitWriter()
+    writer.write(0, prefix_bits)
+    # a list takes the python loop
+    writer.write_codes(list(symbols), codes)
+    return writer.getvalue(), writer.bit_length()
+
+
+def numpy_codes(symbols, codes, prefix_bits=0):
+    writer = BitWriter()
+    writer.write(0, prefix_bits)
+    assert numpy_huffman.write_codes(writer, symbols, codes)
+    return writer.getvalue(), writer.bit_length()
+
+
+@pytest.mark.parametrize('corpus_name', ['text', 'random', 'runs', 'all_bytes'])
+@pytest.mark.parametrize('prefix_bits', [0, 3])
+def test_write_codes(corpus_name, prefix_bits):
+    data = CORPORA[corpus_name]
+    codes = canonical_codes(huffman_code_lengths(Counter(data)))
+    for symbols in (data, data[:-1], bytearray(data), memoryview(data)):
+        assert numpy_codes(symbols, codes, prefix_bits) == python_codes(symbols, codes, prefix_bits)
+
+
+def test_long_codes():
+    data = CORPORA['text'][:20000]
+    codes = canonical_codes(huffman_code_lengths(Counter(data)))
+    # codes too long to be written in pairs, then too long for a 64 bit word
+    for extra_bits in (30, 60):
+        long_codes = {symbol: (value, length + extra_bits) for symbol, (value, length) in codes.items()}
+        writer = BitWriter()
+        written = numpy_huffman.write_codes(writer, data, long_codes)
+        assert written == (extra_bits == 30)
+        if written:
+            assert (writer.getvalue(), writer.bit_length()) == python_codes(data, long_codes)
+        else:
+            assert writer.bit_length() == 0
+
+
+def test_str_symbols():
+    text = CORPORA['text'][:20000].decode('utf-8', 'ignore') + 'héllo wörld €' * 100
+    codes = canonical_codes(huffman_code_lengths(Counter(text)))
+    assert numpy_codes(text, codes) == python_codes(text, codes)
+    assert numpy_huffman.count_frequency(text) == Counter(text)
+
+
+def test_count_frequency(corpus, monkeypatch):
+    monkeypatch.setattr(numpy_huffman, 'CHUNK_SYMBOLS', 1000)
+    assert numpy_huffman.count_frequency(corpus) == Counter(corpus)
+    assert numpy_huffman.count_frequency([1, 2, 3]) is None
+
+
+def test_symbol_without_a_code():
+    data = bytes(range(100)) * 20
+    codes = canonical_codes(huffman_code_lengths(Counter(data[:-1000])))
+    del codes[99]
+    with pytest.raises(KeyError):
+        numpy_huffman.write_codes(BitWriter(), data, codes)
+
+
+def test_enabled():
+    assert numpy_huffman.enabled(bytes(numpy_huffman.MIN_SYMBOLS))
+    assert not numpy_huffman.enabled(bytes(numpy_huffman.MIN_SYMBOLS - 1))
+    assert not numpy_huffman.enabled(list(range(numpy_huffman.MIN_SYMBOLS)))
@@ -0,0 +1,43 @@
+import io
+import pytest
+from conftest import CORPORA
+from huffman.huffman import Huffman_Coding
+from utils.container import Header, INDEPENDENT, STREAM
+
+
+def compress_parallel(codec, data, workers, block_size=1 << 14):
+    output = io.BytesIO()
+    assert codec.compress_parallel(io.BytesIO(data), output, workers=workers, block_size=block_size) == len(data)
+    return output.getvalue()
+
+
+def decompress_parallel(codec, compressed, workers):
+    output = io.BytesIO()
+    codec.decompress_parallel(io.BytesIO(compressed), output, workers=workers)
+    return output.getvalue()
+
+
+def test_round_trip(codec_spec, make_codec, corpus):
+    compressed = compress_parallel(make_codec(), corpus, workers=1)
+    header, _ = Header.from_bytes(compressed)
+    assert header.flags & STREAM and header.flags & INDEPENDENT
+    assert decompress_parallel(codec_spec[0](None), compressed, workers=1) == corpus
+    # the layout of a stream: decompress_stream reads it as well
+    output = io.BytesIO()
+    codec_spec[0](None).decompress_stream(io.BytesIO(compressed), output)
+    assert output.getvalue() == corpus
+
+
+def test_process_pool(codec_spec, make_codec):
+    data = CORPORA['text']
+    compressed = compress_parallel(make_codec(), data, workers=2)
+    # the blocks do not depend on the number of workers
+    assert compressed == compress_parallel(make_codec(), data, workers=1)
+    assert decompress_parallel(codec_spec[0](None), compressed, workers=2) == data
+
+
+def test_dependent_blocks():
+    output = io.BytesIO()
+    Huffman_Coding(None).compress_stream(io.BytesIO(CORPORA['text']), output)
+    with pytest.raises(ValueError, match='can not be decompressed in parallel'):
+        decompress_parallel(Huffman_Coding(None), output.getvalue(), workers=1)
@@ -0,0 +1,64 @@
+import io
+import random
+import pytest
+from conftest import CORPORA
+from lzw.lzw_coding import LZW_Coding
+from utils.seekable import SEEKABLE_BLOCK_SIZE
+
+
+DATA = CORPORA['text']
+
+BLOCK_SIZE = 4096
+
+
+def compressed_file(codec, prefix=b''):
+    output = io.BytesIO(prefix)
+    output.seek(len(prefix))
+    codec.compress_parallel(io.BytesIO(DATA), output, workers=1, block_size=BLOCK_SIZE)
+    output.seek(len(prefix))
+    return output
+
+
+def test_reads(codec_spec, make_codec):
+    reader = codec_spec[0](None).open_seekable(compressed_file(make_codec()))
+    assert reader.size == len(DATA)
+    rng = random.Random(0)
+    for _ in range(30):
+        offset = rng.randrange(len(DATA))
+        length = rng.randrange(3 * BLOCK_SIZE)
+        assert reader.read(offset, length) == DATA[offset:offset + length]
+    assert reader.read(0, len(DATA)) == DATA
+    assert reader.read(len(DATA) - 10, 100) == DATA[-10:]
+    assert reader.read(len(DATA) + 10, 100) == b''
+    assert reader.read(5, 0) == b''
+
+
+def test_only_the_blocks_read_are_decoded():
+    reader = LZW_Coding(None).open_seekable(compressed_file(LZW_Coding(None)), cache_blocks=2)
+    reader.read(BLOCK_SIZE * 3 + 10, 100)
+    assert (reader.hits, reader.misses) == (0, 1)
+    reader.read(BLOCK_SIZE * 3 + 200, BLOCK_SIZE)
+    assert (reader.hits, reader.misses) == (1, 2)
+    reader.read(0, 1)
+    reader.read(BLOCK_SIZE * 3, 1)
+    # the lru cache holds 2 blocks: block 3 was evicted by block 0
+    assert (reader.hits, reader.misses) == (1, 4)
+
+
+def test_file_inside_a_file():
+    # the index offsets are relative to the header
+    output = compressed_file(LZW_Coding(None), prefix=b'some other data')
+    reader = LZW_Coding(None).open_seekable(output)
+    assert reader.read(SEEKABLE_BLOCK_SIZE // 3, 5000) == DATA[SEEKABLE_BLOCK_SIZE // 3:SEEKABLE_BLOCK_SIZE // 3 + 5000]
+
+
+def test_errors():
+    reader = LZW_Coding(None).open_seekable(compressed_file(LZW_Coding(None)))
+    with pytest.raises(ValueError, match='non negative'):
+        reader.read(-1, 10)
+
+    output = io.BytesIO()
+    LZW_Coding(None).compress_stream(io.BytesIO(DATA), output)
+    output.seek(0)
+    with pytest.raises(ValueError, match='no block index'):
+        LZW_Coding(None).open_seekable(output)
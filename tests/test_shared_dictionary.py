@@ -0,0 +1,76 @@
+import json
+import random
+import pytest
+from huffman.huffman import Huffman_Coding
+from lzw.lzw_coding import LZW_Coding
+from lzw_huffman.lzw_huffman import Lempel_Ziv_Huffman_Coding
+from utils.shared_dictionary import DICTIONARIES, SharedDictionary, train_dictionary, load_dictionary, \
+    compress_message, decompress_message
+from utils.container import HUFFMAN, LZW
+
+
+CODEC_CLASSES = [Huffman_Coding, LZW_Coding, Lempel_Ziv_Huffman_Coding]
+
+
+def make_records(seed, n_records):
+    rng = random.Random(seed)
+    return [json.dumps({'id': rng.randrange(10 ** 6), 'level': rng.choice(['info', 'warning', 'error']),
+                        'user': f'user{rng.randrange(100)}', 'path': f'/api/v1/items/{rng.randrange(1000)}',
+                        'status': rng.choice([200, 201, 404, 500])}).encode() for _ in range(n_records)]
+
+
+@pytest.fixture(scope='module')
+def dictionary():
+    return train_dictionary(make_records(0, 2000))
+
+
+@pytest.mark.parametrize('codec_class', CODEC_CLASSES)
+def test_round_trip(codec_class, dictionary):
+    for record in make_records(1, 100) + [b'', b'x', bytes(range(256))]:
+        message = codec_class(None).compress_message(record, dictionary)
+        assert codec_class(None).decompress_message(message) == record
+        assert codec_class(None).decompress_message(message, dictionary.id) == record
+
+
+@pytest.mark.parametrize('codec_class', [LZW_Coding, Lempel_Ziv_Huffman_Coding])
+def test_small_messages(codec_class, dictionary):
+    records = make_records(2, 100)
+    assert sum(len(codec_class(None).compress_message(record, dictionary)) for record in records) < \
+        sum(len(record) for record in records) / 2
+
+
+def test_codec_functions(dictionary):
+    record = make_records(3, 1)[0]
+    message = compress_message(LZW, record, dictionary.id)
+    assert message == LZW_Coding(None).compress_message(record, dictionary)
+    assert decompress_message(LZW, message) == record
+    with pytest.raises(ValueError, match='compressed with codec 2, expected 1'):
+        decompress_message(HUFFMAN, message)
+
+
+def test_save_and_load(dictionary, tmp_path):
+    path = str(tmp_path / 'records.dict')
+    dictionary_id = dictionary.save(path)
+    assert dictionary_id == dictionary.id
+    message = Lempel_Ziv_Huffman_Coding(None).compress_message(b'{"level": "info"}', dictionary)
+    del DICTIONARIES[dictionary.id]
+    with pytest.raises(ValueError, match='unknown shared dictionary'):
+        Lempel_Ziv_Huffman_Coding(None).decompress_message(message)
+    loaded = load_dictionary(path)
+    assert loaded.id == dictionary.id
+    assert Lempel_Ziv_Huffman_Coding(None).decompress_message(message) == b'{"level": "info"}'
+
+
+def test_errors(dictionary):
+    other = train_dictionary([b'something else entirely'] * 10)
+    message = LZW_Coding(None).compress_message(b'abc', dictionary)
+    with pytest.raises(ValueError, match='not 0x'):
+        LZW_Coding(None).decompress_message(message, other)
+    with pytest.raises(ValueError, match='too short'):
+        LZW_Coding(None).decompress_message(b'\x02')
+    with pytest.raises(ValueError, match='original length'):
+        LZW_Coding(None).decompress_message(message[:-1])
+    with pytest.raises(ValueError, match='bad magic'):
+        SharedDictionary.from_bytes(b'XXXX\x01')
+    with pytest.raises(ValueError, match='max_bits'):
+        train_dictionary([b'abc'], max_bits=20)
@@ -0,0 +1,69 @@
+import io
+import shutil
+import pytest
+from conftest import CORPORA, SAMPLE_PATH
+from huffman.huffman import Huffman_Coding
+from lzw.lzw_coding import LZW_Coding
+from lzw_huffman.lzw_huffman import Lempel_Ziv_Huffman_Coding
+from utils.container import Header, STREAM, INDEPENDENT
+
+
+def compress_stream(codec, data, block_size):
+    output = io.BytesIO()
+    assert codec.compress_stream(io.BytesIO(data), output, block_size=block_size) == len(data)
+    return output.getvalue()
+
+
+def decompress_stream(codec, compressed):
+    output = io.BytesIO()
+    assert codec.decompress_stream(io.BytesIO(compressed), output) == len(output.getvalue())
+    return output.getvalue()
+
+
+@pytest.mark.parametrize('block_size', [1000, 1 << 16])
+def test_stream_round_trip(codec_spec, make_codec, corpus, block_size):
+    compressed = compress_stream(make_codec(), corpus, block_size)
+    assert Header.from_bytes(compressed)[0].flags & STREAM
+    assert decompress_stream(make_codec(), compressed) == corpus
+    assert decompress_stream(codec_spec[0](None), compressed) == corpus
+
+
+@pytest.mark.parametrize('codec_class', [Huffman_Coding, LZW_Coding, Lempel_Ziv_Huffman_Coding])
+def test_stream_in_memory_and_files(codec_class, tmp_path):
+    # decompress_bytes and decompress take streams as well
+    data = CORPORA['text']
+    compressed = compress_stream(codec_class(None), data, 1 << 14)
+    assert codec_class(None).decompress_bytes(compressed) == data
+
+    path = str(tmp_path / 'sample.txt')
+    shutil.copy(SAMPLE_PATH, path)
+    compressed_path = str(tmp_path / 'sample.stream')
+    with open(SAMPLE_PATH, 'rb') as reader, open(compressed_path, 'wb') as writer:
+        codec_class(path).compress_stream(reader, writer)
+    decompress = codec_class(path).lzw_decompress if codec_class is LZW_Coding else codec_class(path).decompress
+    with open(decompress(compressed_path), 'rb') as decompressed, open(SAMPLE_PATH, 'rb') as original:
+        assert decompressed.read() == original.read()
+
+
+def test_stream_blocks_share_the_dictionary():
+    data = CORPORA['text']
+    assert len(compress_stream(LZW_Coding(None), data, 1 << 12)) < \
+        sum(len(LZW_Coding(None).compress_bytes(data[start:start + (1 << 12)]))
+            for start in range(0, len(data), 1 << 12))
+
+
+def test_truncated_stream(make_codec):
+    compressed = compress_stream(make_codec(), CORPORA['text'][:20000], 4096)
+    ends = [len(compressed) // 3, len(compressed) // 2]
+    if not Header.from_bytes(compressed)[0].flags & INDEPENDENT:
+        # in the trailer. independent blocks are followed by their index, which decompress_stream does not read
+        ends.append(len(compressed) - 1)
+    for end in ends:
+        with pytest.raises(ValueError):
+            decompress_stream(make_codec(), compressed[:end])
+
+
+@pytest.mark.parametrize('codec_class', [Huffman_Coding, LZW_Coding, Lempel_Ziv_Huffman_Coding])
+def test_not_a_stream(codec_class):
+    with pytest.raises(ValueError, match='not a compressed stream'):
+        decompress_stream(codec_class(None), codec_class(None).compress_bytes(CORPORA['text'][:1000]))
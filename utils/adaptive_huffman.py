@@ -0,0 +1,66 @@
+from collections import Counter
+from utils import numpy_huffman
+from utils.canonical_huffman import MAX_CODE_LENGTH, huffman_code_lengths, canonical_codes, DecodeTable
+
+
+# the code is rebuilt from the counts once this many bytes were coded with the current one
+REBUILD_BYTES = 1 << 14
+
+# the counts are halved when their total passes this, so the code follows a change in the data
+MAX_TOTAL_COUNT = 1 << 20
+
+
+class AdaptiveHuffmanModel:
+    def __init__(self, max_code_length=MAX_CODE_LENGTH, rebuild_bytes=REBUILD_BYTES):
+        """
+        semi-adaptive huffman code of a byte stream. every byte value starts with a count of 1, so the first block
+        is coded with 8 bit codes. the counts of every block are added after it is coded, and the code is rebuilt
+        periodically. the compressor and the decompressor update the same model from the same bytes,
+        so no frequency table is sent.
+        :param max_code_length: the max huffman code length
+        :param rebuild_bytes: the number of bytes coded between rebuilds of the code
+        """
+        self.max_code_length = max_code_length
+        self.rebuild_bytes = rebuild_bytes
+        self.counts = dict.fromkeys(range(256), 1)
+        self.pending_bytes = 0
+        self.codes = {}
+        self.decode_table = None
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        making a new code from the counts
+        :return: None saved to self.codes
+        """
+        if sum(self.counts.values()) > MAX_TOTAL_COUNT:
+            self.counts = {symbol: (count + 1) >> 1 for symbol, count in self.counts.items()}
+        # 256 byte values can not be limited below 8 bits, as in Huffman_Coding.make_codes
+        max_length = max(self.max_code_length, (len(self.counts) - 1).bit_length())
+        self.codes = canonical_codes(huffman_code_lengths(self.counts, max_length))
+        self.decode_table = None
+        self.pending_bytes = 0
+
+    def update(self, block):
+        """
+        adding the bytes of a block coded with the current code to the counts
+        :param block: bytes like object
+        :return: None
+        """
+        if numpy_huffman.enabled(block):
+            frequency = numpy_huffman.count_frequency(block)
+        else:
+            frequency = Counter(block)
+        for symbol, count in frequency.items():
+            self.counts[symbol] += count
+        self.pending_bytes += len(block)
+        if self.pending_bytes >= self.rebuild_bytes:
+            self.rebuild()
+
+    def get_decode_table(self):
+        """
+        :return: DecodeTable of the current code, built on first use after a rebuild
+        """
+        if self.decode_table is None:
+            self.decode_table = DecodeTable(self.codes)
+        return self.decode_table
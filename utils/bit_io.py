@@ -0,0 +1,201 @@
+from utils import numpy_huffman
+from utils.bytes_utils import pad_bytes, remove_padding
+
+
+# the accumulator is flushed to the buffer once it holds this many bits,
+# so every shift/or works on a small int instead of a growing big int.
+FLUSH_BITS = 256
+
+# number of fixed width values unpacked from a single int.from_bytes() call.
+READ_CHUNK_VALUES = 512
+
+
+class BitWriter:
+    def __init__(self):
+        """
+        packing bits msb first into a bytearray. bits are collected in an integer
+        accumulator and moved into the buffer a few bytes at a time.
+        """
+        self.buffer = bytearray()
+        self.accumulator = 0
+        self.n_acc_bits = 0
+
+    def flush(self):
+        """
+        moving all the whole bytes in the accumulator into the buffer
+        :return: None. saved to self.buffer
+        """
+        n_bytes = self.n_acc_bits >> 3
+        if n_bytes == 0:
+            return
+        remain = self.n_acc_bits & 7
+        self.buffer += (self.accumulator >> remain).to_bytes(n_bytes, 'big')
+        self.accumulator &= (1 << remain) - 1
+        self.n_acc_bits = remain
+
+    def write(self, value, n_bits):
+        """
+        :param value: non negative int smaller than 2 ** n_bits
+        :param n_bits: the number of bits to write
+        :return: None
+        """
+        self.accumulator = (self.accumulator << n_bits) | value
+        self.n_acc_bits += n_bits
+        if self.n_acc_bits >= FLUSH_BITS:
+            self.flush()
+
+    def write_fixed(self, values, n_bits):
+        """
+        writing every value with the same width
+        :param values: iterable of non negative ints smaller than 2 ** n_bits
+        :param n_bits: the width of each value
+        :return: None
+        """
+        accumulator = self.accumulator
+        n_acc_bits = self.n_acc_bits
+        buffer = self.buffer
+        for value in values:
+            accumulator = (accumulator << n_bits) | value
+            n_acc_bits += n_bits
+            if n_acc_bits >= FLUSH_BITS:
+                remain = n_acc_bits & 7
+                buffer += (accumulator >> remain).to_bytes(n_acc_bits >> 3, 'big')
+                accumulator &= (1 << remain) - 1
+                n_acc_bits = remain
+        self.accumulator = accumulator
+        self.n_acc_bits = n_acc_bits
+
+    def write_codes(self, symbols, codes):
+        """
+        writing the code of each symbol
+        :param symbols: iterable of symbols to encode
+        :param codes: dict symbol -> (code value, code length)
+        :return: None
+        """
+        if numpy_huffman.enabled(symbols) and numpy_huffman.write_codes(self, symbols, codes):
+            return
+
+        accumulator = self.accumulator
+        n_acc_bits = self.n_acc_bits
+        buffer = self.buffer
+        for symbol in symbols:
+            value, length = codes[symbol]
+            accumulator = (accumulator << length) | value
+            n_acc_bits += length
+            if n_acc_bits >= FLUSH_BITS:
+                remain = n_acc_bits & 7
+                buffer += (accumulator >> remain).to_bytes(n_acc_bits >> 3, 'big')
+                accumulator &= (1 << remain) - 1
+                n_acc_bits = remain
+        self.accumulator = accumulator
+        self.n_acc_bits = n_acc_bits
+
+    def take_bytes(self):
+        """
+        moving the whole bytes written so far out of the buffer, so a long bit string is written to a file piece by
+        piece. get_padded_bytes stays right for the bits left: the padding only depends on bit_length() % 8
+        :return: bytes
+        """
+        self.flush()
+        data = bytes(self.buffer)
+        self.buffer = bytearray()
+        return data
+
+    def bit_length(self):
+        """
+        :return: the number of bits written so far
+        """
+        return len(self.buffer) * 8 + self.n_acc_bits
+
+    def getvalue(self):
+        """
+        :return: bytes of all the bits written, the last byte padded with zeros
+        """
+        self.flush()
+        data = bytes(self.buffer)
+        if self.n_acc_bits:
+            data += (self.accumulator << (8 - self.n_acc_bits)).to_bytes(1, 'big')
+        return data
+
+    def get_padded_bytes(self):
+        """
+        :return: bytes of all the bits written, prefixed with the padding info byte
+        """
+        return pad_bytes(self.getvalue(), self.bit_length())
+
+
+class BitReader:
+    def __init__(self, data, n_bits=None):
+        """
+        reading bits msb first from a bytes like object
+        :param data: bytes / bytearray / memoryview to read from
+        :param n_bits: the number of valid bits in data. default: all of data
+        """
+        self.data = data
+        self.n_bits = len(data) * 8 if n_bits is None else n_bits
+        self.position = 0
+
+    @classmethod
+    def from_padded(cls, data):
+        """
+        :param data: bytes prefixed with the padding info byte (see BitWriter.get_padded_bytes)
+        :return: BitReader over the valid bits only
+        """
+        data, n_bits = remove_padding(data)
+        return cls(data, n_bits)
+
+    def bits_left(self):
+        """
+        :return: the number of valid bits not read yet
+        """
+        return self.n_bits - self.position
+
+    def peek(self, n_bits):
+        """
+        :param n_bits: the number of bits to look at
+        :return: the next n_bits as int without consuming them. zeros past the end of data
+        """
+        start = self.position >> 3
+        end = (self.position + n_bits + 7) >> 3
+        chunk = int.from_bytes(self.data[start:end], 'big')
+        missing = end - len(self.data)
+        if missing > 0:
+            chunk <<= missing * 8
+        return (chunk >> ((end << 3) - self.position - n_bits)) & ((1 << n_bits) - 1)
+
+    def skip(self, n_bits):
+        """
+        :param n_bits: the number of bits to consume
+        :return: None
+        """
+        self.position += n_bits
+
+    def read(self, n_bits):
+        """
+        :param n_bits: the number of bits to read
+        :return: the next n_bits as int
+        """
+        value = self.peek(n_bits)
+        self.position += n_bits
+        return value
+
+    def read_fixed(self, n_bits):
+        """
+        reading all the valid bits left as values of the same width
+        :param n_bits: the width of each value
+        :return: list of ints
+        """
+        values = []
+        n_values = self.bits_left() // n_bits
+        mask = (1 << n_bits) - 1
+        while n_values > 0:
+            count = min(n_values, READ_CHUNK_VALUES)
+            chunk_bits = count * n_bits
+            chunk = self.peek(chunk_bits)
+            shift = chunk_bits
+            for _ in range(count):
+                shift -= n_bits
+                values.append((chunk >> shift) & mask)
+            self.position += chunk_bits
+            n_values -= count
+        return values
@@ -0,0 +1,157 @@
+from utils.canonical_huffman import REFILL_BYTES, DecodeTable
+from utils.lzw_dictionary import FIRST_CODE
+
+
+# the codes below DIRECT_CODES (the bytes and the clear code) are their own bucket
+DIRECT_CODES = FIRST_CODE
+
+# the bit length of DIRECT_CODES, the first bit length of the bucketed codes
+DIRECT_BITS = DIRECT_CODES.bit_length()
+
+# a larger code is bucketed by its bit length and the BUCKET_BITS bits after its leading 1, as the deflate distance
+# codes: 2 ** BUCKET_BITS buckets for each power of 2, the low bits of the code are written raw after the bucket
+BUCKET_BITS = 3
+BUCKET_MASK = (1 << BUCKET_BITS) - 1
+
+
+def code_bucket(code):
+    """
+    :param code: a lempel-ziv code
+    :return: (the bucket of code, the number of low bits of code written raw)
+    """
+    if code < DIRECT_CODES:
+        return code, 0
+    n_bits = code.bit_length()
+    n_extra_bits = n_bits - 1 - BUCKET_BITS
+    return DIRECT_CODES + ((n_bits - DIRECT_BITS) << BUCKET_BITS) + ((code >> n_extra_bits) & BUCKET_MASK), \
+        n_extra_bits
+
+
+def bucket_base(bucket):
+    """
+    :param bucket: a bucket returned by code_bucket
+    :return: (the first code of the bucket, the number of low bits of its codes written raw)
+    """
+    if bucket < DIRECT_CODES:
+        return bucket, 0
+    index = bucket - DIRECT_CODES
+    n_extra_bits = DIRECT_BITS + (index >> BUCKET_BITS) - 1 - BUCKET_BITS
+    return (((1 << BUCKET_BITS) | (index & BUCKET_MASK)) << n_extra_bits), n_extra_bits
+
+
+def bucket_frequency(frequency):
+    """
+    :param frequency: dict lempel-ziv code -> count
+    :return: dict bucket -> count, the symbols of the huffman code
+    """
+    buckets = {}
+    for code, count in frequency.items():
+        bucket, _ = code_bucket(code)
+        buckets[bucket] = buckets.get(bucket, 0) + count
+    return buckets
+
+
+def expand_codes(bucket_codes, symbols):
+    """
+    the code of a lempel-ziv code is the huffman code of its bucket followed by its low bits,
+    so the codes are written with BitWriter.write_codes as any prefix code
+    :param bucket_codes: dict bucket -> (code value, code length)
+    :param symbols: the lempel-ziv codes to get a code for (the keys of their frequency dict)
+    :return: dict lempel-ziv code -> (code value, code length)
+    """
+    codes = {}
+    for code in symbols:
+        bucket, n_extra_bits = code_bucket(code)
+        value, length = bucket_codes[bucket]
+        codes[code] = ((value << n_extra_bits) | (code & ((1 << n_extra_bits) - 1)), length + n_extra_bits)
+    return codes
+
+
+class BucketDecodeTable:
+    def __init__(self, codes, table=None):
+        """
+        decoding lempel-ziv codes written with expand_codes: the huffman code of the bucket, then the low bits
+        :param codes: dict bucket -> (code value, code length)
+        :param table: utils.canonical_huffman.DecodeTable of codes. None: built here
+        """
+        self.table = table or DecodeTable(codes)
+        n_buckets = max(codes, default=-1) + 1
+        # bucket -> the first code of the bucket, the number of low bits
+        self.bases = []
+        self.extra_bits = []
+        for bucket in range(n_buckets):
+            base, n_extra_bits = bucket_base(bucket)
+            self.bases.append(base)
+            self.extra_bits.append(n_extra_bits)
+        # the bits needed in the accumulator to decode a code: the longest bucket code and its low bits
+        self.max_length = self.table.max_length + max(self.extra_bits, default=0)
+
+    def decode(self, data, n_bits):
+        """
+        decoding packed bits
+        :param data: bytes like object with the packed codes, msb first
+        :param n_bits: the number of valid bits in data
+        :return: list of the decoded lempel-ziv codes
+        """
+        return self.decode_range(data, n_bits)[0]
+
+    def decode_range(self, data, n_bits, start=0, stop=None):
+        """
+        decoding the codes starting in a range of the packed bits, as DecodeTable.decode_range
+        :param data: bytes like object with the packed codes, msb first
+        :param n_bits: the number of valid bits in data
+        :param start: the bit position of the first code to decode
+        :param stop: codes are decoded until the first one starting at or after this bit position. None: n_bits
+        :return: (list of the decoded lempel-ziv codes, the bit position after the last code decoded)
+        """
+        table_symbols = self.table.single_symbols
+        table_lengths = self.table.single_lengths
+        primary_bits = self.table.primary_bits
+        primary_mask = (1 << primary_bits) - 1
+        bases = self.bases
+        extra_bits = self.extra_bits
+        max_length = self.max_length
+        stop = n_bits if stop is None else min(stop, n_bits)
+
+        decoded = []
+        append = decoded.append
+        accumulator = 0
+        n_acc_bits = 0
+        position = start >> 3
+        consumed = start
+        if start & 7 and consumed < stop:
+            # the bits of the first byte before start are masked out by the first refill
+            accumulator = data[position]
+            position += 1
+            n_acc_bits = 8 - (start & 7)
+        while consumed < stop:
+            while n_acc_bits < max_length:
+                chunk = data[position:position + REFILL_BYTES]
+                position += REFILL_BYTES
+                accumulator = (((accumulator & ((1 << n_acc_bits) - 1)) << (REFILL_BYTES * 8))
+                               | (int.from_bytes(chunk, 'big') << ((REFILL_BYTES - len(chunk)) * 8)))
+                n_acc_bits += REFILL_BYTES * 8
+
+            index = (accumulator >> (n_acc_bits - primary_bits)) & primary_mask
+            length = table_lengths[index]
+            if length:
+                bucket = table_symbols[index][0]
+            else:
+                secondary = table_symbols[index]
+                if secondary is None:
+                    raise ValueError('invalid huffman code in the encoded data')
+                symbols, lengths, bits = secondary
+                index = (accumulator >> (n_acc_bits - primary_bits - bits)) & ((1 << bits) - 1)
+                length = lengths[index]
+                if not length:
+                    raise ValueError('invalid huffman code in the encoded data')
+                bucket = symbols[index]
+            n_acc_bits -= length
+            n_extra_bits = extra_bits[bucket]
+            if n_extra_bits:
+                n_acc_bits -= n_extra_bits
+                append(bases[bucket] + ((accumulator >> n_acc_bits) & ((1 << n_extra_bits) - 1)))
+            else:
+                append(bucket)
+            consumed += length + n_extra_bits
+        return decoded, consumed
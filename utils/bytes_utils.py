@@ -1,46 +1,56 @@
-def pad_encoded_text(encoded_text):
+
+def pad_bytes(data, n_bits):
     """
-    padding the encoded text to fit for bytes. if bit string is 14 adding 2 bits
-    :param encoded_text: the encoded text to pad
-    :return: padded encoded text
+    adding the padding info byte in front of the packed bits. if bit string is 14 the last byte holds 2 padded bits
+    :param data: the packed bits, last byte padded with zeros
+    :param n_bits: the number of valid bits in data
+    :return: padding info byte + data
     """
-    extra_padding = 8 - len(encoded_text) % 8
-    for i in range(extra_padding):
-        encoded_text += "0"
-
-    padded_info = "{0:08b}".format(extra_padding)
-    encoded_text = padded_info + encoded_text
-    return encoded_text
+    extra_padding = 8 - n_bits % 8
+    if extra_padding == 8:
+        data += b'\x00'
+    return bytes([extra_padding]) + data
 
 
-def remove_padding(padded_encoded_text):
+def remove_padding(padded_data):
     """
-    removing the extra padded bits from bits string
-    :param padded_encoded_text: bits string to un pad
-    :return: bit string  un padded encoded text
+    removing the padding info byte
+    :param padded_data: bytes prefixed with the padding info byte
+    :return: (memoryview of the packed bits, number of valid bits)
     """
-    padded_info = padded_encoded_text[:8]
-    extra_padding = int(padded_info, 2)
-
-    padded_encoded_text = padded_encoded_text[8:]
-    encoded_text = padded_encoded_text[:-1 * extra_padding]
-
-    return encoded_text
+    extra_padding = padded_data[0]
+    data = memoryview(padded_data)[1:]
+    return data, len(data) * 8 - extra_padding
 
 
-def get_byte_array(padded_encoded_text):
+def write_varint(value):
     """
-    creating bytes array from bits string
-    :param padded_encoded_text: bits string to transform to bytes array
-    :return: bytes array
+    encoding a non negative int with 7 bits per byte, the high bit marks that more bytes follow
+    :param value: non negative int
+    :return: bytes
     """
-    if len(padded_encoded_text) % 8 != 0:
-        print("Encoded text not padded properly")
-        exit(0)
-
     b = bytearray()
-    for i in range(0, len(padded_encoded_text), 8):
-        byte = padded_encoded_text[i:i + 8]
-        b.append(int(byte, 2))
-    return b
+    while value > 0x7f:
+        b.append((value & 0x7f) | 0x80)
+        value >>= 7
+    b.append(value)
+    return bytes(b)
+
 
+def read_varint(data, offset):
+    """
+    :param data: bytes like object holding a varint at offset (see write_varint)
+    :param offset: the index of the first byte of the varint
+    :return: (the int, the index after the varint)
+    """
+    value = 0
+    shift = 0
+    while True:
+        if offset >= len(data):
+            raise ValueError('truncated varint')
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
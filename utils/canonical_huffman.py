@@ -0,0 +1,211 @@
+from utils.huffman_tree import HuffmanTree
+
+# codes up to this length are decoded with a single lookup in the primary table
+PRIMARY_BITS = 11
+
+# bits added to the decoder accumulator on every refill
+REFILL_BYTES = 8
+
+# the default limit of huffman code lengths
+MAX_CODE_LENGTH = 24
+
+
+def huffman_code_lengths(frequency, max_length=MAX_CODE_LENGTH):
+    """
+    building a huffman tree over parallel arrays and measuring the depth of each leaf.
+    ties are broken by symbol so the result is reproducible.
+    :param frequency: dict symbol -> count
+    :param max_length: the max code length (see limit_code_lengths)
+    :return: dict symbol -> code length
+    """
+    if len(frequency) <= 1:
+        return {symbol: 1 for symbol in frequency}
+    return limit_code_lengths(HuffmanTree(frequency).merge().code_lengths(), max_length)
+
+
+def limit_code_lengths(code_lengths, max_length=MAX_CODE_LENGTH):
+    """
+    shortening the codes longer than max_length while keeping the code complete (the jpeg / zlib heuristic):
+    two codes of the longest length are replaced by one code a bit shorter, and a code of the longest length
+    below them becomes two codes one bit longer. the symbols keep their order, the symbols with the
+    shortest codes before still get the shortest codes.
+    :param code_lengths: dict symbol -> code length of a complete prefix code
+    :param max_length: the max code length
+    :return: dict symbol -> code length, none longer than max_length
+    """
+    longest = max(code_lengths.values(), default=0)
+    if longest <= max_length:
+        return code_lengths
+    if len(code_lengths) > 1 << max_length:
+        raise ValueError(f'{len(code_lengths)} symbols do not fit codes of {max_length} bits')
+
+    counts = [0] * (longest + 1)
+    for length in code_lengths.values():
+        counts[length] += 1
+    for length in range(longest, max_length, -1):
+        while counts[length] > 0:
+            shorter = length - 2
+            while counts[shorter] == 0:
+                shorter -= 1
+            counts[length] -= 2
+            counts[length - 1] += 1
+            counts[shorter + 1] += 2
+            counts[shorter] -= 1
+
+    symbols = iter(sorted(code_lengths, key=lambda symbol: (code_lengths[symbol], symbol)))
+    return {next(symbols): length for length in range(1, max_length + 1) for _ in range(counts[length])}
+
+
+def canonical_codes(code_lengths):
+    """
+    assigning canonical codes: symbols sorted by (length, symbol) get consecutive code values,
+    so the codes are fully described by their lengths.
+    :param code_lengths: dict symbol -> code length
+    :return: dict symbol -> (code value, code length)
+    """
+    codes = {}
+    code = 0
+    previous_length = 0
+    for symbol, length in sorted(code_lengths.items(), key=lambda item: (item[1], item[0])):
+        # a single symbol alphabet still needs one bit per symbol
+        length = max(length, 1)
+        code <<= length - previous_length
+        codes[symbol] = (code, length)
+        code += 1
+        previous_length = length
+    return codes
+
+
+class DecodeTable:
+    def __init__(self, codes, primary_bits=PRIMARY_BITS):
+        """
+        lookup tables for decoding a prefix code. the primary table is indexed by the next primary_bits bits,
+        codes longer than that continue in a secondary table indexed by the bits following the primary index.
+        :param codes: dict symbol -> (code value, code length)
+        :param primary_bits: the width of the primary table index
+        """
+        self.max_length = max((length for _, length in codes.values()), default=1)
+        self.primary_bits = min(primary_bits, self.max_length)
+        size = 1 << self.primary_bits
+
+        # single_lengths[i] > 0: single_symbols[i] is a 1-tuple decoded with that code length.
+        # single_lengths[i] == 0: single_symbols[i] is (symbols, lengths, bits) of a secondary table.
+        self.single_symbols = [None] * size
+        self.single_lengths = [0] * size
+
+        long_codes = {}
+        for symbol, (value, length) in codes.items():
+            if length <= self.primary_bits:
+                shift = self.primary_bits - length
+                start = value << shift
+                for index in range(start, start + (1 << shift)):
+                    self.single_symbols[index] = (symbol,)
+                    self.single_lengths[index] = length
+            else:
+                prefix = value >> (length - self.primary_bits)
+                long_codes.setdefault(prefix, []).append((symbol, value, length))
+
+        for prefix, entries in long_codes.items():
+            bits = max(length for _, _, length in entries) - self.primary_bits
+            symbols = [None] * (1 << bits)
+            lengths = [0] * (1 << bits)
+            for symbol, value, length in entries:
+                shift = self.primary_bits + bits - length
+                start = (value & ((1 << (length - self.primary_bits)) - 1)) << shift
+                for index in range(start, start + (1 << shift)):
+                    symbols[index] = symbol
+                    lengths[index] = length
+            self.single_symbols[prefix] = (symbols, lengths, bits)
+
+        self.multi_symbols, self.multi_lengths = self.make_multi_symbol_table()
+
+    def make_multi_symbol_table(self):
+        """
+        creating the primary table that decodes every code lying completely inside the index bits,
+        so short codes are decoded a few symbols per lookup.
+        :return: (symbols, lengths) tables in the same layout as the single symbol table
+        """
+        primary_bits = self.primary_bits
+        mask = (1 << primary_bits) - 1
+        multi_symbols = list(self.single_symbols)
+        multi_lengths = list(self.single_lengths)
+        for index in range(1 << primary_bits):
+            used = self.single_lengths[index]
+            if not used:
+                continue
+            symbols = [self.single_symbols[index][0]]
+            while True:
+                next_index = (index << used) & mask
+                length = self.single_lengths[next_index]
+                if not length or used + length > primary_bits:
+                    break
+                symbols.append(self.single_symbols[next_index][0])
+                used += length
+            multi_symbols[index] = tuple(symbols)
+            multi_lengths[index] = used
+        return multi_symbols, multi_lengths
+
+    def decode(self, data, n_bits):
+        """
+        decoding packed bits
+        :param data: bytes like object with the packed codes, msb first
+        :param n_bits: the number of valid bits in data
+        :return: list of the decoded symbols
+        """
+        return self.decode_range(data, n_bits)[0]
+
+    def decode_range(self, data, n_bits, start=0, stop=None):
+        """
+        decoding the codes starting in a range of the packed bits, so a long bit string is decoded piece by piece
+        :param data: bytes like object with the packed codes, msb first
+        :param n_bits: the number of valid bits in data
+        :param start: the bit position of the first code to decode
+        :param stop: codes are decoded until the first one starting at or after this bit position. None: n_bits
+        :return: (list of the decoded symbols, the bit position after the last code decoded)
+        """
+        primary_bits = self.primary_bits
+        primary_mask = (1 << primary_bits) - 1
+        max_length = self.max_length
+        stop = n_bits if stop is None else min(stop, n_bits)
+
+        decoded = []
+        extend = decoded.extend
+        accumulator = 0
+        n_acc_bits = 0
+        position = start >> 3
+        consumed = start
+        if start & 7 and consumed < stop:
+            # the bits of the first byte before start are masked out by the first refill
+            accumulator = data[position]
+            position += 1
+            n_acc_bits = 8 - (start & 7)
+        # the multi symbol table may only be used while all of the index bits are valid,
+        # the last bits are decoded one symbol at a time.
+        passes = ((self.multi_symbols, self.multi_lengths, min(stop, n_bits - primary_bits + 1)),
+                  (self.single_symbols, self.single_lengths, stop))
+        for table_symbols, table_lengths, end in passes:
+            while consumed < end:
+                while n_acc_bits < max_length:
+                    chunk = data[position:position + REFILL_BYTES]
+                    position += REFILL_BYTES
+                    accumulator = (((accumulator & ((1 << n_acc_bits) - 1)) << (REFILL_BYTES * 8))
+                                   | (int.from_bytes(chunk, 'big') << ((REFILL_BYTES - len(chunk)) * 8)))
+                    n_acc_bits += REFILL_BYTES * 8
+
+                index = (accumulator >> (n_acc_bits - primary_bits)) & primary_mask
+                length = table_lengths[index]
+                if length:
+                    extend(table_symbols[index])
+                else:
+                    secondary = table_symbols[index]
+                    if secondary is None:
+                        raise ValueError('invalid huffman code in the encoded data')
+                    symbols, lengths, bits = secondary
+                    index = (accumulator >> (n_acc_bits - primary_bits - bits)) & ((1 << bits) - 1)
+                    length = lengths[index]
+                    if not length:
+                        raise ValueError('invalid huffman code in the encoded data')
+                    decoded.append(symbols[index])
+                n_acc_bits -= length
+                consumed += length
+        return decoded, consumed
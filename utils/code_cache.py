@@ -0,0 +1,169 @@
+import math
+import threading
+from collections import OrderedDict
+from utils.canonical_huffman import DecodeTable, canonical_codes
+
+
+# the default max number of codes (and of decode tables) kept by a CodeCache
+CACHE_ENTRIES = 256
+
+# the default max loss of a cached code: its encoded size over the size estimated for a code built for the data, - 1
+MAX_RATIO_LOSS = 0.01
+
+# the signature of a histogram holds the ideal code length log2(total / count) of each symbol, rounded to bits,
+# of the symbols shorter than SIGNATURE_BITS. rarer symbols vary too much between similar data to be in the key,
+# they only have to have a code in the cached code
+SIGNATURE_BITS = 6
+
+
+def signature(frequency, max_code_length):
+    """
+    :param frequency: dict symbol -> count
+    :param max_code_length: the max code length of the codec
+    :return: the quantized histogram: histograms of the same signature get about the same huffman code
+    """
+    # count > total >> SIGNATURE_BITS: the ideal code length is below SIGNATURE_BITS
+    total = sum(frequency.values())
+    threshold = total >> SIGNATURE_BITS
+    steps = sorted((symbol, round(math.log2(total / count)))
+                   for symbol, count in frequency.items() if count > threshold)
+    return (max_code_length,) + tuple(steps)
+
+
+def entropy_bits(frequency):
+    """
+    :param frequency: dict symbol -> count
+    :return: the size in bits of the data under its entropy, a lower bound for any code
+    """
+    total = sum(frequency.values())
+    return sum(count * math.log2(total / count) for count in frequency.values())
+
+
+def code_bits(frequency, codes):
+    """
+    :param frequency: dict symbol -> count
+    :param codes: dict symbol -> (code value, code length)
+    :return: the size in bits of the data coded with codes. None: a symbol has no code
+    """
+    bits = 0
+    for symbol, count in frequency.items():
+        code = codes.get(symbol)
+        if code is None:
+            return None
+        bits += count * code[1]
+    return bits
+
+
+class CodeCache:
+    def __init__(self, max_entries=CACHE_ENTRIES, max_ratio_loss=MAX_RATIO_LOSS):
+        """
+        an lru cache of huffman codes, shared by the codec objects given it: Huffman_Coding(path, code_cache=cache).
+        compress looks the code up by the quantized histogram of the data (see signature) and builds no tree on a hit,
+        decompress looks the codes and decode table up by the code lengths of the header. thread safe.
+        :param max_entries: the max number of codes, and of decode tables, kept. the least recently used are evicted
+        :param max_ratio_loss: a cached code is used only if the data coded with it is at most that much larger than
+        estimated for a code built for the data: the entropy of the data times the redundancy (huffman size / entropy)
+        the cached code had on the data it was built for
+        """
+        self.max_entries = max_entries
+        self.max_ratio_loss = max_ratio_loss
+        # signature -> (codes, redundancy)
+        self.codes = OrderedDict()
+        # sorted code lengths -> (codes, DecodeTable)
+        self.decoders = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+        self.evictions = 0
+        self.decoder_hits = 0
+        self.decoder_misses = 0
+
+    def lookup(self, frequency, max_code_length):
+        """
+        :param frequency: dict symbol -> count of the data to compress
+        :param max_code_length: the max code length of the codec
+        :return: dict symbol -> (code value, code length) of a cached code for a similar histogram, within
+        max_ratio_loss. None: a code has to be built (then store it)
+        """
+        key = signature(frequency, max_code_length)
+        with self.lock:
+            entry = self.codes.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.codes.move_to_end(key)
+
+        codes, redundancy = entry
+        bits = code_bits(frequency, codes)
+        # no code is shorter than 1 bit (see canonical_codes)
+        expected = max(entropy_bits(frequency) * redundancy, sum(frequency.values()))
+        with self.lock:
+            if bits is None or bits > expected * (1 + self.max_ratio_loss):
+                self.rejected += 1
+                self.misses += 1
+                return None
+            self.hits += 1
+        return codes
+
+    def store(self, frequency, max_code_length, codes):
+        """
+        :param frequency: dict symbol -> count of the data codes were built for
+        :param max_code_length: the max code length of the codec
+        :param codes: dict symbol -> (code value, code length)
+        :return: None
+        """
+        entropy = entropy_bits(frequency)
+        redundancy = code_bits(frequency, codes) / entropy if entropy else 1.0
+        with self.lock:
+            self.put(self.codes, signature(frequency, max_code_length), (codes, redundancy))
+
+    def decoder(self, code_lengths):
+        """
+        :param code_lengths: dict symbol -> code length read from a header
+        :return: (dict symbol -> (code value, code length), DecodeTable), built on first use
+        """
+        key = tuple(sorted(code_lengths.items()))
+        with self.lock:
+            entry = self.decoders.get(key)
+            if entry is not None:
+                self.decoder_hits += 1
+                self.decoders.move_to_end(key)
+                return entry
+            self.decoder_misses += 1
+
+        codes = canonical_codes(code_lengths)
+        entry = codes, DecodeTable(codes)
+        with self.lock:
+            self.put(self.decoders, key, entry)
+        return entry
+
+    def put(self, entries, key, value):
+        """
+        :param entries: self.codes / self.decoders
+        :param key: the key of value
+        :param value: the entry to cache
+        :return: None. evicting the least recently used entry when full
+        """
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def summary(self):
+        """
+        :return: dict of the cache counters, hit_rate: hits / lookups of codes
+        """
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.codes),
+            'decoders': len(self.decoders),
+            'hits': self.hits,
+            'misses': self.misses,
+            'rejected': self.rejected,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'decoder_hits': self.decoder_hits,
+            'decoder_misses': self.decoder_misses,
+        }
@@ -0,0 +1,84 @@
+from utils.container import Header, BLOCK_SIZE
+from utils.parallel import compress_independent_blocks, decompress_independent_blocks
+from utils.seekable import CACHE_BLOCKS, SeekableReader
+from utils.shared_dictionary import compress_message, decompress_message
+
+
+class ParallelMixin:
+    """
+    the independent block methods shared by the codecs: parallel coding and random access. a codec class sets
+    CODEC_ID and defines stream_header, compress_block / decompress_block and options
+    """
+    # the codec id of the container header, set by the codec class
+    CODEC_ID = None
+
+    def options(self, header=None):
+        """
+        :param header: the Header of a compressed stream. None: the settings of this codec
+        :return: dict of keyword arguments for the codec constructor of a worker, coding the blocks of this codec
+        (header None) or of the stream
+        """
+        return {}
+
+    def compress_parallel(self, reader, writer, workers=None, block_size=BLOCK_SIZE):
+        """
+        compress a binary stream in independent blocks on a process pool. a block index is written
+        after the blocks, so they can also be decompressed in parallel.
+        :param reader: binary file like object to compress
+        :param writer: binary file like object for the compressed stream
+        :param workers: the number of processes. None: os.cpu_count()
+        :param block_size: the max number of bytes in a block
+        :return: the number of bytes compressed
+        """
+        return compress_independent_blocks(type(self), reader, writer, self.stream_header(), workers, block_size,
+                                           options=self.options())
+
+    def decompress_parallel(self, reader, writer, workers=None):
+        """
+        decompress a stream written by compress_parallel on a process pool
+        :param reader: binary file like object with the compressed stream
+        :param writer: binary file like object for the decompressed data
+        :param workers: the number of processes. None: os.cpu_count()
+        :return: the number of bytes decompressed
+        """
+        header = Header.read(reader, codec_id=self.CODEC_ID)
+        return decompress_independent_blocks(type(self), reader, writer, header, workers,
+                                             options=self.options(header))
+
+    def open_seekable(self, reader, cache_blocks=CACHE_BLOCKS):
+        """
+        random access to a file written by compress_parallel (use a small block_size, e.g. SEEKABLE_BLOCK_SIZE):
+        reader.read(offset, length) decodes only the blocks covering the range
+        :param reader: seekable binary file object with the compressed stream, kept open by the caller
+        :param cache_blocks: the max number of decoded blocks cached
+        :return: SeekableReader
+        """
+        header = Header.read(reader, codec_id=self.CODEC_ID)
+        return SeekableReader(reader, header, type(self), options=self.options(header), cache_blocks=cache_blocks)
+
+
+class MessageMixin:
+    """
+    the shared dictionary messages of the codecs (see utils.shared_dictionary). a codec class sets CODEC_ID
+    """
+    # the codec id of the messages, set by the codec class
+    CODEC_ID = None
+
+    def compress_message(self, data, dictionary):
+        """
+        compress a small message (a log line, a json record ...) with a shared dictionary
+        (see utils.shared_dictionary.train_dictionary): no table is built or stored, the message references
+        the dictionary by its id
+        :param data: bytes like object
+        :param dictionary: SharedDictionary or the id of a registered one
+        :return: bytes - the message
+        """
+        return compress_message(self.CODEC_ID, data, dictionary)
+
+    def decompress_message(self, message, dictionary=None):
+        """
+        :param message: bytes written by compress_message
+        :param dictionary: SharedDictionary or id. None: the registered dictionary the message references
+        :return: bytes decompressed
+        """
+        return decompress_message(self.CODEC_ID, message, dictionary)
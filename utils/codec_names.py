@@ -0,0 +1,42 @@
+from utils.container import AUTO, HUFFMAN, LZW, LZW_HUFFMAN
+
+
+# the codec tables shared by the command line tools (batch, compressor), importing no codec: a tool imports the
+# codec it runs on first use, so its startup stays short
+
+# codec name -> (module, class)
+CODECS = {
+    'huffman': ('huffman.huffman', 'Huffman_Coding'),
+    'lzw': ('lzw.lzw_coding', 'LZW_Coding'),
+    'lzw_huffman': ('lzw_huffman.lzw_huffman', 'Lempel_Ziv_Huffman_Coding'),
+    'auto': ('compressor.compressor', 'Compressor'),
+}
+
+# codec id of the header -> codec name
+CODEC_NAMES = {HUFFMAN: 'huffman', LZW: 'lzw', LZW_HUFFMAN: 'lzw_huffman', AUTO: 'auto'}
+
+# the extension added to a file compressed by a command line tool
+EXTENSION = '.bin'
+
+MB = 1 << 20
+
+
+def codec_class(codec_name):
+    """
+    :param codec_name: a key of CODECS
+    :return: the codec class, its module imported on first use
+    """
+    module_name, class_name = CODECS[codec_name]
+    return getattr(__import__(module_name, fromlist=[class_name]), class_name)
+
+
+def parse_size(text):
+    """
+    :param text: a size like 1024, 1K, 10M, 1G
+    :return: the number of bytes
+    """
+    units = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+    text = text.strip().upper().rstrip('B')
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
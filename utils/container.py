@@ -0,0 +1,640 @@
+import mmap
+import struct
+import zlib
+from collections import deque
+from contextlib import contextmanager
+from utils.bit_io import BitWriter
+from utils.bytes_utils import write_varint, read_varint
+from utils.canonical_huffman import huffman_code_lengths, canonical_codes, DecodeTable
+
+
+MAGIC = b'DCMP'
+VERSION = 1
+
+# codec ids
+HUFFMAN = 1
+LZW = 2
+LZW_HUFFMAN = 3
+AUTO = 4  # compressor.Compressor: every block is stored or coded with one of the codecs above
+
+# magic, version, codec id, flags, original length, crc32 of the original data
+HEADER_FORMAT = '>4sBBBQI'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# header flags
+STREAM = 1  # the body is a sequence of blocks followed by a trailer with the original length and crc32
+INDEPENDENT = 2  # every block is decoded on its own, the trailer is followed by a block index
+ADAPTIVE = 4  # the blocks carry no code table, the decompressor rebuilds the code from the blocks before
+BUCKETED = 8  # the huffman symbols are buckets of the lempel-ziv codes, followed by their low bits raw (lzw+huffman)
+
+# the default size of the blocks read by compress_stream
+BLOCK_SIZE = 1 << 20
+
+# buffer size of the files decompressed data is written to, so small writes are not a system call each
+WRITE_BUFFER_SIZE = 1 << 20
+
+# files larger than this are compressed / decompressed piece by piece from a memory mapped input to a memory mapped
+# output, so neither the whole input, its codes nor the whole output are held in memory (see use_mapped)
+MAPPED_FILE_BYTES = 1 << 26
+
+# the number of input bytes coded per piece of a memory mapped file
+MAPPED_CHUNK_BYTES = 1 << 22
+
+# a MappedWriter grows its file by at least this many bytes
+MAPPED_GROW_BYTES = 1 << 24
+
+# original length, crc32 of the original data. written after the last block of a stream
+TRAILER_FORMAT = '>QI'
+TRAILER_SIZE = struct.calcsize(TRAILER_FORMAT)
+
+# offset of the block index, magic. the last bytes of a file with independent blocks
+FOOTER_FORMAT = '>Q4s'
+FOOTER_SIZE = struct.calcsize(FOOTER_FORMAT)
+INDEX_MAGIC = b'DIDX'
+
+# code lengths are 0..63, this token of the code length code stands for a run of unused symbols
+ZERO_RUN = 64
+MIN_ZERO_RUN = 4
+
+
+def checksum(data, value=0):
+    """
+    :param data: bytes like object
+    :param value: the checksum of the data before, for computing it incrementally
+    :return: crc32 of data
+    """
+    return zlib.crc32(data, value)
+
+
+class Header:
+    def __init__(self, codec_id, original_length=0, checksum=0, flags=0, params=b''):
+        """
+        the header in front of every compressed file
+        :param codec_id: HUFFMAN / LZW / LZW_HUFFMAN
+        :param original_length: the length of the data before compress
+        :param checksum: crc32 of the data before compress
+        :param flags: codec independent layout flags
+        :param params: codec specific parameters (code lengths table, lzw code width ...)
+        """
+        self.codec_id = codec_id
+        self.original_length = original_length
+        self.checksum = checksum
+        self.flags = flags
+        self.params = params
+
+    def to_bytes(self):
+        """
+        :return: the header serialized
+        """
+        fixed = struct.pack(HEADER_FORMAT, MAGIC, VERSION, self.codec_id, self.flags,
+                            self.original_length, self.checksum)
+        return fixed + write_varint(len(self.params)) + self.params
+
+    @classmethod
+    def from_bytes(cls, data, codec_id=None):
+        """
+        :param data: bytes like object starting with a header
+        :param codec_id: the codec expected to have written data. None: any codec
+        :return: (Header, the index of the first byte after the header)
+        """
+        if len(data) < HEADER_SIZE:
+            raise ValueError('not a compressed file: too short')
+        magic, version, file_codec_id, flags, original_length, crc = struct.unpack_from(HEADER_FORMAT, data)
+        if magic != MAGIC:
+            raise ValueError('not a compressed file: bad magic bytes')
+        if version != VERSION:
+            raise ValueError(f'unsupported format version {version}')
+        if codec_id is not None and file_codec_id != codec_id:
+            raise ValueError(f'file was compressed with codec {file_codec_id}, expected {codec_id}')
+
+        params_length, offset = read_varint(data, HEADER_SIZE)
+        params = bytes(data[offset:offset + params_length])
+        header = cls(file_codec_id, original_length, crc, flags, params)
+        return header, offset + params_length
+
+    @classmethod
+    def read(cls, reader, codec_id=None):
+        """
+        reading a header from a file like object, leaving it positioned at the first byte after the header
+        :param reader: binary file like object
+        :param codec_id: the codec expected to have written data. None: any codec
+        :return: Header
+        """
+        return run_parser(parse_header(codec_id), reader)
+
+    def check(self, length, crc):
+        """
+        :param length: the length of the decompressed data
+        :param crc: crc32 of the decompressed data
+        :return: None. raising ValueError on mismatch with the values saved at compress
+        """
+        if length != self.original_length:
+            raise ValueError(f'decompressed length {length} != original length {self.original_length}')
+        if crc != self.checksum:
+            raise ValueError('checksum mismatch: the compressed file is corrupted')
+
+    def verify(self, data):
+        """
+        checking the decompressed data against the length and checksum saved at compress
+        :param data: the decompressed data
+        :return: None. raising ValueError on mismatch
+        """
+        self.check(len(data), checksum(data))
+
+
+def read_exact(reader, n_bytes):
+    """
+    :param reader: binary file like object
+    :param n_bytes: the number of bytes to read
+    :return: bytes. raising ValueError if the stream ends before n_bytes
+    """
+    chunks = []
+    while n_bytes > 0:
+        chunk = reader.read(n_bytes)
+        if not chunk:
+            raise ValueError('unexpected end of compressed stream')
+        chunks.append(chunk)
+        n_bytes -= len(chunk)
+    return b''.join(chunks)
+
+
+@contextmanager
+def map_file(file):
+    """
+    mapping a whole file into memory read only, so it is decoded in place without reading it into a bytes object
+    :param file: binary file object opened for reading
+    :return: context manager yielding a bytes like object with the file content (bytes if it can not be mapped)
+    """
+    try:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError):  # not a real file, or empty (which can not be mapped)
+        file.seek(0)
+        yield file.read()
+        return
+    try:
+        yield mapped
+    finally:
+        try:
+            mapped.close()
+        except BufferError:  # a view of it is still referenced (by a traceback ...), closed when collected
+            pass
+
+
+def use_mapped(length):
+    """
+    :param length: the size of the file to compress, or the original size of the file to decompress
+    :return: True if the file is coded piece by piece between memory mapped files
+    """
+    return length > MAPPED_FILE_BYTES
+
+
+class MappedWriter:
+    def __init__(self, file, size=0):
+        """
+        writing a file through a memory map: the file is preallocated to size and grows (doubling) when the data
+        does not fit, then it is truncated to the data written on close. the pages written are flushed by the os,
+        so the output does not stay in memory.
+        :param file: binary file object opened for reading and writing ('w+b')
+        :param size: the expected size of the file
+        """
+        self.file = file
+        self.mapped = None
+        self.size = 0
+        self.position = 0
+        self.reserve(size)
+
+    def reserve(self, size):
+        """
+        :param size: the size the file must have at least
+        :return: None
+        """
+        if size <= self.size:
+            return
+        if self.mapped is not None:
+            self.mapped.close()
+        self.file.truncate(size)
+        self.mapped = mmap.mmap(self.file.fileno(), size)
+        self.size = size
+
+    def write(self, data):
+        """
+        :param data: bytes like object written at the end of the data
+        :return: the number of bytes written
+        """
+        end = self.position + len(data)
+        if end > self.size:
+            self.reserve(max(end, self.size * 2, MAPPED_GROW_BYTES))
+        self.mapped[self.position:end] = data
+        self.position = end
+        return len(data)
+
+    def write_at(self, offset, data):
+        """
+        overwriting bytes already written (a placeholder)
+        :param offset: the offset of the bytes in the file
+        :param data: bytes like object
+        :return: None
+        """
+        if offset + len(data) > self.position:
+            raise ValueError('write_at past the data written')
+        self.mapped[offset:offset + len(data)] = data
+
+    def tell(self):
+        """
+        :return: the number of bytes written
+        """
+        return self.position
+
+    def close(self):
+        """
+        unmapping the file and truncating it to the data written. the file is left open
+        :return: None
+        """
+        if self.mapped is not None:
+            self.mapped.close()
+            self.mapped = None
+        self.file.truncate(self.position)
+
+
+def write_padded_chunks(output, write_chunk, chunks):
+    """
+    writing a bit string in the layout of BitWriter.get_padded_bytes piece by piece: the padding info byte is
+    written as a placeholder and filled in at the end
+    :param output: MappedWriter
+    :param write_chunk: function (BitWriter, chunk) -> None writing the bits of a piece
+    :param chunks: iterable of the pieces
+    :return: the number of bytes written
+    """
+    start = output.tell()
+    output.write(b'\x00')
+    writer = BitWriter()
+    for chunk in chunks:
+        write_chunk(writer, chunk)
+        output.write(writer.take_bytes())
+    tail = writer.get_padded_bytes()
+    output.write(tail[1:])
+    output.write_at(start, tail[:1])
+    return output.tell() - start
+
+
+def iter_chunks(data, chunk_size=MAPPED_CHUNK_BYTES):
+    """
+    :param data: bytes like object
+    :param chunk_size: the max length of a piece
+    :return: generator of memoryviews of data, chunk_size bytes each
+    """
+    view = memoryview(data).cast('B')
+    for start in range(0, len(view), chunk_size):
+        yield view[start:start + chunk_size]
+
+
+def run_parser(parser, reader):
+    """
+    running a stream parser (parse_varint, parse_header, parse_frame, parse_trailer) on a file like object.
+    a parser is a generator yielding the number of bytes it needs next and sent those bytes, so the layout is
+    parsed the same way from a file and from an asyncio stream (see aio.streams.run_parser)
+    :param parser: generator returned by a parse_ function
+    :param reader: binary file like object
+    :return: the value returned by the parser
+    """
+    try:
+        n_bytes = next(parser)
+        while True:
+            n_bytes = parser.send(read_exact(reader, n_bytes))
+    except StopIteration as stop:
+        return stop.value
+
+
+def parse_varint():
+    """
+    stream parser (see run_parser) of a varint
+    :return: (the int, the raw bytes of the varint)
+    """
+    raw = bytearray()
+    while True:
+        raw += yield 1
+        if raw[-1] < 0x80:
+            value, _ = read_varint(raw, 0)
+            return value, bytes(raw)
+
+
+def parse_header(codec_id=None):
+    """
+    stream parser (see run_parser) of a header
+    :param codec_id: the codec expected to have written data. None: any codec
+    :return: Header
+    """
+    data = yield HEADER_SIZE
+    params_length, varint = yield from parse_varint()
+    data += varint + (yield params_length)
+    header, _ = Header.from_bytes(data, codec_id=codec_id)
+    return header
+
+
+def parse_frame():
+    """
+    stream parser (see run_parser) of the next block of a stream written by compress_blocks
+    :return: (block length, payload). None: the end of the blocks, the trailer follows
+    """
+    block_length, _ = yield from parse_varint()
+    if block_length == 0:
+        return None
+    payload_length, _ = yield from parse_varint()
+    payload = yield payload_length
+    return block_length, payload
+
+
+def parse_trailer():
+    """
+    stream parser (see run_parser) of the trailer after the blocks
+    :return: (the original length, crc32)
+    """
+    data = yield TRAILER_SIZE
+    return struct.unpack(TRAILER_FORMAT, data)
+
+
+def read_stream_varint(reader):
+    """
+    :param reader: binary file like object positioned at a varint
+    :return: (the int, the raw bytes of the varint)
+    """
+    return run_parser(parse_varint(), reader)
+
+
+class BlockFramer:
+    def __init__(self, header):
+        """
+        the layout of a compressed stream, as bytes: header, (varint block length, varint payload length, payload)
+        for each block, varint 0, trailer. with the INDEPENDENT flag the trailer is followed by the block index and
+        the index footer. the caller writes the bytes, so the layout is the same for files and asyncio streams.
+        :param header: the codec Header, STREAM flag is added
+        """
+        header.flags |= STREAM
+        self.header = header
+        self.total = 0
+        self.crc = 0
+        self.block_lengths = deque()
+        # list of (block length, payload offset, payload length), position: the length of the stream so far
+        self.index = []
+        self.position = 0
+
+    def start(self):
+        """
+        :return: bytes - the header
+        """
+        header_bytes = self.header.to_bytes()
+        self.position = len(header_bytes)
+        return header_bytes
+
+    def add_block(self, block):
+        """
+        :param block: the next block read, before it is compressed
+        :return: None
+        """
+        self.total += len(block)
+        self.crc = checksum(block, self.crc)
+        self.block_lengths.append(len(block))
+
+    def frame(self, payload):
+        """
+        :param payload: the payload of the oldest block added and not framed yet
+        :return: bytes - the frame written in front of payload
+        """
+        block_length = self.block_lengths.popleft()
+        frame = write_varint(block_length) + write_varint(len(payload))
+        self.index.append((block_length, self.position + len(frame), len(payload)))
+        self.position += len(frame) + len(payload)
+        return frame
+
+    def end(self):
+        """
+        :return: bytes - the end of the blocks, the trailer and the block index of independent blocks
+        """
+        end = write_varint(0) + struct.pack(TRAILER_FORMAT, self.total, self.crc)
+        if self.header.flags & INDEPENDENT:
+            end += pack_index(self.index) + struct.pack(FOOTER_FORMAT, self.position + len(end), INDEX_MAGIC)
+        return end
+
+
+class BlockChecker:
+    def __init__(self, header):
+        """
+        checking the blocks decompressed from a stream written with BlockFramer against their lengths and the trailer
+        :param header: the Header read from the stream
+        """
+        if not header.flags & STREAM:
+            raise ValueError('not a compressed stream: the file was written by compress, not compress_stream')
+        self.header = header
+        self.total = 0
+        self.crc = 0
+        self.block_lengths = deque()
+
+    def add_frame(self, block_length):
+        """
+        :param block_length: the block length of the next frame read (see parse_frame)
+        :return: None
+        """
+        self.block_lengths.append(block_length)
+
+    def check_block(self, block):
+        """
+        :param block: the oldest block decoded and not checked yet
+        :return: None. raising ValueError if its length is not the block length of its frame
+        """
+        block_length = self.block_lengths.popleft()
+        if len(block) != block_length:
+            raise ValueError(f'decompressed block length {len(block)} != original block length {block_length}')
+        self.total += len(block)
+        self.crc = checksum(block, self.crc)
+
+    def finish(self, trailer):
+        """
+        :param trailer: (the original length, crc32) read after the blocks (see parse_trailer)
+        :return: None. raising ValueError if the blocks do not match it
+        """
+        self.header.original_length, self.header.checksum = trailer
+        self.header.check(self.total, self.crc)
+
+
+def compress_blocks(reader, writer, header, compress_block, block_size=BLOCK_SIZE, map_blocks=map, live=False):
+    """
+    compressing a stream block after block, holding only a few blocks in memory, in the layout of BlockFramer
+    :param reader: binary file like object to compress
+    :param writer: binary file like object for the compressed stream
+    :param header: the codec Header, STREAM flag is added
+    :param compress_block: function bytes -> payload bytes
+    :param block_size: the max number of bytes in a block
+    :param map_blocks: function like map(compress_block, blocks) yielding the payloads in order
+    :param live: a block is whatever the reader has available (read1, up to block_size) and the writer is flushed
+    after every block, so the data of a live source (a pipe, a socket) is sent as it arrives, not when a block fills
+    :return: the number of bytes compressed
+    """
+    framer = BlockFramer(header)
+    writer.write(framer.start())
+    read = getattr(reader, 'read1', reader.read) if live else reader.read
+
+    def read_blocks():
+        while True:
+            block = read(block_size)
+            if not block:
+                return
+            framer.add_block(block)
+            yield block
+
+    for payload in map_blocks(compress_block, read_blocks()):
+        writer.write(framer.frame(payload))
+        writer.write(payload)
+        if live:
+            writer.flush()
+    writer.write(framer.end())
+    return framer.total
+
+
+def decompress_blocks(reader, writer, header, decompress_block, map_blocks=map, live=False):
+    """
+    decompressing a stream written by compress_blocks, holding only a few blocks in memory.
+    :param reader: binary file like object positioned after the header
+    :param writer: binary file like object for the decompressed data
+    :param header: the Header read from the stream
+    :param decompress_block: function payload bytes -> bytes
+    :param map_blocks: function like map(decompress_block, payloads) yielding the blocks in order
+    :param live: flushing the writer after every block
+    :return: the number of bytes decompressed
+    """
+    checker = BlockChecker(header)
+
+    def read_payloads():
+        while True:
+            frame = run_parser(parse_frame(), reader)
+            if frame is None:
+                return
+            block_length, payload = frame
+            checker.add_frame(block_length)
+            yield payload
+
+    for block in map_blocks(decompress_block, read_payloads()):
+        checker.check_block(block)
+        writer.write(block)
+        if live:
+            writer.flush()
+    checker.finish(run_parser(parse_trailer(), reader))
+    return checker.total
+
+
+def pack_index(index):
+    """
+    :param index: list of (block length, payload offset in the file, payload length)
+    :return: bytes
+    """
+    b = bytearray(write_varint(len(index)))
+    for entry in index:
+        for value in entry:
+            b += write_varint(value)
+    return bytes(b)
+
+
+def unpack_index(data, offset=0):
+    """
+    :param data: bytes like object holding an index written by pack_index
+    :param offset: the index of the block index in data
+    :return: list of (block length, payload offset in the file, payload length)
+    """
+    index = []
+    n_blocks, offset = read_varint(data, offset)
+    for _ in range(n_blocks):
+        block_length, offset = read_varint(data, offset)
+        payload_offset, offset = read_varint(data, offset)
+        payload_length, offset = read_varint(data, offset)
+        index.append((block_length, payload_offset, payload_length))
+    return index
+
+
+def read_index(file, base=0):
+    """
+    reading the block index of a file written with the INDEPENDENT flag
+    :param file: seekable binary file object
+    :param base: the offset in file of the first byte of the header (the offsets of the index are from it)
+    :return: list of (block length, payload offset from the header, payload length)
+    """
+    file.seek(-FOOTER_SIZE, 2)
+    index_offset, magic = struct.unpack(FOOTER_FORMAT, read_exact(file, FOOTER_SIZE))
+    if magic != INDEX_MAGIC:
+        raise ValueError('no block index: the file was not compressed with independent blocks')
+    end = file.tell() - FOOTER_SIZE
+    file.seek(base + index_offset)
+    return unpack_index(read_exact(file, end - base - index_offset))
+
+
+def pack_code_lengths(code_lengths):
+    """
+    serializing a huffman code lengths table. the lengths of symbols 0..max symbol are themselves huffman coded
+    (a code length code, as in deflate), runs of unused symbols are one ZERO_RUN token with the run in a varint.
+    :param code_lengths: dict int symbol -> code length
+    :return: bytes
+    """
+    n_symbols = max(code_lengths, default=-1) + 1
+    tokens = []
+    runs = bytearray()
+    symbol = 0
+    while symbol < n_symbols:
+        length = code_lengths.get(symbol, 0)
+        run = 1
+        if length == 0:
+            while symbol + run < n_symbols and code_lengths.get(symbol + run, 0) == 0:
+                run += 1
+            if run >= MIN_ZERO_RUN:
+                tokens.append(ZERO_RUN)
+                runs += write_varint(run)
+            else:
+                tokens.extend([0] * run)
+        else:
+            tokens.append(length)
+        symbol += run
+
+    frequency = {}
+    for token in tokens:
+        frequency[token] = frequency.get(token, 0) + 1
+    codes = canonical_codes(huffman_code_lengths(frequency))
+    writer = BitWriter()
+    writer.write_codes(tokens, codes)
+
+    b = bytearray(write_varint(n_symbols))
+    b += write_varint(len(codes))
+    for token, (_, length) in sorted(codes.items()):
+        b += bytes([token, length])
+    b += write_varint(writer.bit_length())
+    b += writer.getvalue()
+    b += runs
+    return bytes(b)
+
+
+def unpack_code_lengths(data, offset=0):
+    """
+    :param data: bytes like object holding a table written by pack_code_lengths
+    :param offset: the index of the table in data
+    :return: (dict int symbol -> code length, the index after the table)
+    """
+    n_symbols, offset = read_varint(data, offset)
+    n_codes, offset = read_varint(data, offset)
+    token_lengths = {}
+    for _ in range(n_codes):
+        token_lengths[data[offset]] = data[offset + 1]
+        offset += 2
+    n_bits, offset = read_varint(data, offset)
+    n_bytes = (n_bits + 7) // 8
+    tokens = DecodeTable(canonical_codes(token_lengths)).decode(data[offset:offset + n_bytes], n_bits)
+    offset += n_bytes
+
+    code_lengths = {}
+    symbol = 0
+    for token in tokens:
+        if token == ZERO_RUN:
+            run, offset = read_varint(data, offset)
+            symbol += run
+        else:
+            if token:
+                code_lengths[symbol] = token
+            symbol += 1
+    if symbol != n_symbols:
+        raise ValueError('corrupted code lengths table')
+    return code_lengths, offset
@@ -1,21 +0,0 @@
-from functools import total_ordering
-
-
-@total_ordering
-class HeapNode:
-    def __init__(self, char, freq):
-        self.char = char
-        self.freq = freq
-        self.left = None
-        self.right = None
-
-    # defining comparators less_than and equals
-    def __lt__(self, other):
-        return self.freq < other.freq
-
-    def __eq__(self, other):
-        if other is None:
-            return False
-        if not isinstance(other, HeapNode):
-            return False
-        return self.freq == other.freq
@@ -0,0 +1,59 @@
+class HuffmanTree:
+    def __init__(self, frequency):
+        """
+        huffman tree over parallel lists: node i has freq[i], and children left[i] / right[i] (-1 for a leaf).
+        the leaves are nodes 0..n_leaves - 1 sorted by (frequency, symbol), internal nodes are appended after them.
+        sorting by symbol on equal frequencies makes the tree independent of the order symbols were counted in.
+        timsort is linear on frequencies that are already sorted.
+        :param frequency: dict symbol -> count. symbols must be comparable with each other (ints, characters)
+        """
+        leaves = sorted(zip(frequency.values(), frequency))
+        self.symbols = [symbol for _, symbol in leaves]
+        self.n_leaves = len(leaves)
+        self.freq = [freq for freq, _ in leaves]
+        self.left = [-1] * self.n_leaves
+        self.right = [-1] * self.n_leaves
+
+    def merge(self):
+        """
+        merging the 2 nodes with the lowest frequencies until one root is left, with two queues:
+        the sorted leaves, and the internal nodes, which are created in order of frequency.
+        O(n) since the leaves are sorted. on equal frequencies a leaf is taken before an internal node.
+        :return: self
+        """
+        freq = self.freq
+        left = self.left
+        right = self.right
+        n_leaves = self.n_leaves
+        leaf = 0
+        internal = n_leaves
+        for _ in range(n_leaves - 1):
+            if leaf < n_leaves and (internal == len(freq) or freq[leaf] <= freq[internal]):
+                first = leaf
+                leaf += 1
+            else:
+                first = internal
+                internal += 1
+            if leaf < n_leaves and (internal == len(freq) or freq[leaf] <= freq[internal]):
+                second = leaf
+                leaf += 1
+            else:
+                second = internal
+                internal += 1
+            freq.append(freq[first] + freq[second])
+            left.append(first)
+            right.append(second)
+        return self
+
+    def code_lengths(self):
+        """
+        measuring the depth of each leaf of a merged tree. children have smaller indices than their parent,
+        so one pass from the root (the last node) down fills every depth, without recursion.
+        :return: dict symbol -> code length (0 for the single leaf of a one symbol tree)
+        """
+        depth = [0] * len(self.freq)
+        left = self.left
+        right = self.right
+        for node in range(len(self.freq) - 1, self.n_leaves - 1, -1):
+            depth[left[node]] = depth[right[node]] = depth[node] + 1
+        return dict(zip(self.symbols, depth))
@@ -0,0 +1,155 @@
+import time
+import tracemalloc
+
+
+class StageRecord:
+    def __init__(self, name, bytes_in=None):
+        """
+        the measures of one run of a pipeline stage. the stage fills the measures it knows.
+        :param name: the stage name (lzw_compress, make_heap ...)
+        :param bytes_in: the number of bytes the stage reads
+        """
+        self.name = name
+        self.seconds = 0.0
+        self.bytes_in = bytes_in
+        self.bytes_out = None
+        self.n_symbols = None
+        self.dictionary_size = None
+        self.peak_bytes = None
+
+    def to_dict(self):
+        """
+        :return: dict of the measures, without the ones the stage did not fill
+        """
+        return {key: value for key, value in vars(self).items() if value is not None}
+
+
+class Stats:
+    def __init__(self, callback=None, trace_memory=False):
+        """
+        collecting a StageRecord for every stage a codec runs. pass it to the codec: Huffman_Coding(path, stats=Stats())
+        :param callback: function called with each StageRecord when its stage ends. None: records are only kept
+        :param trace_memory: measuring the allocation peak of every stage with tracemalloc (slows the codec down)
+        """
+        self.callback = callback
+        self.trace_memory = trace_memory
+        self.records = []
+        self.started_tracing = False
+
+    def stage(self, name, bytes_in=None):
+        """
+        :param name: the stage name
+        :param bytes_in: the number of bytes the stage reads
+        :return: context manager timing the stage, yielding its StageRecord
+        """
+        return StageTimer(self, StageRecord(name, bytes_in))
+
+    def add(self, record):
+        """
+        :param record: a StageRecord of a stage that ended
+        :return: None
+        """
+        self.records.append(record)
+        if self.callback is not None:
+            self.callback(record)
+
+    def summary(self):
+        """
+        :return: dict stage name -> dict of the measures summed over every run of the stage (peak_bytes: max)
+        """
+        summary = {}
+        for record in self.records:
+            total = summary.setdefault(record.name, {'runs': 0})
+            total['runs'] += 1
+            for key, value in record.to_dict().items():
+                if key == 'name':
+                    continue
+                if key in ('peak_bytes', 'dictionary_size'):
+                    total[key] = max(total.get(key, 0), value)
+                else:
+                    total[key] = total.get(key, 0) + value
+        return summary
+
+    def report(self):
+        """
+        :return: a table of the summary, the slowest stage first
+        """
+        summary = sorted(self.summary().items(), key=lambda item: -item[1]['seconds'])
+        total_seconds = sum(total['seconds'] for _, total in summary) or 1.0
+        lines = [f"{'stage':<20} {'runs':>5} {'seconds':>9} {'%':>6} {'bytes in':>11} {'bytes out':>11} "
+                 f"{'symbols':>10} {'peak bytes':>11}"]
+        for name, total in summary:
+            lines.append(f"{name:<20} {total['runs']:>5} {total['seconds']:>9.4f} "
+                         f"{100 * total['seconds'] / total_seconds:>6.1f} {total.get('bytes_in', ''):>11} "
+                         f"{total.get('bytes_out', ''):>11} {total.get('n_symbols', ''):>10} "
+                         f"{total.get('peak_bytes', ''):>11}")
+        return '\n'.join(lines)
+
+    def stop(self):
+        """
+        stopping tracemalloc if it was started by this object
+        :return: None
+        """
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+
+class StageTimer:
+    def __init__(self, stats, record):
+        """
+        context manager measuring one stage (see Stats.stage)
+        :param stats: the Stats the record is added to
+        :param record: the StageRecord of the stage
+        """
+        self.stats = stats
+        self.record = record
+        self.start = 0.0
+        self.start_memory = 0
+
+    def __enter__(self):
+        if self.stats.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.stats.started_tracing = True
+            # python < 3.9 has no reset_peak: the peak of a stage is then the peak since tracing started
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            self.start_memory = tracemalloc.get_traced_memory()[0]
+        self.start = time.perf_counter()
+        return self.record
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.record.seconds = time.perf_counter() - self.start
+        if self.stats.trace_memory:
+            self.record.peak_bytes = tracemalloc.get_traced_memory()[1] - self.start_memory
+        self.stats.add(self.record)
+        return False
+
+
+class NullStage:
+    """
+    the stage context used when a codec has no Stats: it measures nothing
+    """
+    record = StageRecord(None)
+
+    def __enter__(self):
+        return self.record
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NULL_STAGE = NullStage()
+
+
+def stage(stats, name, bytes_in=None):
+    """
+    :param stats: Stats or None (instrumentation disabled)
+    :param name: the stage name
+    :param bytes_in: the number of bytes the stage reads
+    :return: context manager yielding the StageRecord to fill. a shared no-op one when stats is None
+    """
+    if stats is None:
+        return NULL_STAGE
+    return stats.stage(name, bytes_in)
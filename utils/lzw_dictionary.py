@@ -0,0 +1,435 @@
+from array import array
+from utils.canonical_huffman import REFILL_BYTES
+
+
+ASCII_TO_INT: dict = {i.to_bytes(1, 'big'): i for i in range(256)}
+INT_TO_ASCII: dict = {i: b for b, i in ASCII_TO_INT.items()}
+
+# emitted when the compressor resets its dictionary, the decompressor resets on reading it
+CLEAR_CODE = len(ASCII_TO_INT)
+FIRST_CODE = CLEAR_CODE + 1
+MIN_BITS = FIRST_CODE.bit_length()
+
+# default max code width of a bounded dictionary
+MAX_BITS = 16
+
+# max code width used by compress_stream when the codec is unbounded, so memory use stays bounded
+STREAM_MAX_BITS = 18
+
+# once the dictionary is full, the bytes per code ratio is measured over windows of that many input bytes.
+# the dictionary is cleared when a window falls below RATIO_DROP of the best window seen (decayed by RATIO_DECAY
+# every window, so an exceptional early window does not keep clearing the dictionary).
+RATIO_CHECK_BYTES = 10000
+RATIO_DROP = 0.9
+RATIO_DECAY = 0.98
+
+# the initial size of an output buffer of LZWDecoder when the decoded size is not known, doubled as needed
+DECODE_BUFFER_BYTES = 1 << 16
+
+# iterating bytes is faster than iterating a memoryview (of a memory mapped file ...),
+# so a memoryview is encoded from copies of this many bytes at a time
+COPY_BYTES = 1 << 20
+
+
+def code_width(n_keys, max_bits=None):
+    """
+    :param n_keys: the number of dictionary entries when the code is emitted
+    :param max_bits: the max code width. None: unbounded
+    :return: the number of bits needed for any code of the dictionary
+    """
+    if max_bits is not None:
+        n_keys = min(n_keys, 1 << max_bits)
+    return (n_keys - 1).bit_length()
+
+
+class LZWEncoder:
+    def __init__(self, max_bits=None):
+        """
+        lempel-ziv compressor state. the dictionary is kept between calls to encode, so a stream
+        can be compressed block after block.
+        :param max_bits: the dictionary holds at most 2 ** max_bits codes. when it is full it is kept as is
+        until the compression ratio drops, then CLEAR_CODE is emitted and it starts over. None: unbounded
+        """
+        self.max_bits = max_bits
+        self.limit = float('inf') if max_bits is None else 1 << max_bits
+        self.keys = {}
+        self.n_keys = FIRST_CODE
+        self.frozen = False
+
+        # (code, length) of the match left open by encode(final=False), continued by the next call
+        self.match = None
+
+        # bytes / codes of the current window while the dictionary is full, for monitoring the ratio
+        self.window_in = 0
+        self.window_codes = 0
+        self.best_ratio = 0.0
+
+    def reset(self):
+        """
+        dropping every key added to the dictionary
+        :return: None
+        """
+        self.keys = {}
+        self.n_keys = FIRST_CODE
+        self.window_in = 0
+        self.window_codes = 0
+
+    def freeze(self):
+        """
+        no key is added to the dictionary from now on and it is never cleared: encode only looks codes up,
+        so the encoder holds no state between calls (a shared dictionary)
+        :return: None
+        """
+        self.limit = self.n_keys
+        self.frozen = True
+
+    def ratio_dropped(self, n_bytes):
+        """
+        counting a code emitted while the dictionary is full
+        :param n_bytes: the number of input bytes the code stands for
+        :return: True if the bytes per code ratio of the window dropped, the dictionary should be cleared
+        """
+        if self.frozen:
+            return False
+        self.window_in += n_bytes
+        self.window_codes += 1
+        if self.window_in < RATIO_CHECK_BYTES:
+            return False
+        ratio = self.window_in / self.window_codes
+        self.window_in = 0
+        self.window_codes = 0
+        self.best_ratio *= RATIO_DECAY
+        if ratio < self.best_ratio * RATIO_DROP:
+            return True
+        self.best_ratio = max(self.best_ratio, ratio)
+        return False
+
+    def encode(self, data, final=True):
+        """
+        compressing a block using lempel-ziv algo. the last match of the block is emitted,
+        so every block is decoded from its own codes.
+        the dictionary is a trie keyed on ints: (code of the match << 8) | next byte -> code of the longer match,
+        single bytes are their own codes, so no bytes object is built per input byte.
+        :param data: bytes like object to compress
+        :param final: False: the last match is kept open and continued by the next call, so data split in pieces
+        is encoded to the same codes as in one call
+        :return: list of numbers - the data encoded.
+        """
+        compressed: list = []
+        append = compressed.append
+        if self.match is not None:
+            (code, length), self.match = self.match, None
+            rest = data
+        elif data:
+            code = data[0]  # the code of the current match
+            length = 1  # the number of bytes of the current match
+            rest = data[1:]
+        else:
+            return compressed
+        keys = self.keys
+        get = keys.get
+        n_keys = self.n_keys
+        limit = self.limit
+
+        if isinstance(rest, memoryview):
+            pieces = (bytes(rest[start:start + COPY_BYTES]) for start in range(0, len(rest), COPY_BYTES))
+        else:
+            pieces = (rest,)
+        for piece in pieces:
+            for symbol in piece:
+                key = code << 8 | symbol
+                next_code = get(key)
+                if next_code is not None:
+                    code = next_code
+                    length += 1
+                else:
+                    append(code)
+                    if n_keys < limit:
+                        keys[key] = n_keys
+                        n_keys += 1
+                    elif self.ratio_dropped(length):
+                        append(CLEAR_CODE)
+                        self.reset()
+                        keys = self.keys
+                        get = keys.get
+                        n_keys = self.n_keys
+                    code = symbol
+                    length = 1
+
+        if final:
+            append(code)
+        else:
+            self.match = (code, length)
+        self.n_keys = n_keys
+        return compressed
+
+    def encode_bits(self, data, writer, final=True):
+        """
+        compressing a block and writing every code with the width of the dictionary at that point:
+        MIN_BITS at first, growing up to max_bits.
+        :param data: bytes like object to compress
+        :param writer: BitWriter for the codes
+        :param final: False: the block continues in the next call (see encode)
+        :return: None
+        """
+        n_keys = self.n_keys
+        compressed = self.encode(data, final)
+
+        # replaying the dictionary size the decompressor will see for each code (see LZWDecoder.decode_bits).
+        # a block continued from an open match starts the same way: n_keys is one ahead of the decompressor
+        # once it has a previous code
+        max_bits = self.max_bits
+        limit = self.limit
+        previous = False
+        for code in compressed:
+            writer.write(code, code_width(n_keys + previous, max_bits))
+            if code == CLEAR_CODE:
+                n_keys = FIRST_CODE
+                previous = False
+            else:
+                if previous and n_keys < limit:
+                    n_keys += 1
+                previous = True
+
+
+class LZWDecoder:
+    def __init__(self, max_bits=None):
+        """
+        lempel-ziv decompressor state. the dictionary is rebuilt from the codes the same way the compressor built it,
+        so no state from the compressor is needed. an entry is stored as (prefix code, last byte, length) in arrays,
+        so the dictionary costs a few bytes per entry whatever the length of its string. an entry is written by
+        copying its last occurrence in the output buffer, or, if that buffer is gone (a block or piece before),
+        by walking its prefixes.
+        :param max_bits: must match the LZWEncoder that compressed the codes
+        """
+        self.max_bits = max_bits
+        self.limit = float('inf') if max_bits is None else 1 << max_bits
+        # the number of bytes decoded into the output buffers before the current one
+        self.offset = 0
+        self.n_keys = FIRST_CODE
+        # a bounded dictionary is allocated to its max size, an unbounded one grows as needed (see grow)
+        self.allocate(FIRST_CODE if max_bits is None else max(self.limit, FIRST_CODE))
+
+    def allocate(self, size):
+        """
+        :param size: the number of entries of the new arrays
+        :return: None
+        """
+        self.prefix = array('l', [0]) * size
+        self.last_byte = array('B', range(CLEAR_CODE)) + array('B', [0]) * (size - CLEAR_CODE)
+        self.length = array('L', [1]) * size
+        # the position of the last occurrence of the entry in the output (offset + index in the buffer)
+        self.start = array('q', [-1]) * size
+
+    def reset(self):
+        """
+        dropping every key added to the dictionary. the arrays of a bounded dictionary are kept,
+        their entries are overwritten as the keys are added again
+        :return: None
+        """
+        self.n_keys = FIRST_CODE
+        if self.max_bits is None:
+            self.allocate(FIRST_CODE)
+
+    def grow(self):
+        """
+        doubling the size of the arrays of an unbounded dictionary
+        :return: None
+        """
+        size = len(self.length)
+        self.prefix.extend(array('l', [0]) * size)
+        self.last_byte.extend(array('B', [0]) * size)
+        self.length.extend(array('L', [1]) * size)
+        self.start.extend(array('q', [-1]) * size)
+
+    def decode_into(self, codes, out, pos=0, previous=-1):
+        """
+        decoding codes into out
+        :param codes: iterable of lempel-ziv codes
+        :param out: bytearray the entries are written to, grown if it is too short
+        :param pos: the index in out the first entry is written at
+        :param previous: the code before codes in the block. -1: first code or after a clear
+        :return: (the index in out after the last entry, the last code or -1)
+        """
+        prefix, last_byte, length, start = self.prefix, self.last_byte, self.length, self.start
+        offset = self.offset
+        n_keys = self.n_keys
+        limit = self.limit
+        # the sizes of out and of the dictionary arrays, kept in locals as they only change here
+        out_size = len(out)
+        capacity = len(length)
+        for code in codes:
+            if code < CLEAR_CODE:
+                n_bytes = 1
+                if pos >= out_size:
+                    out.extend(bytes(out_size + 1))
+                    out_size = len(out)
+                out[pos] = code
+            elif code == CLEAR_CODE:
+                self.reset()
+                prefix, last_byte, length, start = self.prefix, self.last_byte, self.length, self.start
+                capacity = len(length)
+                n_keys = FIRST_CODE
+                previous = -1
+                continue
+            else:
+                if code < n_keys:
+                    entry = code
+                    n_bytes = length[code]
+                elif code == n_keys and previous >= 0:
+                    # the code added by the compressor in the same step it was used (cScSc): previous + its first byte
+                    entry = previous
+                    n_bytes = length[previous] + 1
+                else:
+                    raise ValueError(f'invalid lempel-ziv code {code}')
+                if pos + n_bytes > out_size:
+                    out.extend(bytes(max(n_bytes, out_size)))
+                    out_size = len(out)
+
+                if entry < CLEAR_CODE:
+                    out[pos] = entry
+                else:
+                    entry_length = length[entry]
+                    entry_start = start[entry] - offset
+                    if entry_start >= 0:
+                        # the last occurrence of the entry is still in out
+                        out[pos:pos + entry_length] = out[entry_start:entry_start + entry_length]
+                    else:
+                        # written in an output buffer before: walking the prefixes, the copies are taken from here on
+                        start[entry] = offset + pos
+                        index = pos + entry_length - 1
+                        while entry >= FIRST_CODE:
+                            out[index] = last_byte[entry]
+                            entry = prefix[entry]
+                            index -= 1
+                        out[index] = entry
+                if code == n_keys:
+                    out[pos + n_bytes - 1] = out[pos]
+
+            if previous >= 0 and n_keys < limit:
+                # previous followed by the first byte of code: the bytes just before pos and at pos
+                if n_keys == capacity:
+                    self.grow()
+                    capacity = len(length)
+                previous_length = length[previous]
+                prefix[n_keys] = previous
+                last_byte[n_keys] = out[pos]
+                length[n_keys] = previous_length + 1
+                start[n_keys] = offset + pos - previous_length
+                n_keys += 1
+                self.n_keys = n_keys
+            previous = code
+            pos += n_bytes
+        self.n_keys = n_keys
+        return pos, previous
+
+    def take(self, out, pos):
+        """
+        ending an output buffer: the entries are copied from it no more
+        :param out: the bytearray decoded into
+        :param pos: the number of bytes decoded into out
+        :return: bytes - the bytes decoded
+        """
+        self.offset += pos
+        return bytes(out) if pos == len(out) else bytes(memoryview(out)[:pos])
+
+    def decode(self, codes, size=None):
+        """
+        decoding the codes of one block (see LZWEncoder.encode)
+        :param codes: iterable of lempel-ziv codes
+        :param size: the number of bytes decoded if known, the output buffer is preallocated to it
+        :return: bytes decoded
+        """
+        out = bytearray(size or DECODE_BUFFER_BYTES)
+        pos, _ = self.decode_into(codes, out)
+        return self.take(out, pos)
+
+    def iter_decode(self, code_chunks):
+        """
+        decoding the codes of one block given in pieces, the pieces are decoded as they come
+        :param code_chunks: iterable of lists of lempel-ziv codes
+        :return: generator of bytes decoded, one per piece
+        """
+        previous = -1
+        for codes in code_chunks:
+            out = bytearray(DECODE_BUFFER_BYTES)
+            pos, previous = self.decode_into(codes, out, previous=previous)
+            yield self.take(out, pos)
+
+    def read_codes(self, reader, max_codes=None, previous=-1):
+        """
+        reading codes written by LZWEncoder.encode_bits while they are decoded: the width of a code depends on the
+        dictionary size after the codes before. the bits are read from an accumulator refilled REFILL_BYTES at a
+        time, reader.position is updated when the generator ends
+        :param reader: BitReader over the codes of one block
+        :param max_codes: the max number of codes read. None: until the reader is exhausted
+        :param previous: the code read before in the block. -1: none or a clear
+        :return: generator of lempel-ziv codes
+        """
+        data = reader.data
+        n_bits_left = reader.bits_left()
+        position = reader.position >> 3
+        # the bits of the first byte before the reader position are masked out by the first refill
+        accumulator = data[position] if reader.position & 7 else 0
+        n_acc_bits = -reader.position & 7
+        position += n_acc_bits > 0
+        limit = self.limit
+        # the compressor adds an entry with every code but the first of the block and the first after a clear
+        adding = previous >= 0
+        # counting down to 0, from -1 (never reached) if the number of codes is not bounded
+        codes_left = -1 if max_codes is None else max_codes
+        try:
+            while codes_left:
+                n_keys = self.n_keys + adding
+                n_bits = ((n_keys if n_keys < limit else limit) - 1).bit_length()
+                if n_bits_left < n_bits:
+                    return
+                if n_acc_bits < n_bits:
+                    chunk = data[position:position + REFILL_BYTES]
+                    position += REFILL_BYTES
+                    accumulator = (((accumulator & ((1 << n_acc_bits) - 1)) << (REFILL_BYTES * 8))
+                                   | (int.from_bytes(chunk, 'big') << ((REFILL_BYTES - len(chunk)) * 8)))
+                    n_acc_bits += REFILL_BYTES * 8
+                n_acc_bits -= n_bits
+                n_bits_left -= n_bits
+                code = (accumulator >> n_acc_bits) & ((1 << n_bits) - 1)
+                adding = code != CLEAR_CODE
+                codes_left -= 1
+                yield code
+        finally:
+            reader.position = reader.n_bits - n_bits_left
+
+    def iter_decode_bits(self, reader, chunk_codes):
+        """
+        decoding codes written by LZWEncoder.encode_bits until the reader is exhausted, piece by piece
+        :param reader: BitReader over the codes of one block
+        :param chunk_codes: the number of codes decoded per piece
+        :return: generator of bytes decoded
+        """
+        previous = -1
+        while True:
+            out = bytearray(DECODE_BUFFER_BYTES)
+            codes = self.read_codes(reader, chunk_codes, previous)
+            pos, previous = self.decode_into(codes, out, previous=previous)
+            yield self.take(out, pos)
+            if reader.bits_left() < code_width(self.n_keys + (previous >= 0), self.max_bits):
+                return
+
+    def decode_bits(self, reader, size=None):
+        """
+        decoding codes written by LZWEncoder.encode_bits until the reader is exhausted
+        :param reader: BitReader over the codes of one block
+        :param size: the number of bytes decoded if known, the output buffer is preallocated to it
+        :return: bytes decoded
+        """
+        out = bytearray(size or DECODE_BUFFER_BYTES)
+        pos, _ = self.decode_into(self.read_codes(reader), out)
+        return self.take(out, pos)
+
+
+def lzw_decode(codes):
+    """
+    :param codes: iterable of lempel-ziv codes of a whole file, compressed with an unbounded dictionary
+    :return: bytes decoded
+    """
+    return LZWDecoder().decode(codes)
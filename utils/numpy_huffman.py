@@ -0,0 +1,194 @@
+import sys
+
+
+# the numpy module, imported by enabled on the first input of IMPORT_SYMBOLS. numpy is optional, False: it is not
+# installed and the pure python loops are used
+np = None
+
+
+# below this many symbols the setup of the arrays costs more than the python loop
+MIN_SYMBOLS = 1024
+
+# numpy is imported for an input of at least this many symbols (unless it was imported already): importing it takes
+# 30 - 45 ms and saves about 0.09 ms per KB coded, so it pays off from a few hundred KB
+IMPORT_SYMBOLS = 1 << 19
+
+# the symbol containers converted to numpy arrays in one call. anything else (lists of lempel-ziv codes,
+# generators ...) takes the python loop: converting it costs as much as the loop saves
+SEQUENCE_TYPES = (str, bytes, bytearray, memoryview)
+
+# a code_table entry holds the code in its top bits and the code length in its low 6 bits
+MAX_CODE_LENGTH = 57
+
+# mask of the code length bits of a code_table entry
+LENGTH_MASK = 63
+
+# the number of symbols packed at once, so the temporary arrays stay small on a huge input
+CHUNK_SYMBOLS = 1 << 20
+
+
+def import_numpy():
+    """
+    :return: the numpy module, imported on first call. False: numpy is not installed
+    """
+    global np
+    if np is None:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            np = False
+    return np
+
+
+def enabled(symbols):
+    """
+    :param symbols: the symbols to count / encode
+    :return: True if numpy is importable and symbols is a sequence long enough for the vectorized path to pay off
+    """
+    if not isinstance(symbols, SEQUENCE_TYPES) or len(symbols) < MIN_SYMBOLS:
+        return False
+    if np is None and len(symbols) < IMPORT_SYMBOLS and 'numpy' not in sys.modules:
+        return False
+    return bool(import_numpy())
+
+
+def symbol_array(symbols):
+    """
+    :param symbols: str or bytes like object
+    :return: numpy array of the int symbols (ord of the characters of a str). None: not a supported type
+    """
+    if isinstance(symbols, str):
+        return np.frombuffer(symbols.encode('utf-32-le', 'surrogatepass'), dtype='<u4')
+    if isinstance(symbols, (bytes, bytearray, memoryview)):
+        if isinstance(symbols, memoryview) and (symbols.itemsize != 1 or not symbols.c_contiguous):
+            return None
+        return np.frombuffer(symbols, dtype=np.uint8)
+    return None
+
+
+def count_frequency(symbols):
+    """
+    counting every symbol with np.bincount
+    :param symbols: str or bytes like object
+    :return: dict symbol -> count. None: symbols can not be vectorized
+    """
+    array = symbol_array(symbols)
+    if array is None:
+        return None
+    # bincount converts its input to 64 bit ints, so a chunk at a time keeps the copy small
+    counts = np.zeros(0, dtype=np.intp)
+    for start in range(0, len(array), CHUNK_SYMBOLS):
+        chunk_counts = np.bincount(array[start:start + CHUNK_SYMBOLS], minlength=len(counts))
+        chunk_counts[:len(counts)] += counts
+        counts = chunk_counts
+    present = np.flatnonzero(counts)
+    keys = present.tolist()
+    if isinstance(symbols, str):
+        keys = [chr(key) for key in keys]
+    return dict(zip(keys, counts[present].tolist()))
+
+
+def code_table(codes):
+    """
+    :param codes: dict symbol -> (code value, code length), symbols are ints or characters
+    :return: numpy array indexed by the int symbol: the code shifted to the top of a 64 bit word, or-ed with
+    the code length in the low bits (0: no code). None: a code is too long for the vectorized packing
+    """
+    if not codes:
+        return None
+    keys = [ord(key) if isinstance(key, str) else key for key in codes]
+    if max(length for _, length in codes.values()) > MAX_CODE_LENGTH:
+        return None
+    table = np.zeros(max(keys) + 1, dtype=np.uint64)
+    table[keys] = [value << (64 - length) | length for value, length in codes.values()]
+    return table
+
+
+def pair_table(table):
+    """
+    :param table: code_table of byte symbols
+    :return: code_table of the 16 bit symbols (first byte << 8 | second byte): the two codes one after the other.
+    None: two codes together are too long for the vectorized packing
+    """
+    table = np.pad(table, (0, 256 - len(table)))
+    lengths = table & np.uint64(LENGTH_MASK)
+    codes = table & ~np.uint64(LENGTH_MASK)
+    if 2 * int(lengths.max()) > MAX_CODE_LENGTH:
+        return None
+    pairs = codes[:, None] | (codes[None, :] >> lengths[:, None]) | (lengths[:, None] + lengths[None, :])
+    pairs[(lengths == 0)[:, None] | (lengths == 0)[None, :]] = 0
+    return pairs.ravel()
+
+
+def write_codes(writer, symbols, codes):
+    """
+    vectorized BitWriter.write_codes
+    :param writer: BitWriter
+    :param symbols: str or bytes like object
+    :param codes: dict symbol -> (code value, code length)
+    :return: True if the codes were written. False: symbols / codes can not be vectorized, nothing was written
+    """
+    array = symbol_array(symbols)
+    if array is None or len(array) == 0:
+        return False
+    table = code_table(codes)
+    if table is None:
+        return False
+    if array.max() >= len(table):
+        raise KeyError('symbol without a code')
+
+    last = None
+    if array.dtype == np.uint8 and len(array) >= 2:
+        pairs = pair_table(table)
+        if pairs is not None:
+            # every 2 bytes are one big endian 16 bit symbol, half the symbols to pack
+            if len(array) & 1:
+                last = int(array[-1])
+                array = array[:-1]
+            array = array.view('>u2')
+            table = pairs
+
+    writer.flush()
+    for start in range(0, len(array), CHUNK_SYMBOLS):
+        pack_codes(writer, table.take(array[start:start + CHUNK_SYMBOLS]))
+    if last is not None:
+        writer.write(*codes[last])
+    return True
+
+
+def pack_codes(writer, entries):
+    """
+    packing the codes gathered from a code_table after the bits of writer. each code is shifted right from the top
+    of a 64 bit word to its bit offset, the codes starting in the same word are or-ed together with
+    np.bitwise_or.reduceat, the bits shifted out of a code crossing into the next word are or-ed into that word.
+    :param writer: flushed BitWriter
+    :param entries: numpy array of code_table entries
+    :return: None
+    """
+    lengths = entries & np.uint64(LENGTH_MASK)
+    if not lengths.all():
+        raise KeyError('symbol without a code')
+    entries &= ~np.uint64(LENGTH_MASK)
+    ends = np.cumsum(lengths)
+    ends += writer.n_acc_bits
+    offsets = ends - lengths
+    n_bits = int(ends[-1])
+    bit_offsets = offsets & 63
+
+    # a code is shorter than a word, so every word but the last has a code starting in it:
+    # the first code of a word is the one with a bit offset smaller than the length of the code before
+    word_starts = np.flatnonzero(bit_offsets[1:] < lengths[:-1])
+    word_starts += 1
+    word_starts = np.concatenate(([0], word_starts))
+    words = np.zeros(((n_bits + 63) >> 6) + 1, dtype=np.uint64)
+    words[:len(word_starts)] = np.bitwise_or.reduceat(entries >> bit_offsets, word_starts)
+    crossing = np.flatnonzero(bit_offsets + lengths > 64)
+    words[(offsets[crossing] >> 6) + 1] |= entries[crossing] << (64 - bit_offsets[crossing])
+    if writer.n_acc_bits:
+        words[0] |= np.uint64(writer.accumulator << (64 - writer.n_acc_bits))
+
+    packed = words.astype('>u8').tobytes()
+    writer.buffer += packed[:n_bits >> 3]
+    writer.n_acc_bits = n_bits & 7
+    writer.accumulator = packed[n_bits >> 3] >> (8 - writer.n_acc_bits) if writer.n_acc_bits else 0
@@ -0,0 +1,96 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from utils.container import INDEPENDENT, BLOCK_SIZE, compress_blocks, decompress_blocks
+
+
+# blocks submitted to the pool per worker before waiting for the first result
+BLOCKS_PER_WORKER = 2
+
+
+def compress_block_task(codec_class, options, block):
+    """
+    compress a block with a new codec object, so the block does not depend on any other block
+    :param codec_class: Huffman_Coding / LZW_Coding / Lempel_Ziv_Huffman_Coding
+    :param options: dict of keyword arguments for the codec constructor
+    :param block: bytes to compress
+    :return: payload bytes
+    """
+    return codec_class(path=None, **options).compress_block(block)
+
+
+def decompress_block_task(codec_class, options, payload):
+    """
+    :param codec_class: the codec class that compressed the block
+    :param options: dict of keyword arguments for the codec constructor, as used at compress
+    :param payload: payload written by compress_block_task
+    :return: bytes decoded
+    """
+    return codec_class(path=None, **options).decompress_block(payload)
+
+
+def ordered_map(executor, function, iterable, window):
+    """
+    like executor.map, but consuming iterable lazily: at most window tasks are pending at once,
+    so a huge input is never read into memory ahead of the workers.
+    :param executor: concurrent.futures executor
+    :param function: picklable function of one argument
+    :param iterable: the arguments
+    :param window: the max number of pending tasks
+    :return: generator of the results, in the order of iterable
+    """
+    pending = deque()
+    for item in iterable:
+        pending.append(executor.submit(function, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def compress_independent_blocks(codec_class, reader, writer, header, workers=None, block_size=BLOCK_SIZE,
+                                options=None):
+    """
+    compressing every block independently in a process pool and writing a block index after the blocks
+    :param codec_class: the codec class to compress each block with
+    :param reader: binary file like object to compress
+    :param writer: binary file like object for the compressed stream
+    :param header: the codec Header, STREAM and INDEPENDENT flags are added
+    :param workers: the number of processes. None: os.cpu_count(), 1: no pool
+    :param block_size: the max number of bytes in a block
+    :param options: dict of keyword arguments for the codec constructor
+    :return: the number of bytes compressed
+    """
+    header.flags |= INDEPENDENT
+    task = partial(compress_block_task, codec_class, options or {})
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return compress_blocks(reader, writer, header, task, block_size)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        map_blocks = partial(ordered_map, executor, window=workers * BLOCKS_PER_WORKER)
+        return compress_blocks(reader, writer, header, task, block_size, map_blocks=map_blocks)
+
+
+def decompress_independent_blocks(codec_class, reader, writer, header, workers=None, options=None):
+    """
+    decompressing a stream written by compress_independent_blocks in a process pool
+    :param codec_class: the codec class that compressed the stream
+    :param reader: binary file like object positioned after the header
+    :param writer: binary file like object for the decompressed data
+    :param header: the Header read from the stream
+    :param workers: the number of processes. None: os.cpu_count(), 1: no pool
+    :param options: dict of keyword arguments for the codec constructor, as used at compress
+    :return: the number of bytes decompressed
+    """
+    if not header.flags & INDEPENDENT:
+        raise ValueError('the blocks of the stream depend on each other and can not be decompressed in parallel')
+    task = partial(decompress_block_task, codec_class, options or {})
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        return decompress_blocks(reader, writer, header, task)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        map_blocks = partial(ordered_map, executor, window=workers * BLOCKS_PER_WORKER)
+        return decompress_blocks(reader, writer, header, task, map_blocks=map_blocks)
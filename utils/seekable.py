@@ -0,0 +1,86 @@
+from bisect import bisect_right
+from collections import OrderedDict
+from utils.container import INDEPENDENT, read_exact, read_index
+from utils.parallel import decompress_block_task
+
+
+# the number of decoded blocks kept by a SeekableReader
+CACHE_BLOCKS = 8
+
+# a block size for files written for random access: a read decodes at least one block
+SEEKABLE_BLOCK_SIZE = 1 << 16
+
+
+class SeekableReader:
+    def __init__(self, file, header, codec_class, options=None, cache_blocks=CACHE_BLOCKS):
+        """
+        random access to a file written with independent blocks (compress_parallel): read(offset, length) decodes
+        only the blocks covering the range, found with the block index of the footer. the last decoded blocks are
+        kept in an lru cache. usually created by a codec: codec.open_seekable(file)
+        :param file: seekable binary file object, positioned after the header
+        :param header: the Header read from file
+        :param codec_class: the codec class that compressed the file
+        :param options: dict of keyword arguments for the codec constructor, as used at compress
+        :param cache_blocks: the max number of decoded blocks cached
+        """
+        if not header.flags & INDEPENDENT:
+            raise ValueError('no block index: the file was not compressed with independent blocks (compress_parallel)')
+        self.file = file
+        self.header = header
+        self.codec_class = codec_class
+        self.options = options or {}
+        self.cache_blocks = cache_blocks
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        # the offsets in the index are from the first byte of the header
+        header_size = len(header.to_bytes())
+        base = file.tell() - header_size
+        self.index = [(block_length, base + offset, length)
+                      for block_length, offset, length in read_index(file, base)]
+        self.starts = []
+        self.size = 0
+        for block_length, _, _ in self.index:
+            self.starts.append(self.size)
+            self.size += block_length
+
+    def read(self, offset, length):
+        """
+        :param offset: the offset in the original data
+        :param length: the number of bytes to read
+        :return: bytes - the original data in offset..offset + length (shorter at the end of the data)
+        """
+        if offset < 0 or length < 0:
+            raise ValueError('offset and length must be non negative')
+        end = min(offset + length, self.size)
+        chunks = []
+        block_index = bisect_right(self.starts, offset) - 1
+        while offset < end:
+            block = self.read_block(block_index)
+            start = self.starts[block_index]
+            chunks.append(block[offset - start:end - start])
+            offset = start + len(block)
+            block_index += 1
+        return b''.join(chunks)
+
+    def read_block(self, block_index):
+        """
+        :param block_index: the index of a block
+        :return: bytes - the decoded block, from the cache if it was read lately
+        """
+        block = self.cache.get(block_index)
+        if block is not None:
+            self.hits += 1
+            self.cache.move_to_end(block_index)
+            return block
+        self.misses += 1
+        block_length, offset, length = self.index[block_index]
+        self.file.seek(offset)
+        block = decompress_block_task(self.codec_class, self.options, read_exact(self.file, length))
+        if len(block) != block_length:
+            raise ValueError(f'decompressed block length {len(block)} != original block length {block_length}')
+        self.cache[block_index] = block
+        if len(self.cache) > self.cache_blocks:
+            self.cache.popitem(last=False)
+        return block
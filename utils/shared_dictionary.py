@@ -0,0 +1,311 @@
+import struct
+import zlib
+from collections import Counter
+from utils.bit_io import BitWriter, BitReader
+from utils.bytes_utils import write_varint, read_varint
+from utils.canonical_huffman import MAX_CODE_LENGTH, huffman_code_lengths, canonical_codes, DecodeTable
+from utils.container import HUFFMAN, LZW, LZW_HUFFMAN, pack_code_lengths, unpack_code_lengths
+from utils.lzw_dictionary import INT_TO_ASCII, CLEAR_CODE, FIRST_CODE, LZWEncoder, code_width
+
+
+DICTIONARY_MAGIC = b'DDIC'
+DICTIONARY_VERSION = 1
+
+# default max code width of a trained lempel-ziv dictionary. a dictionary entry is stored as
+# (prefix code << 8 | last byte) in 3 bytes, so the width is at most 16
+DICTIONARY_BITS = 12
+MAX_DICTIONARY_BITS = 16
+ENTRY_SIZE = 3
+
+# codec id, dictionary id. a message is this, the varint original length, then the padded bits
+MESSAGE_FORMAT = '>BI'
+MESSAGE_HEADER_SIZE = struct.calcsize(MESSAGE_FORMAT)
+
+# dictionary id -> SharedDictionary, the dictionaries messages can reference
+DICTIONARIES = {}
+
+# codec id -> (encode method, decode method) of SharedDictionary coding the messages of the codec
+MESSAGE_METHODS = {
+    HUFFMAN: ('huffman_encode', 'huffman_decode'),
+    LZW: ('lzw_encode', 'lzw_decode'),
+    LZW_HUFFMAN: ('lzw_huffman_encode', 'lzw_huffman_decode'),
+}
+
+
+class SharedDictionary:
+    def __init__(self, entries, byte_code_lengths, code_lengths):
+        """
+        a lempel-ziv dictionary and huffman code tables trained on a sample corpus (see train_dictionary),
+        shared by the compressor and the decompressor of small messages. nothing is built per message and
+        a message only carries the id of the dictionary, not its tables.
+        :param entries: list of the lempel-ziv entries after the 256 single bytes: (prefix code << 8) | last byte,
+        the entry i gets the code FIRST_CODE + i
+        :param byte_code_lengths: dict byte -> huffman code length, every byte has a code (Huffman_Coding messages)
+        :param code_lengths: dict lempel-ziv code -> huffman code length, every code but CLEAR_CODE has a code
+        (Lempel_Ziv_Huffman_Coding messages)
+        """
+        self.entries = entries
+        self.byte_code_lengths = byte_code_lengths
+        self.code_lengths = code_lengths
+
+        self.encoder = LZWEncoder()
+        self.table = list(INT_TO_ASCII.values()) + [b'']
+        for code, key in enumerate(entries, FIRST_CODE):
+            prefix = key >> 8
+            if prefix >= code or prefix == CLEAR_CODE:
+                raise ValueError(f'invalid shared dictionary entry {code}')
+            self.encoder.keys[key] = code
+            self.table.append(self.table[prefix] + INT_TO_ASCII[key & 0xff])
+        self.encoder.n_keys = len(self.table)
+        self.encoder.freeze()
+        self.code_width = code_width(self.encoder.n_keys)
+
+        self.byte_codes = canonical_codes(byte_code_lengths)
+        self.codes = canonical_codes(code_lengths)
+        self.byte_decode_table = None
+        self.decode_table = None
+        self.id = zlib.crc32(self.to_bytes())
+
+    def to_bytes(self):
+        """
+        :return: the dictionary serialized: magic, version, varint number of entries, the entries,
+        the byte code lengths table, the lempel-ziv code lengths table
+        """
+        b = bytearray(DICTIONARY_MAGIC)
+        b.append(DICTIONARY_VERSION)
+        b += write_varint(len(self.entries))
+        for key in self.entries:
+            b += key.to_bytes(ENTRY_SIZE, 'big')
+        b += pack_code_lengths(self.byte_code_lengths)
+        b += pack_code_lengths(self.code_lengths)
+        return bytes(b)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        :param data: bytes like object written by to_bytes
+        :return: SharedDictionary
+        """
+        if bytes(data[:len(DICTIONARY_MAGIC)]) != DICTIONARY_MAGIC:
+            raise ValueError('not a shared dictionary: bad magic bytes')
+        version = data[len(DICTIONARY_MAGIC)]
+        if version != DICTIONARY_VERSION:
+            raise ValueError(f'unsupported shared dictionary version {version}')
+        n_entries, offset = read_varint(data, len(DICTIONARY_MAGIC) + 1)
+        end = offset + n_entries * ENTRY_SIZE
+        entries = [int.from_bytes(data[index:index + ENTRY_SIZE], 'big') for index in range(offset, end, ENTRY_SIZE)]
+        byte_code_lengths, offset = unpack_code_lengths(data, end)
+        code_lengths, _ = unpack_code_lengths(data, offset)
+        return cls(entries, byte_code_lengths, code_lengths)
+
+    def save(self, path):
+        """
+        :param path: the file to write the dictionary to
+        :return: the dictionary id
+        """
+        with open(path, 'wb') as file:
+            file.write(self.to_bytes())
+        return self.id
+
+    def huffman_encode(self, data):
+        """
+        :param data: bytes like object
+        :return: bytes - the huffman codes of the bytes, padded
+        """
+        writer = BitWriter()
+        writer.write_codes(data, self.byte_codes)
+        return writer.get_padded_bytes()
+
+    def huffman_decode(self, payload):
+        """
+        :param payload: bytes written by huffman_encode
+        :return: bytes decoded
+        """
+        if self.byte_decode_table is None:
+            self.byte_decode_table = DecodeTable(self.byte_codes)
+        reader = BitReader.from_padded(payload)
+        return bytes(self.byte_decode_table.decode(reader.data, reader.n_bits))
+
+    def lzw_encode(self, data):
+        """
+        :param data: bytes like object
+        :return: bytes - the lempel-ziv codes of the data, all code_width bits wide, padded
+        """
+        writer = BitWriter()
+        writer.write_fixed(self.encoder.encode(data), self.code_width)
+        return writer.get_padded_bytes()
+
+    def lzw_decode(self, payload):
+        """
+        :param payload: bytes written by lzw_encode
+        :return: bytes decoded
+        """
+        return self.join(BitReader.from_padded(payload).read_fixed(self.code_width))
+
+    def lzw_huffman_encode(self, data):
+        """
+        :param data: bytes like object
+        :return: bytes - the huffman codes of the lempel-ziv codes of the data, padded
+        """
+        writer = BitWriter()
+        writer.write_codes(self.encoder.encode(data), self.codes)
+        return writer.get_padded_bytes()
+
+    def lzw_huffman_decode(self, payload):
+        """
+        :param payload: bytes written by lzw_huffman_encode
+        :return: bytes decoded
+        """
+        if self.decode_table is None:
+            self.decode_table = DecodeTable(self.codes)
+        reader = BitReader.from_padded(payload)
+        return self.join(self.decode_table.decode(reader.data, reader.n_bits))
+
+    def join(self, codes):
+        """
+        :param codes: lempel-ziv codes of the frozen dictionary
+        :return: bytes - the entries of the codes
+        """
+        try:
+            return b''.join(map(self.table.__getitem__, codes))
+        except IndexError:
+            raise ValueError('invalid lempel-ziv code in the message') from None
+
+
+def train_dictionary(samples, max_bits=DICTIONARY_BITS, max_code_length=MAX_CODE_LENGTH):
+    """
+    training a shared dictionary on samples like the messages to compress (log lines, json records ...).
+    the lempel-ziv dictionary grows over the samples until it holds 2 ** max_bits codes, then the huffman codes
+    are built from the counts of the bytes and of the codes the samples are parsed into. every byte and every code
+    keeps a count of at least 1, so any message can be coded. the dictionary is registered.
+    :param samples: iterable of bytes like objects
+    :param max_bits: the max lempel-ziv code width, 9..16
+    :param max_code_length: the max huffman code length
+    :return: SharedDictionary
+    """
+    if not FIRST_CODE.bit_length() <= max_bits <= MAX_DICTIONARY_BITS:
+        raise ValueError(f'max_bits must be {FIRST_CODE.bit_length()}..{MAX_DICTIONARY_BITS}, got {max_bits}')
+    samples = [bytes(sample) for sample in samples]
+    limit = 1 << max_bits
+
+    encoder = LZWEncoder()
+    for sample in samples:
+        if encoder.n_keys >= limit:
+            break
+        encoder.encode(sample)
+    # codes are added after their prefix, so dropping the codes past the limit keeps every prefix
+    entries = sorted((code, key) for key, code in encoder.keys.items() if code < limit)
+    entries = [key for _, key in entries]
+
+    byte_frequency = Counter(range(256))
+    code_frequency = Counter(range(FIRST_CODE + len(entries)))
+    del code_frequency[CLEAR_CODE]
+    dictionary = SharedDictionary(entries, {}, {})
+    for sample in samples:
+        byte_frequency.update(sample)
+        code_frequency.update(dictionary.encoder.encode(sample))
+
+    max_length = max(max_code_length, (len(code_frequency) - 1).bit_length())
+    dictionary = SharedDictionary(entries, huffman_code_lengths(byte_frequency, max_code_length),
+                                  huffman_code_lengths(code_frequency, max_length))
+    register(dictionary)
+    return dictionary
+
+
+def register(dictionary):
+    """
+    :param dictionary: SharedDictionary messages may reference by its id
+    :return: the dictionary id
+    """
+    DICTIONARIES[dictionary.id] = dictionary
+    return dictionary.id
+
+
+def load_dictionary(path):
+    """
+    :param path: a file written by SharedDictionary.save
+    :return: SharedDictionary, registered
+    """
+    with open(path, 'rb') as file:
+        dictionary = SharedDictionary.from_bytes(file.read())
+    register(dictionary)
+    return dictionary
+
+
+def get_dictionary(dictionary):
+    """
+    :param dictionary: SharedDictionary or the id of a registered one
+    :return: SharedDictionary. raising ValueError if the id is not registered
+    """
+    if isinstance(dictionary, SharedDictionary):
+        return dictionary
+    try:
+        return DICTIONARIES[dictionary]
+    except KeyError:
+        raise ValueError(f'unknown shared dictionary id {dictionary:#010x}') from None
+
+
+def pack_message(codec_id, dictionary, data, payload):
+    """
+    :param codec_id: the codec that encoded the payload
+    :param dictionary: the SharedDictionary of the payload
+    :param data: the original data
+    :param payload: the encoded data
+    :return: bytes - the message: codec id, dictionary id, varint original length, payload
+    """
+    return struct.pack(MESSAGE_FORMAT, codec_id, dictionary.id) + write_varint(len(data)) + payload
+
+
+def unpack_message(message, codec_id, dictionary=None):
+    """
+    :param message: bytes like object written by pack_message
+    :param codec_id: the codec expected to have written the message
+    :param dictionary: SharedDictionary or id to decode with. None: the registered dictionary of the message id
+    :return: (SharedDictionary, original length, memoryview of the payload)
+    """
+    if len(message) < MESSAGE_HEADER_SIZE:
+        raise ValueError('not a message: too short')
+    message_codec_id, dictionary_id = struct.unpack_from(MESSAGE_FORMAT, message)
+    if message_codec_id != codec_id:
+        raise ValueError(f'message was compressed with codec {message_codec_id}, expected {codec_id}')
+    dictionary = get_dictionary(dictionary_id if dictionary is None else dictionary)
+    if dictionary.id != dictionary_id:
+        raise ValueError(f'message was compressed with shared dictionary {dictionary_id:#010x}, '
+                         f'not {dictionary.id:#010x}')
+    length, offset = read_varint(message, MESSAGE_HEADER_SIZE)
+    return dictionary, length, memoryview(message)[offset:]
+
+
+def compress_message(codec_id, data, dictionary):
+    """
+    :param codec_id: a key of MESSAGE_METHODS
+    :param data: bytes like object
+    :param dictionary: SharedDictionary or the id of a registered one
+    :return: bytes - the message
+    """
+    dictionary = get_dictionary(dictionary)
+    encode_name, _ = MESSAGE_METHODS[codec_id]
+    return pack_message(codec_id, dictionary, data, getattr(dictionary, encode_name)(data))
+
+
+def decompress_message(codec_id, message, dictionary=None):
+    """
+    :param codec_id: a key of MESSAGE_METHODS, the codec expected to have written the message
+    :param message: bytes written by compress_message
+    :param dictionary: SharedDictionary or id. None: the registered dictionary the message references
+    :return: bytes decompressed
+    """
+    dictionary, length, payload = unpack_message(message, codec_id, dictionary)
+    _, decode_name = MESSAGE_METHODS[codec_id]
+    return check_length(getattr(dictionary, decode_name)(payload), length)
+
+
+def check_length(decoded, length):
+    """
+    :param decoded: the decoded message
+    :param length: the original length saved in the message
+    :return: decoded. raising ValueError on mismatch (messages carry no checksum)
+    """
+    if len(decoded) != length:
+        raise ValueError(f'decompressed length {len(decoded)} != original length {length}')
+    return decoded